@@ -1,23 +1,89 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django import forms
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connection
+from django.db.models import F, Max, Prefetch
+from django.utils.functional import cached_property
 from tinymce.widgets import TinyMCE
 from adminsortable2.admin import SortableAdminMixin
 from django.utils.html import format_html
-from django.urls import path
+from django.urls import path, reverse
 from django.shortcuts import redirect
 from django.utils.safestring import mark_safe
 from django.contrib import messages
-from django.core.files.storage import FileSystemStorage
+from django.conf import settings
+from django.db import transaction
 from django.template.response import TemplateResponse
-import csv
+import json
 import os
+from contextlib import ExitStack, contextmanager
 
 from .models import (
     Question, Category, Assessment, Customer,
     StandardizedInput, Product, UserAnswer,
     HelpResource, CSVUploadPlaceholder,
-    QuestionInputOption
+    QuestionInputOption, CategoryScore, Job
 )
+from .importers import QuestionImporter, QuestionSync, write_error_log
+from .jobs import enqueue
+from .navigation import forget_navigation
+from .ordering import reassign_orders
+from .portfolio import add_assessment, answers_changing, remove_assessment
+from .scorecards import freeze_scorecard, frozen_scorecard
+from .scoring import refresh_category_scores, touch_answers
+from .search import filter_answers
+from .snapshot import bump_question_bank_version, get_question_bank_snapshot
+
+
+# ---------- LARGE TABLES ---------- #
+
+# Below this many rows an exact COUNT(*) is cheap enough.
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+
+def estimated_count(queryset):
+    """
+    Approximate number of rows in ``queryset`` without counting them, or None
+    when no cheap estimate exists. PostgreSQL answers from planner statistics
+    (the table's reltuples, or the EXPLAIN row estimate when filtered). Other
+    databases only estimate whole tables, from the highest primary key: an
+    index lookup, and an overestimate once rows have been deleted.
+    """
+    model = queryset.model
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+                row = cursor.fetchone()
+                # -1 until the table has been vacuumed or analyzed.
+                return row[0] if row and row[0] >= 0 else None
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    if not queryset.query.where:
+        return model._default_manager.aggregate(highest=Max('pk'))['highest']
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Changelist paginator for tables with millions of rows: totals above
+    ESTIMATED_COUNT_THRESHOLD are estimated instead of running COUNT(*).
+    Smaller results, and queries the database cannot estimate, keep the
+    exact count.
+    """
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
 
 
 # ---------- INLINE FOR INPUT OPTIONS ---------- #
@@ -49,6 +115,7 @@ class QuestionAdmin(SortableAdminMixin, admin.ModelAdmin):
     sortable_field_name = "order"
     list_display = ['text', 'display_category', 'question_type']
     list_filter = ['category', 'question_type']
+    list_select_related = ['category']
     ordering = ('order',)
     search_fields = ['text']
     autocomplete_fields = ['video', 'audio', 'pdf', 'help_resources']
@@ -57,6 +124,20 @@ class QuestionAdmin(SortableAdminMixin, admin.ModelAdmin):
     def display_category(self, obj):
         return obj.category.name if obj.category else ""
     display_category.short_description = "Category"
+    display_category.admin_order_field = "category__name"
+
+    def _update_order(self, updated_items, extra_model_filters):
+        # Fetch all moved rows in one query instead of one get() per item. The
+        # drag-and-drop script numbers the moved rows densely from the row
+        # above; only that sequence is used, and the rows trade the order
+        # values they already hold, which keeps them unique across the bank
+        # (see ordering.ORDER_GAP).
+        with transaction.atomic():
+            questions = self.model.objects.filter(**extra_model_filters).in_bulk([item[0] for item in updated_items])
+            changed = reassign_orders(list(questions.values()), {int(pk): order for pk, order in updated_items})
+            updated = self.model.objects.bulk_update(changed, ['order'])
+            transaction.on_commit(bump_question_bank_version)
+        return updated
 
     class Media:
         css = {
@@ -68,7 +149,28 @@ class QuestionAdmin(SortableAdminMixin, admin.ModelAdmin):
 
 # ---------- CSV UPLOAD ADMIN TIED TO PLACEHOLDER ---------- #
 class CSVUploadForm(forms.Form):
+    MODE_CHOICES = (
+        ('append', 'Append every row as a new question'),
+        ('sync', 'Sync: update matching questions and add new ones'),
+    )
     csv_file = forms.FileField(label='Select a CSV file to upload')
+    mode = forms.ChoiceField(choices=MODE_CHOICES, initial='append')
+    dry_run = forms.BooleanField(
+        required=False,
+        initial=True,
+        label='Preview changes only',
+        help_text='Sync mode: show the diff against the current bank without saving it.'
+    )
+    delete_missing = forms.BooleanField(
+        required=False,
+        label='Delete questions missing from the file',
+        help_text='Sync mode only. Deleting a question also deletes its answers.'
+    )
+    background = forms.BooleanField(
+        required=False,
+        label='Run in background',
+        help_text='Queue the import for the assessment worker instead of running it during this request.'
+    )
 
 
 @admin.register(CSVUploadPlaceholder)
@@ -88,22 +190,57 @@ class CSVQuestionUploadAdmin(admin.ModelAdmin):
             form = CSVUploadForm(request.POST, request.FILES)
             if form.is_valid():
                 csv_file = form.cleaned_data['csv_file']
-                fs = FileSystemStorage()
-                filename = fs.save(csv_file.name, csv_file)
-                file_path = fs.path(filename)
-
-                imported, categories_created, inputs_created, errors = self.handle_csv_import(file_path)
-                fs.delete(filename)
-
-                msg = f"✅ {imported} Questions imported. ✅ {categories_created} Categories created. ✅ {inputs_created} Standardized Inputs created."
+                if form.cleaned_data['background'] and not (form.cleaned_data['mode'] == 'sync' and form.cleaned_data['dry_run']):
+                    job = enqueue('import_questions', params={
+                        'mode': form.cleaned_data['mode'],
+                        'delete_missing': form.cleaned_data['delete_missing'],
+                    }, input_file=csv_file, user=request.user)
+                    messages.success(request, f"Import queued as job #{job.id}.")
+                    return redirect('admin:assessment_job_change', job.id)
+                try:
+                    if form.cleaned_data['mode'] == 'sync':
+                        sync = self.handle_csv_sync(
+                            csv_file,
+                            dry_run=form.cleaned_data['dry_run'],
+                            delete_missing=form.cleaned_data['delete_missing'],
+                        )
+                        if form.cleaned_data['dry_run']:
+                            context = dict(
+                                self.admin_site.each_context(request),
+                                form=CSVUploadForm(initial={
+                                    'mode': 'sync',
+                                    'dry_run': False,
+                                    'delete_missing': form.cleaned_data['delete_missing'],
+                                }),
+                                sync=sync,
+                            )
+                            return TemplateResponse(request, "assessment/question_csv_upload.html", context)
+                        imported, categories_created, inputs_created, errors = (
+                            len(sync.new), sync.categories_created, sync.inputs_created, sync.errors
+                        )
+                        msg = f"✅ {len(sync.changed)} Questions updated. ✅ {len(sync.unchanged)} Unchanged. "
+                        if form.cleaned_data['delete_missing']:
+                            msg += f"✅ {len(sync.removed)} Removed. "
+                        if sync.rescored:
+                            msg += f"✅ {len(sync.rescored)} Assessments rescored. "
+                    else:
+                        imported, categories_created, inputs_created, errors = self.handle_csv_import(csv_file)
+                        msg = ""
+                except UnicodeDecodeError:
+                    messages.error(request, "❗ The file is not UTF-8 text. Save it as \"CSV UTF-8\" and upload it again.")
+                    return redirect('admin:question_csv_upload')
+                except DatabaseError as e:
+                    # The import runs in one transaction, so nothing was saved.
+                    messages.error(request, f"❗ The import failed and nothing was saved: {e}")
+                    return redirect('admin:question_csv_upload')
+
+                msg += f"✅ {imported} Questions imported. ✅ {categories_created} Categories created. ✅ {inputs_created} Standardized Inputs created."
                 if errors:
-                    error_file_path = os.path.join(os.path.dirname(file_path), "import_errors.csv")
+                    os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+                    error_file_path = os.path.join(settings.MEDIA_ROOT, "import_errors.csv")
                     with open(error_file_path, "w", newline="", encoding="utf-8") as error_file:
-                        writer = csv.writer(error_file)
-                        writer.writerow(["Error Details"])
-                        for error in errors:
-                            writer.writerow([error])
-                    msg += f" ❗ {len(errors)} Errors found. <a href='/media/import_errors.csv'>Download Error Log</a>"
+                        write_error_log(errors, error_file)
+                    msg += f" ❗ {len(errors)} Errors found. <a href='{settings.MEDIA_URL}import_errors.csv'>Download Error Log</a>"
                     messages.error(request, mark_safe(msg))
                 else:
                     messages.success(request, mark_safe(msg))
@@ -118,52 +255,20 @@ class CSVQuestionUploadAdmin(admin.ModelAdmin):
         )
         return TemplateResponse(request, "assessment/question_csv_upload.html", context)
 
-    def handle_csv_import(self, file_path):
-        imported = 0
-        categories_created = 0
-        inputs_created = 0
-        errors = []
+    def handle_csv_import(self, csv_file):
+        """
+        Import questions from an uploaded CSV file object, streaming it
+        rather than saving it to disk first.
+        """
+        importer = QuestionImporter().run(csv_file)
+        return importer.imported, importer.categories_created, importer.inputs_created, importer.errors
 
-        with open(file_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            row_number = 1
-
-            for row in reader:
-                try:
-                    required_fields = ['text', 'category', 'question_type', 'weight', 'neutral', 'is_count_question']
-                    missing_fields = [field for field in required_fields if field not in row or not row[field].strip()]
-                    if missing_fields:
-                        raise ValueError(f"Row {row_number}: Missing fields: {', '.join(missing_fields)}")
-
-                    category_name = row['category'].strip()
-                    category, cat_created = Category.objects.get_or_create(name=category_name)
-                    if cat_created:
-                        categories_created += 1
-
-                    input_list = [i.strip() for i in row.get('standardized_inputs', '').split(',') if i.strip()]
-                    input_objs = []
-                    for input_text in input_list:
-                        input_obj, input_created = StandardizedInput.objects.get_or_create(text=input_text)
-                        if input_created:
-                            inputs_created += 1
-                        input_objs.append(input_obj)
-
-                    question = Question.objects.create(
-                        category=category,
-                        text=row['text'],
-                        question_type=row['question_type'],
-                        weight=int(row['weight']),
-                        neutral=row['neutral'].strip().lower() == 'true',
-                        is_count_question=row['is_count_question'].strip().lower() == 'true',
-                        count_type=row['count_type'] if 'count_type' in row and row['count_type'] else None
-                    )
-                    question.standardized_inputs.set(input_objs)
-                    imported += 1
-                except Exception as e:
-                    errors.append(f"Row {row_number}: {str(e)}")
-                row_number += 1
-
-        return imported, categories_created, inputs_created, errors
+    def handle_csv_sync(self, csv_file, dry_run=True, delete_missing=False):
+        """
+        Diff an uploaded CSV against the current bank and, unless dry_run is
+        set, write only the new and changed questions.
+        """
+        return QuestionSync(delete_missing=delete_missing).run(csv_file, dry_run=dry_run)
 
 
 # ---------- OTHER EXISTING ADMINS ---------- #
@@ -205,18 +310,162 @@ class CustomerAdmin(admin.ModelAdmin):
 @admin.register(Assessment)
 class AssessmentAdmin(admin.ModelAdmin):
     list_display = ('customer', 'employee', 'status', 'date_started', 'date_completed')
+    list_select_related = ('customer', 'employee')
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            # Keep the portfolio tables and the scorecard in step with status
+            # changes made here, as complete_assessment does.
+            if obj.status == 'completed':
+                add_assessment(obj.id)
+                if frozen_scorecard(obj) is None:
+                    freeze_scorecard(obj)
+            else:
+                remove_assessment(obj.id)
+
+    def delete_model(self, request, obj):
+        # Take the answers out of the portfolio before they are cascaded away.
+        with transaction.atomic():
+            remove_assessment(obj.id)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for assessment_id in queryset.filter(in_portfolio=True).values_list('id', flat=True):
+                remove_assessment(assessment_id)
+            super().delete_queryset(request, queryset)
 
 
 @admin.register(QuestionInputOption)
 class QuestionInputOptionAdmin(admin.ModelAdmin):
     list_display = ('question', 'standardized_input', 'score_value', 'is_preferred')
+    list_select_related = ('question', 'standardized_input')
+    raw_id_fields = ('question',)
+    autocomplete_fields = ('standardized_input',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class UserAnswerChangeList(ChangeList):
+    def apply_select_related(self, qs):
+        # The related rows of the page are fetched by id afterwards. Joining
+        # them instead lets the planner start from the small tables and sort
+        # the whole join before applying the page LIMIT.
+        return qs.prefetch_related(
+            Prefetch('assessment', queryset=Assessment.objects.select_related('customer')),
+            'question',
+            'selected_option',
+        )
 
 
 @admin.register(UserAnswer)
 class UserAnswerAdmin(admin.ModelAdmin):
     list_display = ('assessment', 'question', 'answer_text', 'selected_option', 'score', 'flag_required', 'date_answered')
+    # Every filter and the date drill-down is served by an index on useranswer;
+    # the drill-down uses range_date_hierarchy (see the change_list template).
+    list_filter = ('flag_required', 'question__category')
+    date_hierarchy = 'date_answered'
+    sortable_by = ('date_answered',)
+    raw_id_fields = ('assessment', 'question')
+    autocomplete_fields = ('selected_option',)
+    # Resolved from the question bank and bumped on save, never entered by hand.
+    readonly_fields = ('score', 'max_score', 'version')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Shows the search box; get_search_results matches through the full-text
+    # index instead of icontains scans over these columns.
+    search_fields = ('answer_text', 'note')
+
+    def get_changelist(self, request, **kwargs):
+        return UserAnswerChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return filter_answers(queryset, search_term), False
+
+    @contextmanager
+    def _answers_changing(self, assessment_ids):
+        """
+        Run an admin write to answers with every affected assessment taken out
+        of the portfolio tables and folded back in afterwards (see
+        portfolio.answers_changing), then retire their cached state.
+        """
+        assessments = list(Assessment.objects.filter(id__in=assessment_ids))
+        with transaction.atomic(), ExitStack() as stack:
+            for assessment in assessments:
+                stack.enter_context(answers_changing(assessment))
+            yield
+            for assessment in assessments:
+                # A completed assessment's scorecard is frozen from the rollups.
+                refresh_category_scores(assessment.id)
+                touch_answers(assessment)
+        for assessment in assessments:
+            forget_navigation(assessment.id)
+
+    def save_model(self, request, obj, form, change):
+        # Moving an answer to another assessment changes both of them.
+        assessment_ids = {obj.assessment_id}
+        if change:
+            assessment_ids.update(UserAnswer.objects.filter(pk=obj.pk).values_list('assessment_id', flat=True))
+        # Rollups, portfolio tables and scorecards sum the stored scores.
+        snapshot = get_question_bank_snapshot()
+        obj.score = snapshot.score_answer(obj.question_id, obj.selected_option_id)
+        obj.max_score = snapshot.max_score(obj.question_id)
+        if change:
+            # Offline clients holding the old version must get a conflict.
+            obj.version = F('version') + 1
+        with self._answers_changing(assessment_ids):
+            super().save_model(request, obj, form, change)
+        if change:
+            obj.refresh_from_db(fields=['version'])
+
+    def delete_model(self, request, obj):
+        with self._answers_changing([obj.assessment_id]):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with self._answers_changing(queryset.values('assessment_id')):
+            super().delete_queryset(request, queryset)
+
+
+@admin.register(CategoryScore)
+class CategoryScoreAdmin(admin.ModelAdmin):
+    list_display = ('assessment', 'category', 'score', 'max_score', 'answer_count')
+    list_select_related = ('assessment__customer', 'category')
+    list_filter = ('category',)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'display_progress', 'created_by', 'created_at', 'finished_at', 'display_result')
+    list_filter = ('status', 'kind')
+    list_select_related = ('created_by',)
+    readonly_fields = (
+        'kind', 'status', 'params', 'input_file', 'display_result', 'progress', 'total', 'message',
+        'worker', 'created_by', 'created_at', 'started_at', 'heartbeat_at', 'finished_at',
+    )
+    exclude = ('result_file',)
+    change_form_template = 'admin/assessment/job/change_form.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def display_progress(self, obj):
+        if obj.total:
+            return f"{obj.percent}% ({obj.progress}/{obj.total})"
+        return f"{obj.progress}"
+    display_progress.short_description = "Progress"
+
+    def display_result(self, obj):
+        if not obj.result_file:
+            return ""
+        return format_html('<a href="{}">Download</a>', reverse('job_result', args=[obj.id]))
+    display_result.short_description = "Result"
 
 
 @admin.register(StandardizedInput)
 class StandardizedInputAdmin(admin.ModelAdmin):
     list_display = ('text', 'description')
+    search_fields = ['text']
@@ -0,0 +1,253 @@
+"""
+Benchmark harness: builds a synthetic question bank with assessments and
+times the main assessment views through the Django test client, counting
+their SQL queries. ``manage.py run_benchmarks`` writes the results as JSON
+for comparison between commits; the query counts are checked against the
+budgets in benchmark_budgets.json by the test suite.
+"""
+import csv
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import time
+from collections import namedtuple
+
+import django
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Assessment, Category, Customer, Question, QuestionInputOption, StandardizedInput
+from .scoring import AnswerInput, record_answers
+from .snapshot import bump_question_bank_version
+
+Scale = namedtuple('Scale', ['categories', 'questions', 'options', 'assessments'])
+
+SCALES = {
+    'small': Scale(categories=3, questions=30, options=3, assessments=3),
+    'medium': Scale(categories=10, questions=200, options=4, assessments=10),
+    'large': Scale(categories=20, questions=1000, options=5, assessments=25),
+}
+
+BUDGETS_FILE = os.path.join(os.path.dirname(__file__), 'benchmark_budgets.json')
+
+# Share of the questions answered in each synthetic assessment; the rest
+# leaves the question page something to ask.
+ANSWERED_SHARE = 0.8
+
+
+Dataset = namedtuple('Dataset', ['scale', 'user', 'categories', 'assessments'])
+
+
+def build_dataset(scale, seed=0):
+    """
+    Create ``scale.categories`` categories holding ``scale.questions``
+    yes/no questions in total, each offering ``scale.options`` scored
+    options, and ``scale.assessments`` assessments with answers. The same
+    seed always produces the same bank and answers.
+    """
+    rng = random.Random(seed)
+    user = User.objects.create_superuser(f'benchmark-{seed}', f'benchmark-{seed}@example.com', 'benchmark')
+    inputs = StandardizedInput.objects.bulk_create(
+        StandardizedInput(text=f'Benchmark option {seed}-{index}') for index in range(scale.options)
+    )
+    categories = Category.objects.bulk_create(
+        Category(name=f'Benchmark category {index + 1}', order=index) for index in range(scale.categories)
+    )
+    questions = Question.objects.bulk_create(
+        Question(
+            category=categories[index % scale.categories],
+            text=f'Benchmark question {index + 1}: is control {index + 1} in place?',
+            question_type='yes_no',
+            weight=rng.randint(1, 5),
+            order=index,
+        )
+        for index in range(scale.questions)
+    )
+    QuestionInputOption.objects.bulk_create(
+        QuestionInputOption(
+            question=question,
+            standardized_input=option,
+            score_value=position * question.weight,
+            is_preferred=position == 0,
+        )
+        for question in questions
+        for position, option in enumerate(inputs)
+    )
+    # bulk_create skips the signals that normally retire the cached bank.
+    bump_question_bank_version()
+
+    customer = Customer.objects.create(name=f'Benchmark customer {seed}')
+    assessments = []
+    for _ in range(scale.assessments):
+        assessment = Assessment.objects.create(customer=customer, employee=user)
+        answered = rng.sample(questions, round(len(questions) * ANSWERED_SHARE))
+        record_answers(assessment, [
+            AnswerInput(question.id, rng.choice(inputs).id, '', rng.choice(['', 'Checked on site.']))
+            for question in answered
+        ])
+        assessments.append(assessment)
+    return Dataset(scale, user, categories, assessments)
+
+
+def question_csv(rows, prefix):
+    """A question-import CSV with ``rows`` new questions."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow([
+        'text', 'category', 'question_type', 'weight', 'neutral', 'is_count_question',
+        'standardized_inputs', 'score_values', 'preferred_input',
+    ])
+    for index in range(rows):
+        writer.writerow([
+            f'{prefix} imported question {index + 1}', f'Imported category {index % 5 + 1}', 'yes_no',
+            2, 'false', 'false', 'Yes,No,Unsure', '0,4,2', 'Yes',
+        ])
+    return output.getvalue().encode('utf-8')
+
+
+# ---------- SCENARIOS ---------- #
+# Each scenario returns a callable making one request; whatever has to be
+# prepared per run (neighbour ids, upload files) happens outside the timed part.
+
+def _questions(client, dataset, run):
+    url = reverse('assessment_questions', args=[dataset.assessments[0].id])
+    return lambda: client.get(url)
+
+
+def _summary(client, dataset, run):
+    url = reverse('assessment_summary', args=[dataset.assessments[0].id])
+    return lambda: client.get(url)
+
+
+def _export(client, dataset, run):
+    url = reverse('export_assessment_summary', args=[dataset.assessments[0].id])
+
+    def request():
+        response = client.get(url)
+        # The rows are queried while the body streams.
+        b''.join(response.streaming_content)
+        return response
+    return request
+
+
+def _move_question(client, dataset, run):
+    # Every run drags the last question of a category to the top.
+    ids = list(Question.objects.filter(category=dataset.categories[0]).order_by('order').values_list('id', flat=True))
+    payload = json.dumps({'id': ids[-1], 'before': None, 'after': ids[0]})
+    url = reverse('move_question')
+    return lambda: client.post(url, payload, content_type='application/json')
+
+
+def _csv_import(client, dataset, run):
+    content = question_csv(dataset.scale.questions, f'Run {run}')
+    url = reverse('admin:question_csv_upload')
+
+    def request():
+        upload = io.BytesIO(content)
+        upload.name = 'questions.csv'
+        return client.post(url, {'csv_file': upload, 'mode': 'append'})
+    return request
+
+
+SCENARIOS = {
+    'assessment_questions': _questions,
+    'assessment_summary': _summary,
+    'export_assessment_summary': _export,
+    'move_question': _move_question,
+    'handle_csv_import': _csv_import,
+}
+
+
+def measure(client, dataset, scenario, repeat):
+    """
+    One untimed warm-up run (caches, lazily built state), then ``repeat``
+    timed runs. Reports the highest query count seen and the median and
+    fastest wall time.
+    """
+    prepare = SCENARIOS[scenario]
+    prepare(client, dataset, 0)()
+    queries, durations = [], []
+    for run in range(1, repeat + 1):
+        request = prepare(client, dataset, run)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = request()
+            durations.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{scenario} answered {response.status_code}')
+        queries.append(len(captured))
+    return {
+        'queries': max(queries),
+        'median_ms': round(statistics.median(durations), 2),
+        'min_ms': round(min(durations), 2),
+        'runs': repeat,
+    }
+
+
+def run_benchmarks(scales=('small',), scenarios=None, repeat=5, seed=0, reset=None):
+    """
+    Results keyed by scale then scenario. Expects an empty database (the
+    command creates a test database; the test suite runs in one); ``reset``
+    empties it again between scales so each one runs against its own data.
+    """
+    results = {}
+    # Benchmark requests stay out of the production request statistics.
+    with override_settings(ASSESSMENT_PERF_LOG=''):
+        for number, scale_name in enumerate(scales):
+            if number and reset is not None:
+                reset()
+            dataset = build_dataset(SCALES[scale_name], seed=seed)
+            client = Client()
+            client.force_login(dataset.user)
+            results[scale_name] = {
+                scenario: measure(client, dataset, scenario, repeat)
+                for scenario in (scenarios or SCENARIOS)
+            }
+    return {
+        'created': timezone.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'repeat': repeat,
+        'seed': seed,
+        'scales': {name: SCALES[name]._asdict() for name in scales},
+        'results': results,
+    }
+
+
+# ---------- BUDGETS ---------- #
+
+def load_budgets(path=BUDGETS_FILE):
+    with open(path, encoding='utf-8') as budgets_file:
+        return json.load(budgets_file)
+
+
+def check_budgets(report, budgets):
+    """Messages for every measured scenario whose query count exceeds its budget."""
+    failures = []
+    for scale_name, scenarios in report['results'].items():
+        for scenario, result in scenarios.items():
+            budget = budgets.get(scale_name, {}).get(scenario)
+            if budget is not None and result['queries'] > budget:
+                failures.append(f'{scale_name}/{scenario}: {result["queries"]} queries, budget {budget}')
+    return failures
+
+
+def compare_reports(previous, current):
+    """(scale, scenario, old, new) rows for every scenario measured in both reports."""
+    rows = []
+    for scale_name, scenarios in current['results'].items():
+        for scenario, result in scenarios.items():
+            old = previous.get('results', {}).get(scale_name, {}).get(scenario)
+            if old is not None:
+                rows.append((scale_name, scenario, old, result))
+    return rows
@@ -0,0 +1,143 @@
+from .models import Assessment, CategoryScore, UserAnswer
+from .scoring import display_answer
+from .snapshot import UNCATEGORIZED, get_question_bank_snapshot
+
+# Assessments shown side by side when no selection is given.
+DEFAULT_COMPARE = 4
+
+
+def _percent(score, max_score):
+    return round(100 * score / max_score, 1) if max_score else 0
+
+
+def _delta(first, last):
+    if first is None or last is None:
+        return None
+    return last - first
+
+
+def compare_assessments(assessment_ids, snapshot=None):
+    """
+    Align the answers of several assessments by question, oldest first.
+
+    Uses two queries whatever the number of assessments or questions: the
+    assessments and all of their answers. Category totals are summed from
+    the stored per-answer scores. Each row carries one cell per assessment
+    (None where the question was not answered) and the score delta between
+    the first and last assessment that answered it; higher scores mean
+    higher risk, so a positive delta is a regression.
+    """
+    snapshot = snapshot or get_question_bank_snapshot()
+    assessments = list(
+        Assessment.objects.filter(id__in=assessment_ids).select_related('customer').order_by('date_started', 'id')
+    )
+    position = {assessment.id: index for index, assessment in enumerate(assessments)}
+
+    cells = {}
+    for answer in UserAnswer.objects.filter(assessment_id__in=position).only(
+        'assessment_id', 'question_id', 'selected_option_id', 'answer_text', 'score', 'max_score',
+    ):
+        row = cells.setdefault(answer.question_id, [None] * len(assessments))
+        row[position[answer.assessment_id]] = answer
+
+    categories = {}
+    for question_id in sorted(cells, key=lambda question_id: _question_rank(snapshot, question_id)):
+        question = snapshot.get(question_id)
+        answers = cells[question_id]
+        scores = [answer.score if answer is not None else None for answer in answers]
+        answered = [score for score in scores if score is not None]
+        category = categories.setdefault(question.category if question else UNCATEGORIZED, {
+            'scores': [0] * len(assessments),
+            'max_scores': [0] * len(assessments),
+            'questions': [],
+        })
+        for index, answer in enumerate(answers):
+            if answer is not None:
+                category['scores'][index] += answer.score or 0
+                category['max_scores'][index] += answer.max_score or 0
+        category['questions'].append({
+            'id': question_id,
+            'text': question.text if question else f'Question #{question_id}',
+            'cells': [
+                {'answer': display_answer(answer, question), 'score': answer.score} if answer is not None else None
+                for answer in answers
+            ],
+            'delta': _delta(answered[0], answered[-1]) if answered else None,
+            'changed': len({(answer.selected_option_id, answer.answer_text or '') for answer in answers if answer}) > 1,
+        })
+
+    for category in categories.values():
+        category['columns'] = [
+            {'score': score, 'percent': _percent(score, max_score)}
+            for score, max_score in zip(category['scores'], category['max_scores'])
+        ]
+        category['delta'] = _delta(category['scores'][0], category['scores'][-1]) if assessments else None
+
+    totals = [sum(category['scores'][index] for category in categories.values()) for index in range(len(assessments))]
+    max_totals = [sum(category['max_scores'][index] for category in categories.values()) for index in range(len(assessments))]
+    return {
+        'assessments': assessments,
+        'categories': categories,
+        'total_columns': [
+            {'score': score, 'percent': _percent(score, max_score)} for score, max_score in zip(totals, max_totals)
+        ],
+        'total_delta': _delta(totals[0], totals[-1]) if totals else None,
+    }
+
+
+def _question_rank(snapshot, question_id):
+    question = snapshot.get(question_id)
+    if question is None:
+        return (1, 0, 0, question_id)
+    category = snapshot.category(question.category_id)
+    return (0, category.order if category else 0, question.order, question_id)
+
+
+def score_trend(customer_id, snapshot=None):
+    """
+    Time series of risk for a customer's assessments, in one query over the
+    stored category rollups: the overall risk percent per assessment and one
+    series per category (None where the assessment has no answers there).
+    """
+    snapshot = snapshot or get_question_bank_snapshot()
+    points = {}
+    for assessment_id, started, completed, status, category_id, score, max_score in CategoryScore.objects.filter(
+        assessment__customer_id=customer_id
+    ).values_list(
+        'assessment_id', 'assessment__date_started', 'assessment__date_completed', 'assessment__status',
+        'category_id', 'score', 'max_score',
+    ).order_by('assessment__date_started', 'assessment_id'):
+        point = points.setdefault(assessment_id, {
+            'id': assessment_id,
+            'date': (completed or started).date().isoformat(),
+            'status': status,
+            'score': 0,
+            'max_score': 0,
+            'categories': {},
+        })
+        point['score'] += score
+        point['max_score'] += max_score
+        point['categories'][category_id] = _percent(score, max_score)
+
+    categories = [
+        snapshot.category(category_id)
+        for category_id in {category_id for point in points.values() for category_id in point['categories']}
+    ]
+    return {
+        'assessments': [
+            {
+                'id': point['id'],
+                'date': point['date'],
+                'status': point['status'],
+                'risk_percent': _percent(point['score'], point['max_score']),
+            }
+            for point in points.values()
+        ],
+        'categories': [
+            {
+                'name': category.name,
+                'risk_percents': [point['categories'].get(category.id) for point in points.values()],
+            }
+            for category in sorted(filter(None, categories), key=lambda category: (category.order, category.name))
+        ],
+    }
@@ -0,0 +1,114 @@
+"""
+Change markers for conditional GET on the assessment pages.
+
+Every page built from one assessment depends on the same few inputs: its
+answers (``answers_version`` and ``updated_at``, both moved by every answer
+write and every save of the assessment), the question bank version (or the
+frozen scorecard of a completed assessment) and the page templates. Only
+the assessment row is read to check them, so an unchanged page is
+answered with 304 Not Modified before any scoring runs.
+"""
+import hashlib
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import Http404
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import Assessment
+from .scorecards import bank_marker
+
+# Bump whenever the assessment page templates change so browsers and the
+# fragment cache stop reusing pages rendered by the old ones.
+PAGE_VERSION = 1
+
+# Rendered fragments live as long as their marker is current; a new answer
+# moves the key, so stale entries are simply never read again.
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+
+def load_assessment(request, assessment_id):
+    """
+    The assessment (with its customer and scorecard) for this request, or
+    None when it does not exist. Loaded once: the ETag and Last-Modified
+    callbacks read their markers from it and the view then reuses the same
+    instance.
+    """
+    loaded = request.__dict__.setdefault('_assessments', {})
+    if assessment_id not in loaded:
+        loaded[assessment_id] = Assessment.objects.select_related(
+            'customer', 'scorecard'
+        ).filter(id=assessment_id).first()
+    return loaded[assessment_id]
+
+
+def get_assessment(request, assessment_id):
+    assessment = load_assessment(request, assessment_id)
+    if assessment is None:
+        raise Http404('No Assessment matches the given query.')
+    return assessment
+
+
+def assessment_etag(request, assessment_id, *args, **kwargs):
+    """
+    Strong ETag of a page rendered for this assessment. Besides the change
+    marker it covers the viewer and their CSRF token (forms on the page),
+    the question bank, the deployed static files and the page templates.
+    Only GET/HEAD are validated; writes always reach the view.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    assessment = load_assessment(request, assessment_id)
+    if assessment is None:
+        return None
+    digest = hashlib.sha1()
+    for part in (
+        PAGE_VERSION, assessment.id, assessment.answers_version, assessment.updated_at.isoformat(),
+        assessment.customer.name,
+        bank_marker(assessment), getattr(staticfiles_storage, 'manifest_hash', ''),
+        request.user.pk, request.META.get('CSRF_COOKIE', ''),
+    ):
+        digest.update(f'{part};'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def assessment_last_modified(request, assessment_id, *args, **kwargs):
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    assessment = load_assessment(request, assessment_id)
+    return assessment.updated_at if assessment else None
+
+
+def skip_background(etag_func):
+    """Queueing a background export is not a cacheable read."""
+    def wrapper(request, *args, **kwargs):
+        if request.GET.get('background'):
+            return None
+        return etag_func(request, *args, **kwargs)
+    return wrapper
+
+
+def _conditional(etag_func, last_modified_func):
+    """
+    Answer unchanged GETs with 304 before the view runs. Browsers keep the
+    page privately and must revalidate it on every visit, so an edit is
+    never hidden behind a heuristically fresh copy.
+    """
+    def decorator(view):
+        view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+        return cache_control(private=True, no_cache=True)(view)
+    return decorator
+
+
+assessment_condition = _conditional(assessment_etag, assessment_last_modified)
+export_condition = _conditional(skip_background(assessment_etag), skip_background(assessment_last_modified))
+
+
+# ---------- FRAGMENT CACHE ---------- #
+
+def fragment_key(name, assessment):
+    return (
+        f'assessment:fragment:{name}:{assessment.id}:{assessment.answers_version}:'
+        f'{bank_marker(assessment)}:p{PAGE_VERSION}'
+    )
+
@@ -0,0 +1,192 @@
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from .models import UserAnswer
+from .scoring import display_answer
+from .snapshot import get_question_bank_snapshot
+
+# Rows fetched per database round trip while streaming an export.
+EXPORT_CHUNK_SIZE = 2000
+
+SUMMARY_HEADER = ["Category", "Question", "Answer", "Notes"]
+BULK_HEADER = ["Assessment", "Customer", "Date Completed", "Category", "Question", "Answer", "Notes"]
+
+CSV_CONTENT_TYPE = 'text/csv'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Characters that are not allowed anywhere in an XML 1.0 document.
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def answer_row(answer, snapshot):
+    question = snapshot.get(answer.question_id)
+    return [
+        snapshot.category_name(answer.question_id),
+        question.text if question else answer.question.text,
+        display_answer(answer, question),
+        answer.note if answer.note else "",
+    ]
+
+
+def bulk_answers(customer_id=None, date_from=None, date_to=None):
+    """Answers of completed assessments, optionally limited by customer and completion date."""
+    answers = UserAnswer.objects.filter(assessment__status='completed')
+    if customer_id:
+        answers = answers.filter(assessment__customer_id=customer_id)
+    if date_from:
+        answers = answers.filter(assessment__date_completed__date__gte=date_from)
+    if date_to:
+        answers = answers.filter(assessment__date_completed__date__lte=date_to)
+    return answers.select_related('assessment__customer').order_by('assessment_id', 'id')
+
+
+def summary_rows(answers, snapshot=None):
+    """
+    Rows for a single-assessment export. Question, category and option text
+    come from the question-bank snapshot, so each row costs no extra query.
+    """
+    snapshot = snapshot or get_question_bank_snapshot()
+    for answer in answers.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield answer_row(answer, snapshot)
+
+
+def bulk_rows(answers, snapshot=None):
+    """Rows for a multi-assessment export, prefixed with the owning assessment."""
+    snapshot = snapshot or get_question_bank_snapshot()
+    for answer in answers.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        assessment = answer.assessment
+        date_completed = assessment.date_completed.strftime('%Y-%m-%d') if assessment.date_completed else ""
+        yield [assessment.id, assessment.customer.name, date_completed] + answer_row(answer, snapshot)
+
+
+class Echo:
+    """File-like object that hands back whatever is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class _ChunkSink:
+    """
+    Write-only, non-seekable file object for zipfile. Without seek/tell,
+    zipfile streams each member with a trailing data descriptor, so the
+    archive can be sent while it is still being written.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_row(row_number, values):
+    cells = []
+    for column, value in enumerate(values):
+        ref = f'{_column_letter(column)}{row_number}'
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        else:
+            text = escape(_ILLEGAL_XML_CHARS.sub('', '' if value is None else str(value)))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{row_number}">{"".join(cells)}</row>'
+
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def iter_xlsx(header, rows, sheet_name='Summary', flush_every=500):
+    """
+    Stream a single-sheet XLSX workbook. Cells are written as inline strings
+    so no shared-string table has to be held in memory; at most
+    ``flush_every`` rows are buffered before a chunk is yielded.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield sink.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            sheet.write(_xlsx_row(1, header).encode('utf-8'))
+            for row_number, row in enumerate(rows, start=2):
+                sheet.write(_xlsx_row(row_number, row).encode('utf-8'))
+                if row_number % flush_every == 0:
+                    yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+        yield sink.drain()
+    yield sink.drain()
+
+
+def stream_rows(header, rows, file_format, sheet_name='Summary'):
+    """Return (content_type, extension, byte iterator) for the requested format."""
+    if file_format == 'xlsx':
+        return XLSX_CONTENT_TYPE, 'xlsx', iter_xlsx(header, rows, sheet_name=sheet_name)
+    return CSV_CONTENT_TYPE, 'csv', iter_csv(header, rows)
@@ -0,0 +1,489 @@
+import csv
+import hashlib
+import io
+from contextlib import ExitStack
+
+from django.db import transaction
+from django.db.models import F, Max
+
+from .models import (
+    COUNT_TYPE_CHOICES, Assessment, Category, Question, QuestionInputOption, StandardizedInput, UserAnswer,
+)
+from .ordering import ORDER_GAP
+from .portfolio import answers_changing
+from .scoring import refresh_category_scores, rescore_assessment, touch_answers
+from .search import add_question_documents, index_questions
+from .snapshot import QuestionBankSnapshot, bump_question_bank_version
+
+# Rows buffered before their categories/inputs are resolved and inserted.
+IMPORT_BATCH_SIZE = 1000
+
+REQUIRED_FIELDS = ['text', 'category', 'question_type', 'weight', 'neutral', 'is_count_question']
+QUESTION_TYPES = {choice for choice, _ in Question.QUESTION_TYPE_CHOICES}
+COUNT_TYPES = {choice for choice, _ in COUNT_TYPE_CHOICES}
+
+
+def _split_list(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def _as_bool(value):
+    return (value or '').strip().lower() == 'true'
+
+
+class ParsedRow:
+    __slots__ = ('row_number', 'category', 'question', 'options')
+
+    def __init__(self, row_number, category, question, options):
+        self.row_number = row_number
+        self.category = category
+        self.question = question
+        self.options = options
+
+
+def parse_row(row_number, row):
+    """
+    Validate one CSV row. Returns a ParsedRow whose question is unsaved and
+    whose options map input text to (score_value, is_preferred).
+
+    ``standardized_inputs`` is a comma-separated list of option texts.
+    ``score_values`` optionally holds one integer per option, in the same
+    order, and ``preferred_input`` names the preferred option. An optional
+    ``external_id`` identifies the question across re-imports.
+    """
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in row or not (row[field] or '').strip()]
+    if missing_fields:
+        raise ValueError(f"Missing fields: {', '.join(missing_fields)}")
+
+    question_type = row['question_type'].strip()
+    if question_type not in QUESTION_TYPES:
+        raise ValueError(f"Unknown question_type '{question_type}'")
+    count_type = (row.get('count_type') or '').strip() or None
+    if count_type and count_type not in COUNT_TYPES:
+        raise ValueError(f"Unknown count_type '{count_type}'")
+
+    inputs = _split_list(row.get('standardized_inputs'))
+    scores = _split_list(row.get('score_values'))
+    if scores and len(scores) != len(inputs):
+        raise ValueError(f"{len(scores)} score_values given for {len(inputs)} standardized_inputs")
+    # None means "not given", so a sync leaves the stored preference alone.
+    preferred = row['preferred_input'].strip() if row.get('preferred_input') is not None else None
+    if preferred and preferred not in inputs:
+        raise ValueError(f"preferred_input '{preferred}' is not one of the standardized_inputs")
+
+    options = {}
+    for position, input_text in enumerate(inputs):
+        if input_text not in options:
+            options[input_text] = (
+                int(scores[position]) if scores else None,
+                input_text == preferred if preferred is not None else None,
+            )
+
+    question = Question(
+        external_id=(row.get('external_id') or '').strip() or None,
+        text=row['text'],
+        question_type=question_type,
+        weight=int(row['weight']),
+        neutral=_as_bool(row['neutral']),
+        is_count_question=_as_bool(row['is_count_question']),
+        count_type=count_type,
+    )
+    return ParsedRow(row_number, row['category'].strip(), question, options)
+
+
+def write_error_log(errors, error_file):
+    writer = csv.writer(error_file)
+    writer.writerow(["Error Details"])
+    for error in errors:
+        writer.writerow([error])
+
+
+def count_records(binary_file, encoding='utf-8-sig'):
+    """
+    Number of data records in a CSV file, counted by the csv reader so that
+    quoted fields spanning several lines count once. Rewinds the file.
+    """
+    text_file = io.TextIOWrapper(binary_file, encoding=encoding, newline='')
+    try:
+        count = sum(1 for _ in csv.reader(text_file))
+    finally:
+        text_file.detach()
+    binary_file.seek(0)
+    return max(count - 1, 0)
+
+
+def content_key(category_name, text):
+    """Match key for rows without an external_id: hash of category and question text."""
+    normalized = f"{category_name.strip().lower()}\x1f{' '.join(text.split()).lower()}"
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+class QuestionImporter:
+    """
+    Bulk question-bank import.
+
+    Rows are read straight from the uploaded file and buffered in batches.
+    For each batch the category names and option texts not seen yet are
+    resolved with one IN query each (creating the missing ones with
+    bulk_create), then questions and their QuestionInputOption rows are
+    inserted with bulk_create. The whole import runs in one transaction.
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, on_progress=None):
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.categories = {}
+        self.inputs = {}
+        self.last_order = None
+        self.imported = 0
+        self.categories_created = 0
+        self.inputs_created = 0
+        self.errors = []
+
+    def run(self, binary_file, encoding='utf-8-sig'):
+        text_file = io.TextIOWrapper(binary_file, encoding=encoding, newline='')
+        try:
+            self._import(csv.DictReader(text_file))
+        finally:
+            # Leave the caller's file open; closing is up to its owner.
+            text_file.detach()
+        return self
+
+    def _import(self, reader):
+        with transaction.atomic():
+            batch = []
+            for row_number, row in enumerate(reader, start=1):
+                try:
+                    batch.append(parse_row(row_number, row))
+                except Exception as e:
+                    self.errors.append(f"Row {row_number}: {str(e)}")
+                    continue
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    batch = []
+                    if self.on_progress:
+                        self.on_progress(row_number)
+            self.flush(batch)
+            # bulk_create does not send post_save, so retire cached indexes here.
+            transaction.on_commit(bump_question_bank_version)
+
+    def resolve_categories(self, names):
+        missing = names - self.categories.keys()
+        if not missing:
+            return
+        for category_id, name in Category.objects.filter(name__in=missing).order_by('-id').values_list('id', 'name'):
+            self.categories[name] = category_id
+        created = Category.objects.bulk_create(
+            [Category(name=name) for name in sorted(missing - self.categories.keys())]
+        )
+        for category in created:
+            self.categories[category.name] = category.id
+        self.categories_created += len(created)
+
+    def resolve_inputs(self, texts):
+        missing = texts - self.inputs.keys()
+        if not missing:
+            return
+        for input_id, text in StandardizedInput.objects.filter(text__in=missing).values_list('id', 'text'):
+            self.inputs[text] = input_id
+        created = StandardizedInput.objects.bulk_create(
+            [StandardizedInput(text=text) for text in sorted(missing - self.inputs.keys())]
+        )
+        for standardized_input in created:
+            self.inputs[standardized_input.text] = standardized_input.id
+        self.inputs_created += len(created)
+
+    def next_order(self):
+        """
+        Append imported questions after every existing one, ORDER_GAP apart,
+        which also puts them last in their category.
+        """
+        if self.last_order is None:
+            self.last_order = Question.objects.aggregate(last=Max('order'))['last'] or 0
+        self.last_order += ORDER_GAP
+        return self.last_order
+
+    def flush(self, batch):
+        if not batch:
+            return
+        self.resolve_categories({parsed.category for parsed in batch})
+        self.resolve_inputs({input_text for parsed in batch for input_text in parsed.options})
+
+        external_ids = {parsed.question.external_id for parsed in batch if parsed.question.external_id}
+        taken = set(Question.objects.filter(external_id__in=external_ids).values_list('external_id', flat=True))
+        rows = []
+        for parsed in batch:
+            external_id = parsed.question.external_id
+            if external_id:
+                if external_id in taken:
+                    self.errors.append(f"Row {parsed.row_number}: external_id '{external_id}' already exists")
+                    continue
+                taken.add(external_id)
+            parsed.question.category_id = self.categories[parsed.category]
+            parsed.question.order = self.next_order()
+            rows.append(parsed)
+        Question.objects.bulk_create([parsed.question for parsed in rows], batch_size=self.batch_size)
+        add_question_documents(parsed.question for parsed in rows)
+
+        QuestionInputOption.objects.bulk_create(
+            [
+                QuestionInputOption(
+                    question_id=parsed.question.id,
+                    standardized_input_id=self.inputs[input_text],
+                    score_value=score_value or 0,
+                    is_preferred=bool(is_preferred),
+                )
+                for parsed in rows
+                for input_text, (score_value, is_preferred) in parsed.options.items()
+            ],
+            batch_size=self.batch_size,
+        )
+        self.imported += len(rows)
+
+
+# Question fields compared and written by a sync, besides the category.
+SYNC_FIELDS = ['external_id', 'text', 'question_type', 'weight', 'neutral', 'is_count_question', 'count_type']
+
+# Changed fields that move stored answer scores or the category they roll up into.
+SCORING_FIELDS = {'weight', 'category'}
+
+
+class ExistingQuestion:
+    __slots__ = ('id', 'category', 'values', 'options')
+
+    def __init__(self, id, category, values, options):
+        self.id = id
+        self.category = category
+        self.values = values
+        self.options = options
+
+
+class QuestionChange:
+    __slots__ = ('parsed', 'existing', 'fields', 'option_changes')
+
+    def __init__(self, parsed, existing, fields, option_changes):
+        self.parsed = parsed
+        self.existing = existing
+        self.fields = fields
+        self.option_changes = option_changes
+
+    @property
+    def text(self):
+        return self.parsed.question.text
+
+    @property
+    def changed_fields(self):
+        return self.fields + (['options'] if self.option_changes else [])
+
+
+class QuestionSync:
+    """
+    Idempotent upsert of a question CSV against the existing bank.
+
+    Each row is matched to an existing question by ``external_id`` when the
+    row has one, otherwise by a hash of its category and text. The diff
+    (new / changed / unchanged / removed) is computed in memory from one read
+    of the bank, and only new and changed rows are written, so re-importing an
+    unchanged file costs no writes. Questions missing from the file are only
+    deleted when ``delete_missing`` is set, since deleting cascades to answers.
+
+    Assessments that lose answers that way get their rollups, portfolio
+    totals and scorecard refreshed like an admin delete. Assessments that
+    answered a question whose weight, options or category changed are
+    rescored, except completed ones with a frozen scorecard, which keep
+    their scores (as with rebuild_category_scores).
+    """
+
+    def __init__(self, delete_missing=False, batch_size=IMPORT_BATCH_SIZE, on_progress=None):
+        self.delete_missing = delete_missing
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.new = []
+        self.changed = []
+        self.unchanged = []
+        self.removed = []
+        self.rescored = []
+        self.errors = []
+        self.categories_created = 0
+        self.inputs_created = 0
+
+    def run(self, binary_file, dry_run=False, encoding='utf-8-sig'):
+        text_file = io.TextIOWrapper(binary_file, encoding=encoding, newline='')
+        try:
+            self.diff(csv.DictReader(text_file))
+        finally:
+            text_file.detach()
+        if not dry_run:
+            self.apply()
+        return self
+
+    def load_bank(self):
+        options = {}
+        for question_id, input_text, score_value, is_preferred in QuestionInputOption.objects.values_list(
+            'question_id', 'standardized_input__text', 'score_value', 'is_preferred'
+        ):
+            options.setdefault(question_id, {})[input_text] = (score_value, is_preferred)
+
+        return [
+            ExistingQuestion(
+                row['id'], row['category__name'], {field: row[field] for field in SYNC_FIELDS},
+                options.get(row['id'], {}),
+            )
+            for row in Question.objects.values('id', 'category__name', *SYNC_FIELDS)
+        ]
+
+    def diff(self, reader):
+        bank = self.load_bank()
+        by_external_id = {existing.values['external_id']: existing for existing in bank if existing.values['external_id']}
+        by_content = {}
+        for existing in bank:
+            by_content.setdefault(content_key(existing.category, existing.values['text']), existing)
+        matched = set()
+        for row_number, row in enumerate(reader, start=1):
+            if self.on_progress and row_number % self.batch_size == 0:
+                self.on_progress(row_number)
+            try:
+                parsed = parse_row(row_number, row)
+            except Exception as e:
+                self.errors.append(f"Row {row_number}: {str(e)}")
+                continue
+
+            external_id = parsed.question.external_id
+            existing = by_external_id.get(external_id) if external_id else None
+            if existing is None:
+                existing = by_content.get(content_key(parsed.category, parsed.question.text))
+                # A content match already claimed by another external_id is a different question.
+                if existing is not None and external_id and existing.values['external_id'] not in (None, external_id):
+                    existing = None
+            if existing is not None and existing.id in matched:
+                self.errors.append(f"Row {row_number}: duplicate of an earlier row")
+                continue
+            if existing is None:
+                self.new.append(parsed)
+                continue
+
+            matched.add(existing.id)
+            change = self.compare(parsed, existing)
+            (self.changed if change.changed_fields else self.unchanged).append(change)
+
+        self.removed = [existing for existing in bank if existing.id not in matched]
+
+    def compare(self, parsed, existing):
+        question = parsed.question
+        if question.external_id is None:
+            # Rows matched by content keep the external_id they already have.
+            question.external_id = existing.values['external_id']
+        fields = [field for field in SYNC_FIELDS if getattr(question, field) != existing.values[field]]
+        if parsed.category != existing.category:
+            fields.append('category')
+
+        option_changes = {}
+        for input_text, (score_value, is_preferred) in parsed.options.items():
+            current = existing.options.get(input_text)
+            wanted = (
+                score_value if score_value is not None else (current[0] if current else 0),
+                is_preferred if is_preferred is not None else (current[1] if current else False),
+            )
+            if wanted != current:
+                option_changes[input_text] = wanted
+        for input_text in existing.options.keys() - parsed.options.keys():
+            option_changes[input_text] = None
+        return QuestionChange(parsed, existing, fields, option_changes)
+
+    def apply(self):
+        importer = QuestionImporter(batch_size=self.batch_size)
+        removed_ids = [existing.id for existing in self.removed] if self.delete_missing else []
+        with transaction.atomic(), ExitStack() as stack:
+            # Decided before anything is written, while frozen scorecards still match.
+            rescore_ids = self._rescore_candidates()
+            # Their answers cascade away with the questions: take them out of
+            # the portfolio while they still exist.
+            losing = list(Assessment.objects.filter(answers__question_id__in=removed_ids).distinct())
+            for assessment in losing:
+                stack.enter_context(answers_changing(assessment))
+
+            for start in range(0, len(self.new), self.batch_size):
+                importer.flush(self.new[start:start + self.batch_size])
+            self.errors.extend(importer.errors)
+
+            importer.resolve_categories({change.parsed.category for change in self.changed})
+            importer.resolve_inputs({
+                input_text for change in self.changed
+                for input_text, wanted in change.option_changes.items() if wanted is not None
+            })
+            self._update_questions(importer.categories)
+            self._update_options(importer.inputs)
+
+            if removed_ids:
+                Question.objects.filter(id__in=removed_ids).delete()
+                for assessment in losing:
+                    refresh_category_scores(assessment.id)
+                    touch_answers(assessment)
+            self._rescore(rescore_ids)
+            for assessment in losing:
+                # Rescoring bumps the answers version too; freeze against the stored one.
+                assessment.refresh_from_db(fields=['answers_version'])
+            transaction.on_commit(bump_question_bank_version)
+        self.categories_created = importer.categories_created
+        self.inputs_created = importer.inputs_created
+
+    def _rescore_candidates(self):
+        """Ids of the assessments whose stored scores or rollups the changed rows affect."""
+        question_ids = [
+            change.existing.id for change in self.changed
+            if change.option_changes or SCORING_FIELDS.intersection(change.fields)
+        ]
+        if not question_ids:
+            return []
+        return list(Assessment.objects.filter(
+            id__in=UserAnswer.objects.filter(question_id__in=question_ids).values('assessment_id'),
+        ).exclude(
+            status='completed', scorecard__answers_version=F('answers_version'),
+        ).order_by('id').values_list('id', flat=True))
+
+    def _rescore(self, assessment_ids):
+        if not assessment_ids:
+            return
+        # The cached snapshot is only replaced after commit; score against the rows just written.
+        snapshot = QuestionBankSnapshot.build(None)
+        for assessment_id in assessment_ids:
+            rescore_assessment(assessment_id, index=snapshot)
+        self.rescored = assessment_ids
+
+    def _update_questions(self, categories):
+        updates = []
+        for change in self.changed:
+            if not change.fields:
+                continue
+            question = change.parsed.question
+            question.id = change.existing.id
+            question.category_id = categories[change.parsed.category]
+            updates.append(question)
+        Question.objects.bulk_update(updates, SYNC_FIELDS + ['category'], batch_size=self.batch_size)
+        index_questions(question.id for question in updates)
+
+    def _update_options(self, inputs):
+        question_ids = [change.existing.id for change in self.changed if change.option_changes]
+        current = {
+            (option.question_id, option.standardized_input.text): option
+            for option in QuestionInputOption.objects.filter(question_id__in=question_ids).select_related('standardized_input')
+        }
+        to_create, to_update, delete_ids = [], [], []
+        for change in self.changed:
+            for input_text, wanted in change.option_changes.items():
+                option = current.get((change.existing.id, input_text))
+                if wanted is None:
+                    delete_ids.append(option.id)
+                elif option is None:
+                    to_create.append(QuestionInputOption(
+                        question_id=change.existing.id, standardized_input_id=inputs[input_text],
+                        score_value=wanted[0], is_preferred=wanted[1],
+                    ))
+                else:
+                    option.score_value, option.is_preferred = wanted
+                    to_update.append(option)
+
+        QuestionInputOption.objects.bulk_create(to_create, batch_size=self.batch_size)
+        QuestionInputOption.objects.bulk_update(to_update, ['score_value', 'is_preferred'], batch_size=self.batch_size)
+        if delete_ids:
+            QuestionInputOption.objects.filter(id__in=delete_ids).delete()
@@ -0,0 +1,329 @@
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, OperationalError, close_old_connections, connections
+from django.utils import timezone
+
+from .exporters import BULK_HEADER, SUMMARY_HEADER, bulk_answers, bulk_rows, stream_rows, summary_rows
+from .importers import QuestionImporter, QuestionSync, count_records, write_error_log
+from .models import Assessment, Job, UserAnswer
+from .ordering import rebalance_questions
+from .reports import render_report
+from .search import index_answers, rebuild_search_index
+
+# Seconds between progress writes for a running job.
+PROGRESS_INTERVAL = 1.0
+
+# Seconds between heartbeats of a running job; keep it well under the
+# worker's --stale-after.
+HEARTBEAT_INTERVAL = 30.0
+
+JOB_HANDLERS = {}
+
+
+def register(kind):
+    def decorator(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return decorator
+
+
+def enqueue(kind, params=None, input_file=None, user=None):
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    job = Job(kind=kind, params=params or {}, created_by=user)
+    if input_file is not None:
+        job.input_file.save(os.path.basename(input_file.name), input_file, save=False)
+    job.save()
+    return job
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next(worker):
+    """
+    Atomically move the oldest queued job to running. The conditional UPDATE
+    makes the claim safe between several workers without row locks, so it
+    behaves the same on SQLite and PostgreSQL.
+    """
+    for job_id in Job.objects.filter(status='queued').order_by('created_at', 'id').values_list('id', flat=True)[:10]:
+        now = timezone.now()
+        claimed = Job.objects.filter(id=job_id, status='queued').update(
+            status='running', worker=worker, started_at=now, heartbeat_at=now,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def requeue_stale(seconds):
+    """Return jobs whose worker stopped heartbeating to the queue."""
+    cutoff = timezone.now() - timedelta(seconds=seconds)
+    return Job.objects.filter(status='running', heartbeat_at__lt=cutoff).update(
+        status='queued', worker='', progress=0,
+    )
+
+
+def _side_connection(busy_timeout):
+    """A new autocommit connection next to the thread's own; ``busy_timeout`` in ms (SQLite only)."""
+    connection = connections.create_connection(DEFAULT_DB_ALIAS)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA busy_timeout = {int(busy_timeout)}')
+    return connection
+
+
+def _update_job(connection, job_id, fields, where=None):
+    """UPDATE one jobs row through ``connection``; ``where`` adds column = value conditions."""
+    quote = connection.ops.quote_name
+    where = {'id': job_id, **(where or {})}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {quote(Job._meta.db_table)} SET {', '.join(f'{quote(field)} = %s' for field in fields)} "
+            f"WHERE {' AND '.join(f'{quote(field)} = %s' for field in where)}",
+            [*fields.values(), *where.values()],
+        )
+        return cursor.rowcount
+
+
+class ProgressReporter:
+    """
+    Throttled progress writes so tight loops don't hammer the jobs table.
+
+    Imports and index rebuilds report from inside their own transaction, so
+    the writes go through a separate autocommit connection: the admin sees
+    them straight away instead of at commit. SQLite has a single writer, so
+    there a write is skipped while the job holds the write lock.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self._last_write = 0
+        self._connection = None
+
+    def _write(self, **fields):
+        if self._connection is None:
+            self._connection = _side_connection(busy_timeout=0)
+        try:
+            _update_job(self._connection, self.job.id, fields)
+        except OperationalError:
+            # SQLite "database is locked": the job's own transaction is writing.
+            pass
+
+    def set_total(self, total):
+        self.job.total = total
+        self._write(total=total)
+
+    def __call__(self, progress, force=False):
+        self.job.progress = progress
+        now = time.monotonic()
+        if force or now - self._last_write >= PROGRESS_INTERVAL:
+            self._last_write = now
+            self._write(progress=progress)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class Heartbeat(threading.Thread):
+    """
+    Stamps ``heartbeat_at`` of a claimed job every ``interval`` seconds from
+    its own thread and connection, so handlers that never report progress
+    (rebalance, report rendering) stay claimed however long they run. The
+    stamp only lands while the job still belongs to this claim; on SQLite it
+    waits out the job's own write lock for up to one interval and retries
+    on the next beat.
+    """
+
+    def __init__(self, job, interval=HEARTBEAT_INTERVAL):
+        super().__init__(name=f'assessment-job-{job.id}-heartbeat', daemon=True)
+        self.job = job
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        connection = _side_connection(busy_timeout=self.interval * 1000)
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    _update_job(
+                        connection, self.job.id,
+                        {'heartbeat_at': connection.ops.adapt_datetimefield_value(timezone.now())},
+                        where=_claim(self.job, connection),
+                    )
+                except OperationalError:
+                    pass
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def _claim(job, connection):
+    """Column values identifying this run's claim on ``job``."""
+    return {
+        'status': 'running',
+        'worker': job.worker,
+        'started_at': connection.ops.adapt_datetimefield_value(job.started_at),
+    }
+
+
+def run_job(job):
+    """
+    Run a claimed job and record its outcome. If requeue_stale handed the job
+    to another run meanwhile, that run owns the outcome: nothing is written
+    and the job is returned as the database has it.
+    """
+    reporter = ProgressReporter(job)
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        message = JOB_HANDLERS[job.kind](job, reporter)
+    except Exception as e:
+        job.status = 'failed'
+        job.message = f"{type(e).__name__}: {e}"
+    else:
+        job.status = 'succeeded'
+        job.message = message or ''
+        job.progress = job.total or job.progress
+    finally:
+        heartbeat.stop()
+        reporter.close()
+    job.finished_at = timezone.now()
+    job.heartbeat_at = job.finished_at
+    finished = Job.objects.filter(
+        id=job.id, status='running', worker=job.worker, started_at=job.started_at,
+    ).update(
+        status=job.status, message=job.message, progress=job.progress, result_file=job.result_file,
+        finished_at=job.finished_at, heartbeat_at=job.heartbeat_at,
+    )
+    if not finished:
+        job.refresh_from_db()
+    return job
+
+
+def run_job_in_thread(job):
+    """Pool entry point: worker threads own their database connections."""
+    close_old_connections()
+    try:
+        return run_job(job)
+    finally:
+        close_old_connections()
+
+
+def result_path(job, filename):
+    """Reserve a name under MEDIA_ROOT/jobs/results/ and return (name, absolute path)."""
+    name = default_storage.get_available_name(f'jobs/results/{job.id}_{filename}')
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return name, path
+
+
+def write_stream(job, filename, chunks):
+    name, path = result_path(job, filename)
+    with open(path, 'wb') as result:
+        for chunk in chunks:
+            result.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    job.result_file.name = name
+
+
+def _count_rows(rows, reporter):
+    for count, row in enumerate(rows, start=1):
+        yield row
+        reporter(count)
+
+
+# ---------- JOB HANDLERS ---------- #
+
+@register('import_questions')
+def import_questions_job(job, reporter):
+    with job.input_file.open('rb') as input_file:
+        reporter.set_total(count_records(input_file))
+        if job.params.get('mode') == 'sync':
+            sync = QuestionSync(delete_missing=job.params.get('delete_missing', False), on_progress=reporter)
+            sync.run(input_file)
+            errors = sync.errors
+            message = (
+                f"{len(sync.new)} imported, {len(sync.changed)} updated, {len(sync.unchanged)} unchanged"
+                + (f", {len(sync.removed)} removed" if sync.delete_missing else "")
+                + (f", {len(sync.rescored)} assessments rescored" if sync.rescored else "")
+            )
+        else:
+            importer = QuestionImporter(on_progress=reporter).run(input_file)
+            errors = importer.errors
+            message = (
+                f"{importer.imported} imported, {importer.categories_created} categories created, "
+                f"{importer.inputs_created} standardized inputs created"
+            )
+
+    if errors:
+        name, path = result_path(job, 'import_errors.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as error_file:
+            write_error_log(errors, error_file)
+        job.result_file.name = name
+        message += f", {len(errors)} errors"
+    return message
+
+
+@register('export_assessment')
+def export_assessment_job(job, reporter):
+    assessment = Assessment.objects.select_related('customer').get(id=job.params['assessment_id'])
+    answers = UserAnswer.objects.filter(assessment=assessment).order_by('id')
+    reporter.set_total(answers.count())
+    _, extension, content = stream_rows(
+        SUMMARY_HEADER, _count_rows(summary_rows(answers), reporter), job.params.get('format', 'csv')
+    )
+    write_stream(job, f"Assessment_Summary_{assessment.customer.name}.{extension}", content)
+    return f"Exported {reporter.job.progress} answers"
+
+
+@register('export_assessments')
+def export_assessments_job(job, reporter):
+    answers = bulk_answers(
+        customer_id=job.params.get('customer_id'),
+        date_from=job.params.get('date_from'),
+        date_to=job.params.get('date_to'),
+    )
+    reporter.set_total(answers.count())
+    _, extension, content = stream_rows(
+        BULK_HEADER, _count_rows(bulk_rows(answers), reporter), job.params.get('format', 'csv'),
+        sheet_name='Assessments',
+    )
+    write_stream(job, f"Assessments.{extension}", content)
+    return f"Exported {reporter.job.progress} answers"
+
+
+@register('rebalance_question_order')
+def rebalance_question_order_job(job, reporter):
+    changed = rebalance_questions()
+    return f"Renumbered {changed} questions"
+
+
+@register('render_assessment_report')
+def render_assessment_report_job(job, reporter):
+    assessment = Assessment.objects.select_related('customer', 'scorecard').get(id=job.params['assessment_id'])
+    reporter.set_total(1)
+    job.result_file.name = render_report(assessment)
+    return f"Report for {assessment.customer.name} ready"
+
+
+@register('reindex_search')
+def reindex_search_job(job, reporter):
+    """Reindex the answers that chose one option, or rebuild the whole search index."""
+    option_id = job.params.get('selected_option_id')
+    if option_id is None:
+        return f"Indexed {rebuild_search_index(on_progress=reporter)} documents"
+    reporter.set_total(1)
+    count = index_answers(UserAnswer.objects.filter(selected_option_id=option_id))
+    reporter(1)
+    return f"Reindexed {count} answers"
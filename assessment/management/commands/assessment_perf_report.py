@@ -0,0 +1,65 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from assessment.perf import read_entries, summarise
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarise the request timings recorded by PerformanceMiddleware: p50/p95 of "
+        "total, view, database and template time and of the query count per URL name, "
+        "and the statements most often repeated within a single request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Stats file to read (default: settings.ASSESSMENT_PERF_LOG)')
+        parser.add_argument('--hours', type=float, help='Only include requests from the last N hours')
+        parser.add_argument('--url-name', help='Only include this URL name, e.g. assessment_summary')
+        parser.add_argument('--path', help='Only include request paths containing this text, e.g. /summary/42/')
+        parser.add_argument('--top', type=int, default=10, help='Repeated statements to list (default: 10)')
+
+    def handle(self, *args, file=None, hours=None, url_name=None, path=None, top=10, **options):
+        log_path = file or getattr(settings, 'ASSESSMENT_PERF_LOG', '')
+        if not log_path:
+            raise CommandError("No stats file: pass --file or set ASSESSMENT_PERF_LOG.")
+
+        since = time.time() - hours * 3600 if hours else None
+        entries = [
+            entry for entry in read_entries(log_path)
+            if (since is None or entry.get('ts', 0) >= since)
+            and (url_name is None or entry.get('url_name') == url_name)
+            and (path is None or path in entry.get('path', ''))
+        ]
+        if not entries:
+            self.stdout.write(f"No requests recorded in {log_path} match.")
+            return
+
+        header = (
+            f"{'URL name':<40} {'reqs':>6} {'p50 ms':>8} {'p95 ms':>8} {'view p95':>9} {'db p95':>8} "
+            f"{'tpl p95':>8} {'q p50':>6} {'q p95':>6} {'N+1':>5}"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in summarise(entries):
+            self.stdout.write(
+                f"{row['url_name'][:40]:<40} {row['requests']:>6} {row['total_ms_p50']:>8.1f} "
+                f"{row['total_ms_p95']:>8.1f} {row['view_ms_p95']:>9.1f} {row['db_ms_p95']:>8.1f} "
+                f"{row['template_ms_p95']:>8.1f} {row['queries_p50']:>6} {row['queries_p95']:>6} {row['repeated']:>5}"
+            )
+
+        repeated = Counter()
+        worst = {}
+        for entry in entries:
+            for statement in entry.get('repeated', ()):
+                key = (entry.get('url_name') or '(unresolved)', statement['sql'])
+                repeated[key] += 1
+                worst[key] = max(worst.get(key, 0), statement['count'])
+        if repeated and top:
+            self.stdout.write('')
+            self.stdout.write(self.style.WARNING("Statements repeated within one request (likely N+1):"))
+            for (name, sql), requests in repeated.most_common(top):
+                self.stdout.write(f"  {name}: {requests} requests, up to x{worst[(name, sql)]}")
+                self.stdout.write(f"    {sql}")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from assessment.models import Assessment
+from assessment.scorecards import freeze_scorecard
+from assessment.snapshot import get_question_bank_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the frozen scorecard of every completed assessment that has none, or whose "
+        "answers changed after it was written. Run once after upgrading; completing an "
+        "assessment freezes its scorecard from then on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('assessment_ids', nargs='*', type=int, help='Limit to these assessments')
+
+    def handle(self, *args, assessment_ids=None, **options):
+        snapshot = get_question_bank_snapshot()
+        assessments = Assessment.objects.filter(status='completed').exclude(
+            scorecard__answers_version=F('answers_version')
+        ).order_by('id')
+        if assessment_ids:
+            assessments = assessments.filter(id__in=assessment_ids)
+
+        count = 0
+        for assessment in assessments.iterator():
+            freeze_scorecard(assessment, snapshot)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Froze the scorecards of {count} completed assessments"))
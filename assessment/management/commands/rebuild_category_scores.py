@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from assessment.models import Assessment, CategoryScore, UserAnswer
+from assessment.scoring import rescore_assessment
+from assessment.snapshot import get_question_bank_snapshot
+
+
+def rollups_match(assessment_id, index):
+    expected = {}
+    for question_id, selected_option_id in UserAnswer.objects.filter(
+        assessment_id=assessment_id
+    ).values_list('question_id', 'selected_option_id'):
+        entry = index.get(question_id)
+        if entry is None:
+            continue
+        score, max_score, count = expected.get(entry.category_id, (0, 0, 0))
+        expected[entry.category_id] = (
+            score + index.score_answer(question_id, selected_option_id),
+            max_score + entry.max_score,
+            count + 1,
+        )
+    stored = {
+        category_id: (score, max_score, count)
+        for category_id, score, max_score, count in CategoryScore.objects.filter(
+            assessment_id=assessment_id
+        ).values_list('category_id', 'score', 'max_score', 'answer_count')
+    }
+    return expected == stored
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-resolve stored UserAnswer scores against the current question bank and "
+        "rebuild the per-category score rollups. Run after changing question weights "
+        "or option scores, or use --verify to only report drift. Completed assessments "
+        "with a frozen scorecard keep their scores unless --include-frozen is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('assessment_ids', nargs='*', type=int, help='Limit to these assessments')
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Report stale scores without writing; exits with an error if any are found',
+        )
+        parser.add_argument(
+            '--include-frozen',
+            action='store_true',
+            help='Also rescore completed assessments whose scorecard is frozen, freezing it again',
+        )
+
+    def handle(self, *args, assessment_ids=None, verify=False, include_frozen=False, **options):
+        index = get_question_bank_snapshot()
+        assessments = Assessment.objects.order_by('id')
+        if assessment_ids:
+            assessments = assessments.filter(id__in=assessment_ids)
+        if not include_frozen:
+            assessments = assessments.exclude(status='completed', scorecard__answers_version=F('answers_version'))
+
+        checked = 0
+        stale_answers = 0
+        stale_assessments = 0
+        stale_rollups = 0
+        for assessment_id in assessments.values_list('id', flat=True).iterator():
+            stale = rescore_assessment(assessment_id, index=index, commit=not verify)
+            checked += 1
+            if stale:
+                stale_answers += len(stale)
+                stale_assessments += 1
+                if verify:
+                    self.stdout.write(f"Assessment #{assessment_id}: {len(stale)} stale answer scores")
+            if verify and not rollups_match(assessment_id, index):
+                stale_rollups += 1
+                self.stdout.write(f"Assessment #{assessment_id}: category rollups out of date")
+
+        summary = f"{checked} assessments checked, {stale_answers} stale answer scores in {stale_assessments} assessments"
+        if verify:
+            summary += f", {stale_rollups} assessments with stale rollups"
+        if verify and (stale_answers or stale_rollups):
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary if verify else f"{summary} (rebuilt)"))
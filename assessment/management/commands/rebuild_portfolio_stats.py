@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from assessment.portfolio import rebuild_portfolio
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the portfolio dashboard tables from every completed assessment. "
+        "Run once after upgrading and whenever completed assessments were edited in bulk."
+    )
+
+    def handle(self, *args, **options):
+        count = rebuild_portfolio()
+        self.stdout.write(self.style.SUCCESS(f"Portfolio statistics rebuilt from {count} completed assessments"))
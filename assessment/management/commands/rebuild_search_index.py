@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from assessment.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Recreate the full-text search documents of every question and answer. "
+        "Run once after upgrading; saves and imports keep the index current after that."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Answers indexed per statement (default: 10000)')
+
+    def handle(self, *args, batch_size=10000, **options):
+        count = rebuild_search_index(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt with {count} documents"))
@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections
+
+from assessment.jobs import claim_next, requeue_stale, run_job_in_thread, worker_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued assessment jobs (CSV imports, exports) from the database-backed "
+        "job table. No external broker is needed; start one or more of these next to "
+        "the web server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help='Jobs run concurrently (default: 2)')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds between queue polls when idle')
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=600,
+            help='Requeue running jobs without a heartbeat for this many seconds (0 disables)',
+        )
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, threads=2, poll_interval=2.0, stale_after=600, once=False, **options):
+        name = worker_name()
+        self.stdout.write(f"Assessment worker {name} started with {threads} threads")
+        running = set()
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='assessment-job') as pool:
+            try:
+                while True:
+                    close_old_connections()
+                    running = {future for future in running if not future.done()}
+                    claimed = False
+                    try:
+                        if stale_after:
+                            requeued = requeue_stale(stale_after)
+                            if requeued:
+                                self.stdout.write(f"Requeued {requeued} stale jobs")
+
+                        while len(running) < threads:
+                            job = claim_next(name)
+                            if job is None:
+                                break
+                            claimed = True
+                            self.stdout.write(f"Running {job}")
+                            running.add(pool.submit(self._run, job))
+                    except OperationalError as e:
+                        # e.g. SQLite "database is locked" while a job is writing; retry on the next poll.
+                        self.stderr.write(f"Queue poll failed: {e}")
+                        claimed = True
+
+                    if once and not claimed and not running:
+                        break
+                    time.sleep(poll_interval if not claimed else 0.1)
+            except KeyboardInterrupt:
+                self.stdout.write("Stopping; waiting for running jobs to finish")
+
+    def _run(self, job):
+        job = run_job_in_thread(job)
+        self.stdout.write(f"Finished {job}: {job.message}")
+        return job
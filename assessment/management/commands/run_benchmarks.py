@@ -0,0 +1,88 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from assessment.benchmarks import (
+    BUDGETS_FILE, SCALES, SCENARIOS, check_budgets, compare_reports, load_budgets, run_benchmarks,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time and query-count the main assessment views against synthetic question banks "
+        "of several sizes. Runs in a throwaway test database, so existing data is never "
+        "touched. Write the results with --output and compare runs with --compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', action='append', choices=sorted(SCALES), dest='scales',
+            help='Scale to run; repeat for several (default: small and medium)',
+        )
+        parser.add_argument(
+            '--scenario', action='append', choices=sorted(SCENARIOS), dest='scenarios',
+            help='Scenario to run; repeat for several (default: all)',
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per scenario (default: 5)')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data (default: 0)')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='Earlier results file to show the differences against')
+        parser.add_argument(
+            '--check-budgets', action='store_true', dest='check',
+            help=f'Fail when a query count exceeds its budget in {BUDGETS_FILE}',
+        )
+
+    def handle(self, *args, scales=None, scenarios=None, repeat=5, seed=0, output=None, compare=None,
+               check=False, **options):
+        if repeat < 1:
+            raise CommandError("--repeat must be at least 1.")
+        previous = None
+        if compare:
+            with open(compare, encoding='utf-8') as previous_file:
+                previous = json.load(previous_file)
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # The throwaway database reuses ids, so it must not share the real cache.
+            with override_settings(CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 20000}},
+            }):
+                report = run_benchmarks(
+                    scales or ['small', 'medium'], scenarios, repeat=repeat, seed=seed,
+                    reset=lambda: call_command('flush', interactive=False, verbosity=0),
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'Scale':<8} {'Scenario':<28} {'queries':>8} {'median ms':>10} {'min ms':>9}")
+        for scale_name, results in report['results'].items():
+            for scenario, result in results.items():
+                self.stdout.write(
+                    f"{scale_name:<8} {scenario:<28} {result['queries']:>8} "
+                    f"{result['median_ms']:>10.1f} {result['min_ms']:>9.1f}"
+                )
+
+        if previous is not None:
+            self.stdout.write('')
+            self.stdout.write(f"Compared with {compare}:")
+            for scale_name, scenario, old, new in compare_reports(previous, report):
+                query_change = new['queries'] - old['queries']
+                time_change = (new['median_ms'] - old['median_ms']) / old['median_ms'] * 100 if old['median_ms'] else 0
+                line = f"{scale_name:<8} {scenario:<28} queries {query_change:+d}, median time {time_change:+.0f}%"
+                self.stdout.write(self.style.WARNING(line) if query_change > 0 else line)
+
+        if output:
+            with open(output, 'w', encoding='utf-8') as output_file:
+                json.dump(report, output_file, indent=2)
+            self.stdout.write(f"Results written to {output}")
+
+        if check:
+            failures = check_budgets(report, load_budgets())
+            if failures:
+                raise CommandError("Query budgets exceeded:\n" + "\n".join(failures))
+            self.stdout.write(self.style.SUCCESS("All query counts are within budget"))
@@ -0,0 +1,158 @@
+import mimetypes
+import os
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from . import perf
+
+# Collected names carry a 12-character content hash: bootstrap.min.1a2b3c4d5e6f.css
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+# Hashed files never change under the same URL; anything else is revalidated hourly.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+
+# Pre-compressed variants written by AssessmentStaticStorage, best first.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticFilesMiddleware:
+    """
+    Serve collected static files from STATIC_ROOT with far-future caching
+    for content-hashed names, picking the pre-compressed ``.br``/``.gz``
+    variant the client accepts. Requests for anything else pass through.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        self.root = settings.STATIC_ROOT
+
+    def __call__(self, request):
+        if self.root and request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix):
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except ValueError:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type, _ = mimetypes.guess_type(path)
+            accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+            served, encoding = path, None
+            for candidate, suffix in ENCODINGS:
+                if candidate in accepted and os.path.isfile(path + suffix):
+                    served, encoding = path + suffix, candidate
+                    break
+            response = FileResponse(
+                open(served, 'rb'),
+                content_type=content_type or 'application/octet-stream',
+                filename=os.path.basename(path),
+            )
+            # Stylesheets and scripts are displayed, never downloaded.
+            del response.headers['Content-Disposition']
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            response.headers['Last-Modified'] = http_date(stat.st_mtime)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        response.headers['Cache-Control'] = (
+            IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(name) else DEFAULT_CACHE_CONTROL
+        )
+        return response
+
+
+class PerformanceMiddleware:
+    """
+    Measure each request: SQL query count and time, statements repeated at
+    least ASSESSMENT_PERF_REPEAT_THRESHOLD times (likely N+1 loops), template
+    render time, view time and total time. The figures are returned in a
+    Server-Timing header to staff users (to everyone under DEBUG), so they
+    show up in the browser's network panel, and appended to the
+    ASSESSMENT_PERF_LOG stats file for assessment_perf_report. Only installed
+    when ASSESSMENT_PERF_ENABLED is set, which it is by default under DEBUG.
+
+    Queries run while a streaming response is iterated happen after the
+    response leaves the middleware and are not counted.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'ASSESSMENT_PERF_ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.log_path = getattr(settings, 'ASSESSMENT_PERF_LOG', '')
+        self.log_max_bytes = getattr(settings, 'ASSESSMENT_PERF_LOG_MAX_BYTES', 5 * 1024 * 1024)
+        self.repeat_threshold = getattr(settings, 'ASSESSMENT_PERF_REPEAT_THRESHOLD', 3)
+        perf.instrument_templates()
+
+    def __call__(self, request):
+        stats, token = perf.start_request()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(stats.record_query))
+                response = self.get_response(request)
+        finally:
+            perf.finish_request(token)
+
+        total = time.perf_counter() - stats.started
+        if stats.view_started is not None:
+            stats.view_time = time.perf_counter() - stats.view_started
+        repeated = stats.repeated(self.repeat_threshold)
+
+        timings = [
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.query_count} queries"',
+            f'tpl;dur={stats.template_time * 1000:.1f}',
+            f'view;dur={stats.view_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        if repeated:
+            timings.append(f'dup;desc="repeated statements: {len(repeated)}, worst x{repeated[0][1]}"')
+        # Timings and query counts describe the server; only staff get them.
+        user = getattr(request, 'user', None)
+        if settings.DEBUG or (user is not None and user.is_staff):
+            response.headers['Server-Timing'] = ', '.join(timings)
+
+        if self.log_path:
+            match = request.resolver_match
+            perf.append_entry(self.log_path, {
+                'ts': round(time.time(), 3),
+                'url_name': match.view_name if match else None,
+                'path': request.path,
+                'method': request.method,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                'view_ms': round(stats.view_time * 1000, 2),
+                'db_ms': round(stats.db_time * 1000, 2),
+                'template_ms': round(stats.template_time * 1000, 2),
+                'queries': stats.query_count,
+                'repeated': [
+                    {'sql': sql[:perf.SQL_PREVIEW_LENGTH], 'count': count} for sql, count in repeated[:5]
+                ],
+            }, self.log_max_bytes)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = perf.current_stats()
+        if stats is not None:
+            stats.view_started = time.perf_counter()
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0008_remove_question_standardized_inputs_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useranswer',
+            name='max_score',
+            field=models.IntegerField(blank=True, help_text='Highest score attainable for the question when answered', null=True),
+        ),
+        migrations.CreateModel(
+            name='CategoryScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.IntegerField(default=0)),
+                ('max_score', models.IntegerField(default=0)),
+                ('answer_count', models.IntegerField(default=0)),
+                ('assessment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_scores', to='assessment.assessment')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assessment_scores', to='assessment.category')),
+            ],
+            options={
+                'unique_together': {('assessment', 'category')},
+            },
+        ),
+    ]
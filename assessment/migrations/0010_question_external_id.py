@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0009_categoryscore_useranswer_max_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='external_id',
+            field=models.CharField(blank=True, help_text='Stable ID from the master question bank, used to match rows on CSV re-import', max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+# Mirrors assessment.ordering.ORDER_GAP at the time of this migration.
+ORDER_GAP = 1024
+
+
+def respace_question_order(apps, schema_editor):
+    # Order values stay unique across the bank and keep their sequence, so
+    # the admin changelist and the uncategorised question walk are unchanged.
+    Question = apps.get_model('assessment', 'Question')
+    changed = []
+    for position, question in enumerate(Question.objects.order_by('order', 'id').only('id', 'order'), start=1):
+        if question.order != position * ORDER_GAP:
+            question.order = position * ORDER_GAP
+            changed.append(question)
+    Question.objects.bulk_update(changed, ['order'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0011_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(respace_question_order, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:18
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def remove_duplicate_answers(apps, schema_editor):
+    """Keep the most recent answer when a question was answered more than once."""
+    UserAnswer = apps.get_model('assessment', 'UserAnswer')
+    duplicates = UserAnswer.objects.values('assessment_id', 'question_id').annotate(
+        answers=Count('id'), latest=Max('id')
+    ).filter(answers__gt=1).order_by()
+    for row in duplicates:
+        UserAnswer.objects.filter(
+            assessment_id=row['assessment_id'], question_id=row['question_id']
+        ).exclude(id=row['latest']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0012_respace_question_order'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_answers, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='useranswer',
+            unique_together={('assessment', 'question')},
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_date_answered(apps, schema_editor):
+    UserAnswer = apps.get_model('assessment', 'UserAnswer')
+    UserAnswer.objects.update(date_updated=F('date_answered'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0013_useranswer_unique_question'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useranswer',
+            name='date_updated',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='useranswer',
+            name='version',
+            field=models.PositiveIntegerField(default=1, help_text='Incremented on every change, used to detect sync conflicts'),
+        ),
+        migrations.RunPython(copy_date_answered, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0015_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessment',
+            name='in_portfolio',
+            field=models.BooleanField(default=False, editable=False, help_text='Counted in the portfolio statistics'),
+        ),
+        migrations.CreateModel(
+            name='PortfolioCategoryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('assessment_count', models.IntegerField(default=0)),
+                ('answer_count', models.IntegerField(default=0)),
+                ('score_total', models.IntegerField(default=0)),
+                ('max_score_total', models.IntegerField(default=0)),
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio_stat', to='assessment.category')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PortfolioQuestionStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answer_count', models.IntegerField(default=0)),
+                ('preferred_count', models.IntegerField(default=0, help_text='Answers that picked the preferred option')),
+                ('score_total', models.IntegerField(default=0)),
+                ('max_score_total', models.IntegerField(default=0)),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio_stat', to='assessment.question')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PortfolioAnswerStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answer_count', models.IntegerField(default=0)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio_answer_stats', to='assessment.question')),
+                ('selected_option', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='assessment.standardizedinput')),
+            ],
+            options={
+                'unique_together': {('question', 'selected_option')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0016_portfolio_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessment',
+            name='answers_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Incremented whenever an answer changes, keys cached quotes'),
+        ),
+    ]
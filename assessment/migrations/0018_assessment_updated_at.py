@@ -0,0 +1,20 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0017_assessment_answers_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Last change to the assessment or its answers'),
+            preserve_default=False,
+        ),
+    ]
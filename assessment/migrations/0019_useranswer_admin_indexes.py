@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0018_assessment_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useranswer',
+            index=models.Index(fields=['date_answered'], name='useranswer_date_answered'),
+        ),
+        migrations.AddIndex(
+            model_name='useranswer',
+            index=models.Index(condition=models.Q(('flag_required', True)), fields=['flag_required'], name='useranswer_flagged'),
+        ),
+    ]
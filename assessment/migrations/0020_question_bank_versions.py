@@ -0,0 +1,42 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0019_useranswer_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionBankVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(editable=False, max_length=40, unique=True)),
+                ('content', models.JSONField(editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AssessmentScorecard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answers_version', models.PositiveIntegerField(help_text='Answers version the scorecard was computed from')),
+                ('actual_score', models.IntegerField(default=0)),
+                ('max_score', models.IntegerField(default=0)),
+                ('answer_count', models.IntegerField(default=0)),
+                ('categories', models.JSONField(default=list, help_text='[name, score, max score, answer count] per category, in order')),
+                ('answers', models.JSONField(default=list, help_text='[category, [{question, answer, note}, ...]] in display order')),
+                ('quote', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('assessment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='scorecard', to='assessment.assessment')),
+                ('question_bank', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='scorecards', to='assessment.questionbankversion')),
+            ],
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.1.15 on 2026-10-18 07:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The full-text index over assessment_searchdocument is backend specific.
+# SQLite: an FTS5 table using the documents as external content, kept in
+# step by triggers. Django rebuilds SQLite tables on most schema changes,
+# which drops the triggers, so a later migration altering SearchDocument
+# must create them again.
+SQLITE_SQL = [
+    """
+    CREATE VIRTUAL TABLE assessment_search USING fts5(
+        title, body, content='assessment_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER assessment_search_insert AFTER INSERT ON assessment_searchdocument BEGIN
+        INSERT INTO assessment_search (rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER assessment_search_delete AFTER DELETE ON assessment_searchdocument BEGIN
+        INSERT INTO assessment_search (assessment_search, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER assessment_search_update AFTER UPDATE OF title, body ON assessment_searchdocument BEGIN
+        INSERT INTO assessment_search (assessment_search, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO assessment_search (rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS assessment_search_update",
+    "DROP TRIGGER IF EXISTS assessment_search_delete",
+    "DROP TRIGGER IF EXISTS assessment_search_insert",
+    "DROP TABLE IF EXISTS assessment_search",
+]
+
+# PostgreSQL: a generated tsvector column with a GIN index. The 'simple'
+# configuration keeps words such as "no" that the English one drops as stop
+# words but that are meaningful answers.
+POSTGRESQL_SQL = [
+    """
+    ALTER TABLE assessment_searchdocument ADD COLUMN vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX assessment_search_vector ON assessment_searchdocument USING gin (vector)",
+]
+
+POSTGRESQL_REVERSE_SQL = [
+    "DROP INDEX IF EXISTS assessment_search_vector",
+    "ALTER TABLE assessment_searchdocument DROP COLUMN IF EXISTS vector",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement)
+    return run
+
+
+create_search_index = _run({'sqlite': SQLITE_SQL, 'postgresql': POSTGRESQL_SQL})
+drop_search_index = _run({'sqlite': SQLITE_REVERSE_SQL, 'postgresql': POSTGRESQL_REVERSE_SQL})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0020_question_bank_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.TextField(help_text='Question text')),
+                ('body', models.TextField(blank=True, help_text='Explanation of a question; chosen option, answer text and note of an answer')),
+                ('answer', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='assessment.useranswer')),
+                ('assessment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='assessment.assessment')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='assessment.question')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('answer__isnull', True)), fields=('question',), name='searchdocument_one_per_question')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -79,6 +79,23 @@ class Customer(models.Model):
         return self.name
 
 
+class QuestionBankVersion(models.Model):
+    """
+    Immutable copy of the scoring side of the question bank: categories,
+    question weights and option scores. Identical banks share one row,
+    found by the digest of their content.
+    """
+    digest = models.CharField(max_length=40, unique=True, editable=False)
+    content = models.JSONField(editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Question bank {self.digest[:12]} ({self.created_at:%Y-%m-%d %H:%M})"
+
+
 class Assessment(models.Model):
     STATUS_CHOICES = (
         ('in_progress', 'In Progress'),
@@ -89,13 +106,24 @@ class Assessment(models.Model):
     date_started = models.DateTimeField(auto_now_add=True)
     date_completed = models.DateTimeField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
+    in_portfolio = models.BooleanField(default=False, editable=False, help_text='Counted in the portfolio statistics')
+    answers_version = models.PositiveIntegerField(
+        default=0, editable=False, help_text='Incremented whenever an answer changes, keys cached quotes'
+    )
+    updated_at = models.DateTimeField(auto_now=True, help_text='Last change to the assessment or its answers')
+
+    class Meta:
+        indexes = [
+            # start_assessment looks up the open assessment per customer and engineer.
+            models.Index(fields=['customer', 'employee', 'status'], name='assessment_customer_emp_status'),
+        ]
 
     def __str__(self):
         return f"Assessment #{self.id} - {self.customer.name} ({self.status})"
 
     @property
     def total_score(self):
-        return sum(answer.score or 0 for answer in self.answers.all())
+        return self.category_scores.aggregate(total=models.Sum('score'))['total'] or 0
 
 
 class Question(models.Model):
@@ -106,6 +134,13 @@ class Question(models.Model):
     )
 
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='questions')
+    external_id = models.CharField(
+        max_length=100,
+        unique=True,
+        blank=True,
+        null=True,
+        help_text='Stable ID from the master question bank, used to match rows on CSV re-import'
+    )
     text = models.TextField()
     explanation_text = models.TextField(blank=True, null=True)
     external_link = models.URLField(blank=True, null=True)
@@ -153,6 +188,10 @@ class Question(models.Model):
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            # Per-category ordering: navigation, reordering and gap ranks.
+            models.Index(fields=['category', 'order'], name='question_category_order'),
+        ]
 
 
 class QuestionInputOption(models.Model):
@@ -174,14 +213,167 @@ class UserAnswer(models.Model):
     answer_text = models.TextField(blank=True, null=True)
     selected_option = models.ForeignKey(StandardizedInput, on_delete=models.SET_NULL, blank=True, null=True)
     score = models.IntegerField(blank=True, null=True)
+    max_score = models.IntegerField(blank=True, null=True, help_text='Highest score attainable for the question when answered')
     flag_required = models.BooleanField(default=False)
     date_answered = models.DateTimeField(auto_now_add=True)
+    date_updated = models.DateTimeField(auto_now=True, db_index=True)
+    version = models.PositiveIntegerField(default=1, help_text='Incremented on every change, used to detect sync conflicts')
     note = models.TextField(blank=True, null=True, help_text='Optional note for explanation or context')
 
+    class Meta:
+        unique_together = ('assessment', 'question')
+        indexes = [
+            # Admin changelist date drill-down and "flagged" filter.
+            models.Index(fields=['date_answered'], name='useranswer_date_answered'),
+            models.Index(fields=['flag_required'], name='useranswer_flagged', condition=models.Q(flag_required=True)),
+        ]
+
     def __str__(self):
         return f"Answer to {self.question.text[:50]} (Assessment #{self.assessment.id})"
 
 
+class CategoryScore(models.Model):
+    """Per-category rollup of UserAnswer scores, maintained as answers are saved."""
+    assessment = models.ForeignKey(Assessment, on_delete=models.CASCADE, related_name='category_scores')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='assessment_scores')
+    score = models.IntegerField(default=0)
+    max_score = models.IntegerField(default=0)
+    answer_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('assessment', 'category')
+
+    def __str__(self):
+        return f"{self.category.name}: {self.score}/{self.max_score} (Assessment #{self.assessment_id})"
+
+
+class AssessmentScorecard(models.Model):
+    """
+    Denormalised result of a completed assessment, written on completion:
+    totals, per-category scores, the answer listing and the quote. Later
+    question-bank edits do not change it.
+    """
+    assessment = models.OneToOneField(Assessment, on_delete=models.CASCADE, related_name='scorecard')
+    question_bank = models.ForeignKey(QuestionBankVersion, on_delete=models.PROTECT, related_name='scorecards')
+    answers_version = models.PositiveIntegerField(help_text='Answers version the scorecard was computed from')
+    actual_score = models.IntegerField(default=0)
+    max_score = models.IntegerField(default=0)
+    answer_count = models.IntegerField(default=0)
+    categories = models.JSONField(default=list, help_text='[name, score, max score, answer count] per category, in order')
+    answers = models.JSONField(default=list, help_text='[category, [{question, answer, note}, ...]] in display order')
+    quote = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Scorecard of Assessment #{self.assessment_id}: {self.actual_score}/{self.max_score}"
+
+
+class PortfolioCategoryStat(models.Model):
+    """Per-category totals over all completed assessments, kept current by assessment.portfolio."""
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, related_name='portfolio_stat')
+    assessment_count = models.IntegerField(default=0)
+    answer_count = models.IntegerField(default=0)
+    score_total = models.IntegerField(default=0)
+    max_score_total = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.category.name}: {self.score_total}/{self.max_score_total} over {self.assessment_count} assessments"
+
+
+class PortfolioQuestionStat(models.Model):
+    """Per-question totals over all completed assessments."""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, related_name='portfolio_stat')
+    answer_count = models.IntegerField(default=0)
+    preferred_count = models.IntegerField(default=0, help_text='Answers that picked the preferred option')
+    score_total = models.IntegerField(default=0)
+    max_score_total = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.question}: {self.score_total}/{self.max_score_total}"
+
+
+class PortfolioAnswerStat(models.Model):
+    """How often each option was chosen for a question across completed assessments."""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='portfolio_answer_stats')
+    selected_option = models.ForeignKey(StandardizedInput, on_delete=models.CASCADE, blank=True, null=True)
+    answer_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('question', 'selected_option')
+
+    def __str__(self):
+        return f"{self.question}: {self.selected_option or 'Input'} x{self.answer_count}"
+
+
+class SearchDocument(models.Model):
+    """
+    Searchable text of one question (``answer`` empty) or one answer, kept
+    current by assessment.search. The full-text index over it (SQLite FTS5
+    or a PostgreSQL tsvector) is created by migration 0021.
+    """
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+    answer = models.OneToOneField(
+        UserAnswer, on_delete=models.CASCADE, blank=True, null=True, related_name='search_document'
+    )
+    assessment = models.ForeignKey(Assessment, on_delete=models.CASCADE, blank=True, null=True, related_name='+')
+    title = models.TextField(help_text='Question text')
+    body = models.TextField(blank=True, help_text='Explanation of a question; chosen option, answer text and note of an answer')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['question'], condition=models.Q(answer__isnull=True), name='searchdocument_one_per_question'
+            ),
+        ]
+
+    def __str__(self):
+        if self.answer_id:
+            return f"Answer #{self.answer_id}: {self.title[:50]}"
+        return f"Question #{self.question_id}: {self.title[:50]}"
+
+
+class Job(models.Model):
+    """Background import/export job, executed by ``manage.py run_assessment_worker``."""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    params = models.JSONField(default=dict, blank=True)
+    input_file = models.FileField(upload_to='jobs/input/', blank=True, null=True)
+    result_file = models.FileField(upload_to='jobs/results/', blank=True, null=True)
+    progress = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    message = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='assessment_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Job #{self.id} {self.kind} ({self.status})"
+
+    @property
+    def percent(self):
+        if self.status == 'succeeded':
+            return 100
+        if not self.total:
+            return 0
+        return min(100, int(self.progress * 100 / self.total))
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+
 class CSVUploadPlaceholder(models.Model):
     class Meta:
         verbose_name = "Upload Questions CSV"
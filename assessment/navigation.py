@@ -0,0 +1,172 @@
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .models import UserAnswer
+from .snapshot import get_question_bank_snapshot
+
+# How long an assessment's navigation state is kept in the cache backend.
+NAVIGATION_CACHE_TIMEOUT = 60 * 60 * 12
+
+CategoryEntry = namedtuple('CategoryEntry', ['id', 'name'])
+
+_order_memo = {'version': None, 'order': None}
+
+
+class QuestionOrder:
+    """
+    Ordered question ids for the whole bank and per category, plus the
+    position of every question inside them. Derived from the question-bank
+    snapshot once per bank version.
+    """
+
+    def __init__(self, version, ordered, by_category, categories):
+        self.version = version
+        self.ordered = ordered
+        self.by_category = by_category
+        self.categories = categories
+        self.category_of = {}
+        self.position = {}
+        for category_id, question_ids in by_category.items():
+            for position, question_id in enumerate(question_ids):
+                self.category_of[question_id] = category_id
+                self.position[question_id] = position
+        self.global_position = {question_id: position for position, question_id in enumerate(ordered)}
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        categories = sorted(
+            (snapshot.category(category_id) for category_id in snapshot.by_category if category_id is not None),
+            key=lambda category: (category.order, category.id),
+        )
+        return cls(
+            snapshot.version,
+            snapshot.ordered,
+            snapshot.by_category,
+            [CategoryEntry(category.id, category.name) for category in categories],
+        )
+
+    def scope(self, category_id=None):
+        if category_id is None:
+            return self.ordered
+        return self.by_category.get(category_id, [])
+
+    def category(self, category_id):
+        for entry in self.categories:
+            if entry.id == category_id:
+                return entry
+        return None
+
+
+def get_question_order():
+    snapshot = get_question_bank_snapshot()
+    if _order_memo['version'] != snapshot.version:
+        _order_memo['order'] = QuestionOrder.from_snapshot(snapshot)
+        _order_memo['version'] = snapshot.version
+    return _order_memo['order']
+
+
+def _state_key(assessment_id):
+    return f'assessment:navigation:{assessment_id}'
+
+
+class AssessmentNavigator:
+    """
+    Next/previous/progress lookups for one assessment.
+
+    The answered set is loaded once and kept in the cache backend next to a
+    per-category answered count and a cursor pointing at the first unanswered
+    question of each scope. Cursors only move forward while answers are added,
+    so finding the next question is amortised O(1).
+
+    The state is stored with the question-bank version and the assessment's
+    ``answers_version`` it is complete for; when either differs from the
+    current one the answered set is reloaded and the cursors and counts are
+    rebuilt. Writers bump ``answers_version`` with every answer save, so a
+    state that missed a concurrent save (two requests saving over each other,
+    or a sync) is never trusted: it is recomputed on the next request instead
+    of being patched by an unlocked read-modify-write.
+    """
+
+    def __init__(self, assessment):
+        self.assessment = assessment
+        self.order = get_question_order()
+        self.state = cache.get(_state_key(assessment.id)) or {'version': None}
+        self._dirty = False
+        if (self.state['version'], self.state.get('answers')) != (self.order.version, assessment.answers_version):
+            self._reset()
+
+    def _reset(self):
+        self.state['answered'] = set(
+            UserAnswer.objects.filter(assessment_id=self.assessment.id).values_list('question_id', flat=True)
+        )
+        counts = {}
+        for question_id in self.state['answered']:
+            category_id = self.order.category_of.get(question_id)
+            if category_id is not None:
+                counts[category_id] = counts.get(category_id, 0) + 1
+        self.state.update({
+            'version': self.order.version, 'answers': self.assessment.answers_version, 'counts': counts, 'cursors': {},
+        })
+        self._dirty = True
+
+    def save(self):
+        if self._dirty:
+            cache.set(_state_key(self.assessment.id), self.state, NAVIGATION_CACHE_TIMEOUT)
+            self._dirty = False
+
+    def is_answered(self, question_id):
+        return question_id in self.state['answered']
+
+    def next_unanswered(self, category_id=None):
+        question_ids = self.order.scope(category_id)
+        cursor = self.state['cursors'].get(category_id, 0)
+        start = cursor
+        answered = self.state['answered']
+        while cursor < len(question_ids) and question_ids[cursor] in answered:
+            cursor += 1
+        if cursor != start:
+            self.state['cursors'][category_id] = cursor
+            self._dirty = True
+        return question_ids[cursor] if cursor < len(question_ids) else None
+
+    def previous(self, question_id, category_id=None):
+        if category_id is None:
+            position = self.order.global_position.get(question_id)
+        else:
+            position = self.order.position.get(question_id)
+        if not position:
+            return None
+        return self.order.scope(category_id)[position - 1]
+
+    def progress(self, category_id=None):
+        """(current question number, total questions) for the given scope."""
+        if category_id is None:
+            answered = sum(self.state['counts'].values())
+        else:
+            answered = self.state['counts'].get(category_id, 0)
+        total = len(self.order.scope(category_id))
+        return min(answered + 1, total), total
+
+    def mark_answered(self, question_id):
+        """
+        Record an answer this request just saved. The state now also covers
+        that save, so it moves to the assessment's current answers_version;
+        if another save got in between, that version is already behind the
+        stored one and the state is reloaded next time.
+        """
+        if self.state['answers'] != self.assessment.answers_version:
+            self.state['answers'] = self.assessment.answers_version
+            self._dirty = True
+        if question_id in self.state['answered']:
+            return
+        self.state['answered'].add(question_id)
+        category_id = self.order.category_of.get(question_id)
+        if category_id is not None:
+            self.state['counts'][category_id] = self.state['counts'].get(category_id, 0) + 1
+        self._dirty = True
+
+
+def forget_navigation(assessment_id):
+    """Drop the cached state after answers were removed, so the next request reloads it."""
+    cache.delete(_state_key(assessment_id))
@@ -0,0 +1,141 @@
+from django.db import transaction
+
+from .models import Question
+from .snapshot import bump_question_bank_version
+
+# Spacing between consecutive order values. Order values are unique across
+# the whole bank, which the admin changelist and the uncategorised walk
+# through the questions sort on; a category's questions use a subsequence of
+# them. Moving an item takes the midpoint between its new neighbours, so a
+# gap of 1024 absorbs ten moves into the same spot before the bank has to
+# be renumbered.
+ORDER_GAP = 1024
+
+# Below this gap a background rebalance is requested after a move.
+REBALANCE_THRESHOLD = 8
+
+
+class StaleOrderError(Exception):
+    """The ordering changed since the client loaded it."""
+
+
+def reassign_orders(questions, ranking):
+    """
+    Hand the order values ``questions`` already hold back out in the sequence
+    given by ``ranking`` (question id to any sortable rank). Returns the
+    questions whose order changed, with the new value set.
+    """
+    values = sorted(question.order for question in questions)
+    changed = []
+    for question, order in zip(sorted(questions, key=lambda question: ranking[question.id]), values):
+        if question.order != order:
+            question.order = order
+            changed.append(question)
+    return changed
+
+
+def rank_between(before, after, gap=ORDER_GAP):
+    """
+    Order value for an item placed between two neighbours (either may be
+    None at the ends of the list), or None when there is no integer room.
+    """
+    if before is None and after is None:
+        return gap
+    if before is None:
+        return after - gap
+    if after is None:
+        return before + gap
+    if after - before < 2:
+        return None
+    return before + (after - before) // 2
+
+
+def rebalance_questions(gap=ORDER_GAP):
+    """Renumber the whole bank to evenly spaced order values, keeping the sequence. Returns rows changed."""
+    with transaction.atomic():
+        questions = list(Question.objects.select_for_update().order_by('order', 'id').only('id', 'order'))
+        changed = []
+        for position, question in enumerate(questions, start=1):
+            if question.order != position * gap:
+                question.order = position * gap
+                changed.append(question)
+        if changed:
+            Question.objects.bulk_update(changed, ['order'], batch_size=1000)
+            transaction.on_commit(bump_question_bank_version)
+    return len(changed)
+
+
+def _free_rank(question_id, before, after):
+    """
+    (order, room) for a question placed between two category neighbours:
+    an order value no other question of the bank holds, directly after
+    ``before`` (or directly before ``after`` at the top of the category) in
+    the gap to the next question of any category, and the distance left to
+    the closer side of that gap. The order is None when there is no integer
+    room left.
+    """
+    others = Question.objects.exclude(id=question_id)
+    if before is not None:
+        lower = before.order
+        upper = others.filter(order__gt=lower).order_by('order').values_list('order', flat=True).first()
+    else:
+        upper = after.order
+        lower = others.filter(order__lt=upper).order_by('-order').values_list('order', flat=True).first()
+    order = rank_between(lower, upper)
+    if order is None:
+        return None, 0
+    return order, min(order - lower if lower is not None else ORDER_GAP, upper - order if upper is not None else ORDER_GAP)
+
+
+def move_question(question_id, before_id=None, after_id=None):
+    """
+    Place a question between two neighbours of its category, writing only the
+    moved row. ``before_id`` is the question now directly above it and
+    ``after_id`` the one directly below (None at either end of the list).
+
+    Raises StaleOrderError when the neighbours are no longer adjacent, i.e.
+    the list changed since the client rendered it. When there is no room
+    left next to the neighbours the bank is renumbered inline first. Returns
+    (new order, needs_rebalance) where needs_rebalance signals that the gaps
+    around the moved row are running out.
+    """
+    ids = [pk for pk in (question_id, before_id, after_id) if pk is not None]
+    with transaction.atomic():
+        rows = {
+            question.id: question
+            for question in Question.objects.select_for_update().filter(id__in=ids).only('id', 'category_id', 'order')
+        }
+        if len(rows) != len(set(ids)):
+            raise ValueError("Unknown question id.")
+        question = rows[question_id]
+        before = rows.get(before_id)
+        after = rows.get(after_id)
+        if any(neighbour.category_id != question.category_id for neighbour in (before, after) if neighbour):
+            raise ValueError("Questions can only be moved within their category.")
+
+        siblings = Question.objects.filter(category_id=question.category_id).exclude(id=question_id)
+        if before and after:
+            between = siblings.filter(order__gt=before.order, order__lt=after.order)
+        elif before:
+            between = siblings.filter(order__gt=before.order)
+        elif after:
+            between = siblings.filter(order__lt=after.order)
+        else:
+            between = siblings
+        if (before and after and before.order >= after.order) or between.exists():
+            raise StaleOrderError("The question order changed since this page was loaded. Reload and try again.")
+        if before is None and after is None:
+            # The only question of its category: nothing to move.
+            return question.order, False
+
+        new_order, room = _free_rank(question_id, before, after)
+        if new_order is None:
+            rebalance_questions()
+            before = before and Question.objects.only('order').get(id=before.id)
+            after = after and Question.objects.only('order').get(id=after.id)
+            new_order, room = _free_rank(question_id, before, after)
+
+        Question.objects.filter(id=question_id).update(order=new_order)
+        transaction.on_commit(bump_question_bank_version)
+
+    return new_order, room < REBALANCE_THRESHOLD
@@ -0,0 +1,202 @@
+"""
+Minimal PDF writer: text in the standard Helvetica fonts, lines, rectangles
+and filled polygons. Enough for the assessment report without a rendering
+engine, fonts on disk or network access; the standard fonts are built into
+every PDF viewer, so nothing is embedded.
+"""
+import unicodedata
+import zlib
+
+# US Letter, in points.
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+
+FONTS = {False: ('F1', 'Helvetica'), True: ('F2', 'Helvetica-Bold')}
+
+# Glyph widths (1/1000 em) of printable ASCII, from the Adobe AFM metrics.
+_WIDTHS = {
+    False: (
+        278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+        1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+        333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+        556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+    ),
+    True: (
+        278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+        975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+        333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+        611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+    ),
+}
+_DEFAULT_WIDTH = 556
+
+
+def text_width(text, size, bold=False):
+    widths = _WIDTHS[bold]
+    return sum(
+        widths[ord(char) - 32] if 32 <= ord(char) < 127 else _DEFAULT_WIDTH for char in text
+    ) * size / 1000
+
+
+def wrap_text(text, width, size, bold=False):
+    """Split text into lines no wider than ``width``, breaking on spaces where possible."""
+    lines = []
+    for paragraph in str(text).splitlines() or ['']:
+        line = ''
+        for word in paragraph.split(' '):
+            candidate = f'{line} {word}' if line else word
+            if text_width(candidate, size, bold) <= width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            # Words longer than a line are broken by character.
+            while text_width(word, size, bold) > width and len(word) > 1:
+                cut = len(word) - 1
+                while cut > 1 and text_width(word[:cut], size, bold) > width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+            line = word
+        lines.append(line)
+    return lines
+
+
+def _number(value):
+    return f'{value:.2f}'.rstrip('0').rstrip('.') if isinstance(value, float) else str(value)
+
+
+def _color(rgb):
+    return ' '.join(_number(channel / 255) for channel in rgb)
+
+
+# Latin letters with a stroke, which have no Unicode decomposition.
+_STROKED = {'Ł': b'L', 'ł': b'l', 'Đ': b'D', 'đ': b'd', 'Ħ': b'H', 'ħ': b'h', 'Ŧ': b'T', 'ŧ': b't'}
+
+
+def _winansi(char):
+    """
+    ``char`` in WinAnsiEncoding; characters outside it lose their accents
+    (Ł, ő, ș become L, o, s) or, failing that, become '?'.
+    """
+    try:
+        return char.encode('cp1252')
+    except UnicodeEncodeError:
+        base = unicodedata.normalize('NFKD', char).encode('ascii', errors='ignore')
+        return base or _STROKED.get(char, b'?')
+
+
+def _string(text):
+    """PDF literal string in WinAnsiEncoding (see _winansi for other characters)."""
+    out = []
+    for byte in b''.join(_winansi(char) for char in str(text)):
+        if byte in (0x28, 0x29, 0x5c):
+            out.append('\\' + chr(byte))
+        elif 32 <= byte < 127:
+            out.append(chr(byte))
+        else:
+            out.append(f'\\{byte:03o}')
+    return '(' + ''.join(out) + ')'
+
+
+def _text_string(text):
+    """PDF text string (document metadata) as UTF-16 with a byte order mark."""
+    return '<FEFF' + str(text).encode('utf-16-be').hex().upper() + '>'
+
+
+class PdfCanvas:
+    """
+    Pages of drawing operations in PDF user space (origin at the bottom
+    left, units in points). ``render()`` returns the finished document.
+    """
+
+    def __init__(self, title=''):
+        self.title = title
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.ops = []
+        self.pages.append(self.ops)
+
+    def text(self, x, y, text, size=10, bold=False, color=(0, 0, 0), align='left'):
+        if align != 'left':
+            width = text_width(text, size, bold)
+            x -= width if align == 'right' else width / 2
+        self.ops.append(
+            f'BT /{FONTS[bold][0]} {_number(size)} Tf {_color(color)} rg '
+            f'{_number(x)} {_number(y)} Td {_string(text)} Tj ET'
+        )
+
+    def line(self, x1, y1, x2, y2, color=(0, 0, 0), width=1):
+        self.ops.append(
+            f'{_color(color)} RG {_number(width)} w {_number(x1)} {_number(y1)} m {_number(x2)} {_number(y2)} l S'
+        )
+
+    def rect(self, x, y, width, height, fill=None, stroke=None, line_width=1):
+        self._paint(f'{_number(x)} {_number(y)} {_number(width)} {_number(height)} re', fill, stroke, line_width)
+
+    def polygon(self, points, fill=None, stroke=None, line_width=1):
+        (x, y), rest = points[0], points[1:]
+        path = [f'{_number(x)} {_number(y)} m'] + [f'{_number(x)} {_number(y)} l' for x, y in rest] + ['h']
+        self._paint(' '.join(path), fill, stroke, line_width)
+
+    def _paint(self, path, fill, stroke, line_width):
+        ops = []
+        if fill is not None:
+            ops.append(f'{_color(fill)} rg')
+        if stroke is not None:
+            ops.append(f'{_color(stroke)} RG {_number(line_width)} w')
+        ops.append(path)
+        ops.append('B' if fill is not None and stroke is not None else 'f' if fill is not None else 'S')
+        self.ops.append(' '.join(ops))
+
+    def render(self):
+        objects = []
+
+        def add(body):
+            objects.append(body)
+            return len(objects)
+
+        catalog = add(None)
+        pages = add(None)
+        fonts = {
+            bold: add(f'<< /Type /Font /Subtype /Type1 /BaseFont /{name} /Encoding /WinAnsiEncoding >>'.encode())
+            for bold, (_, name) in FONTS.items()
+        }
+        resources = '<< /Font << ' + ' '.join(f'/{FONTS[bold][0]} {ref} 0 R' for bold, ref in fonts.items()) + ' >> >>'
+
+        kids = []
+        for ops in self.pages:
+            stream = zlib.compress('\n'.join(ops).encode('latin-1'))
+            content = add(
+                f'<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n'.encode('latin-1')
+                + stream + b'\nendstream'
+            )
+            kids.append(add(
+                f'<< /Type /Page /Parent {pages} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+                f'/Resources {resources} /Contents {content} 0 R >>'.encode()
+            ))
+        objects[catalog - 1] = f'<< /Type /Catalog /Pages {pages} 0 R >>'.encode()
+        objects[pages - 1] = (
+            f'<< /Type /Pages /Kids [{" ".join(f"{kid} 0 R" for kid in kids)}] /Count {len(kids)} >>'.encode()
+        )
+        info = add(f'<< /Title {_text_string(self.title)} /Producer (Cyber Assessment) >>'.encode())
+
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+        xref = len(output)
+        output += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+        output += b''.join(f'{offset:010d} 00000 n \n'.encode() for offset in offsets)
+        output += (
+            f'trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R /Info {info} 0 R >>\n'
+            f'startxref\n{xref}\n%%EOF\n'
+        ).encode()
+        return bytes(output)
@@ -0,0 +1,161 @@
+"""
+Per-request performance statistics: SQL query count and time, repeated
+statements (the usual sign of an N+1 loop), template render time and view
+time. PerformanceMiddleware collects them, sends them back as a
+Server-Timing header and appends them to a rolling JSON-lines file that
+``manage.py assessment_perf_report`` summarises.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.template.backends import django as django_backend
+
+# Stats of the request being handled by this thread / task.
+_current = ContextVar('assessment_request_stats', default=None)
+
+_write_lock = threading.Lock()
+
+# Characters of each repeated statement kept in the stats file.
+SQL_PREVIEW_LENGTH = 200
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_time = 0.0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.statements = Counter()
+
+    @property
+    def query_count(self):
+        return sum(self.statements.values())
+
+    def repeated(self, threshold):
+        """(sql, count) of statements run at least ``threshold`` times, most repeated first."""
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= threshold]
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            # Grouped by the statement text, so the same query with different
+            # parameters counts as a repeat.
+            self.statements[sql] += 1
+
+
+def current_stats():
+    return _current.get()
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+# ---------- TEMPLATES ---------- #
+
+def _timed_render(render):
+    def wrapper(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return render(self, context, request)
+        # Only the outermost render is timed; nested renders are part of it.
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.perf_counter() - started
+
+    wrapper.timed = True
+    return wrapper
+
+
+def instrument_templates():
+    """Time every Django template render (render(), render_to_string()). Safe to call repeatedly."""
+    template = django_backend.Template
+    if not getattr(template.render, 'timed', False):
+        template.render = _timed_render(template.render)
+
+
+# ---------- STATS FILE ---------- #
+
+def append_entry(path, entry, max_bytes):
+    """
+    Append one JSON line, moving the file to ``path.1`` once it exceeds
+    ``max_bytes``. The lock only covers the threads of this process.
+    """
+    line = json.dumps(entry, separators=(',', ':')) + '\n'
+    with _write_lock:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            if os.path.getsize(path) >= max_bytes:
+                os.replace(path, path + '.1')
+        except FileNotFoundError:
+            pass
+        with open(path, 'a', encoding='utf-8') as stats_file:
+            stats_file.write(line)
+
+
+def read_entries(path):
+    """Entries of the rotated file followed by the current one; unreadable lines are skipped."""
+    for name in (path + '.1', path):
+        try:
+            stats_file = open(name, encoding='utf-8')
+        except FileNotFoundError:
+            continue
+        with stats_file:
+            for line in stats_file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values``; None when there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarise(entries):
+    """
+    Per URL name: request count, p50/p95 of total, view, DB and template
+    milliseconds and of the query count, plus how many requests repeated a
+    statement. Slowest p95 first.
+    """
+    groups = {}
+    for entry in entries:
+        groups.setdefault(entry.get('url_name') or '(unresolved)', []).append(entry)
+
+    rows = []
+    for url_name, group in groups.items():
+        row = {'url_name': url_name, 'requests': len(group)}
+        for field in ('total_ms', 'view_ms', 'db_ms', 'template_ms', 'queries'):
+            values = [entry.get(field, 0) for entry in group]
+            row[f'{field}_p50'] = percentile(values, 0.5)
+            row[f'{field}_p95'] = percentile(values, 0.95)
+        row['repeated'] = sum(1 for entry in group if entry.get('repeated'))
+        rows.append(row)
+    return sorted(rows, key=lambda row: row['total_ms_p95'], reverse=True)
@@ -0,0 +1,222 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, FilteredRelation, FloatField, Q, Sum
+from django.db.models.functions import Cast, NullIf
+
+from .models import (
+    Assessment, PortfolioAnswerStat, PortfolioCategoryStat, PortfolioQuestionStat, UserAnswer,
+)
+from .snapshot import get_question_bank_snapshot
+
+# Questions listed in the "weakest controls" table of the dashboard.
+WEAKEST_CONTROLS = 15
+
+
+# ---------- AGGREGATES ---------- #
+
+def category_totals(answers):
+    return answers.values(key=F('question__category_id')).annotate(
+        assessment_count=Count('assessment_id', distinct=True),
+        answer_count=Count('id'),
+        score_total=Sum('score'),
+        max_score_total=Sum('max_score'),
+    ).order_by()
+
+
+def question_totals(answers):
+    """Per-question totals; joins the answer's option row to count preferred answers."""
+    return answers.annotate(
+        chosen_option=FilteredRelation(
+            'question__input_options',
+            condition=Q(question__input_options__standardized_input=F('selected_option')),
+        ),
+    ).values(key=F('question_id')).annotate(
+        answer_count=Count('id'),
+        preferred_count=Count('id', filter=Q(chosen_option__is_preferred=True)),
+        score_total=Sum('score'),
+        max_score_total=Sum('max_score'),
+    ).order_by()
+
+
+def answer_totals(answers):
+    return answers.values('question_id', 'selected_option_id').annotate(answer_count=Count('id')).order_by()
+
+
+# (stat model, key fields, aggregate function, summed fields)
+STAT_TABLES = (
+    (PortfolioCategoryStat, ('category_id',), category_totals,
+     ('assessment_count', 'answer_count', 'score_total', 'max_score_total')),
+    (PortfolioQuestionStat, ('question_id',), question_totals,
+     ('answer_count', 'preferred_count', 'score_total', 'max_score_total')),
+    (PortfolioAnswerStat, ('question_id', 'selected_option_id'), answer_totals,
+     ('answer_count',)),
+)
+
+
+def _row_key(row, key_fields):
+    if 'key' in row:
+        return (row['key'],)
+    return tuple(row[field] for field in key_fields)
+
+
+# ---------- REFRESH ---------- #
+
+def _add_totals(model, key_fields, rows, fields, sign=1):
+    """Add (or subtract) aggregate rows to a stat table: one locked read, one bulk update, one bulk insert."""
+    deltas = {_row_key(row, key_fields): row for row in rows if _row_key(row, key_fields)[0] is not None}
+    if not deltas:
+        return
+    filters = {f'{key_fields[0]}__in': {key[0] for key in deltas}}
+    existing = {
+        tuple(getattr(stat, field) for field in key_fields): stat
+        for stat in model.objects.select_for_update().filter(**filters)
+    }
+    changed = []
+    created = []
+    for key, row in deltas.items():
+        stat = existing.get(key)
+        if stat is None:
+            stat = model(**dict(zip(key_fields, key)))
+            created.append(stat)
+        else:
+            changed.append(stat)
+        for field in fields:
+            setattr(stat, field, getattr(stat, field) + sign * (row[field] or 0))
+    model.objects.bulk_update(changed, fields, batch_size=500)
+    model.objects.bulk_create(created, batch_size=500)
+
+
+def add_assessment(assessment_id):
+    """
+    Fold one completed assessment into the portfolio tables. The in_portfolio
+    flag is claimed with a conditional UPDATE, so an assessment is counted
+    once even when it is completed twice concurrently.
+    """
+    with transaction.atomic():
+        claimed = Assessment.objects.filter(
+            id=assessment_id, status='completed', in_portfolio=False
+        ).update(in_portfolio=True)
+        if not claimed:
+            return False
+        answers = UserAnswer.objects.filter(assessment_id=assessment_id)
+        for model, key_fields, totals, fields in STAT_TABLES:
+            _add_totals(model, key_fields, totals(answers), fields)
+    return True
+
+
+def remove_assessment(assessment_id):
+    """Take an assessment back out, e.g. before its answers are changed after completion."""
+    with transaction.atomic():
+        released = Assessment.objects.filter(id=assessment_id, in_portfolio=True).update(in_portfolio=False)
+        if not released:
+            return False
+        answers = UserAnswer.objects.filter(assessment_id=assessment_id)
+        for model, key_fields, totals, fields in STAT_TABLES:
+            _add_totals(model, key_fields, totals(answers), fields, sign=-1)
+    return True
+
+
+@contextmanager
+def answers_changing(assessment):
+    """
+    Wrap writes to the answers of an assessment. One already counted in the
+    portfolio has its contribution taken out first and re-added after; a
+    completed one gets its scorecard frozen again from the new answers, so
+    an edit after completion never leaves it rendering from the live bank.
+    Callers bump the answers version (touch_answers) inside the block.
+    """
+    counted = assessment.in_portfolio
+    if not counted and assessment.status != 'completed':
+        yield
+        return
+    # scorecards imports scoring, which imports this module.
+    from .scorecards import freeze_scorecard
+    with transaction.atomic():
+        if counted:
+            remove_assessment(assessment.id)
+        yield
+        if counted:
+            add_assessment(assessment.id)
+        if assessment.status == 'completed':
+            freeze_scorecard(assessment)
+
+
+def rebuild_portfolio():
+    """Recompute every portfolio table from all completed assessments."""
+    answers = UserAnswer.objects.filter(assessment__status='completed')
+    with transaction.atomic():
+        for model, key_fields, totals, fields in STAT_TABLES:
+            model.objects.all().delete()
+            model.objects.bulk_create(
+                [
+                    model(**dict(zip(key_fields, _row_key(row, key_fields))), **{field: row[field] or 0 for field in fields})
+                    for row in totals(answers) if _row_key(row, key_fields)[0] is not None
+                ],
+                batch_size=500,
+            )
+        Assessment.objects.filter(status='completed').update(in_portfolio=True)
+        Assessment.objects.exclude(status='completed').update(in_portfolio=False)
+    return Assessment.objects.filter(in_portfolio=True).count()
+
+
+# ---------- DASHBOARD ---------- #
+
+def _percent(part, whole):
+    return round(100 * part / whole, 1) if whole else 0
+
+
+def load_dashboard(limit=WEAKEST_CONTROLS):
+    """Read the portfolio tables into the shape the dashboard renders."""
+    snapshot = get_question_bank_snapshot()
+
+    categories = []
+    for stat in PortfolioCategoryStat.objects.all():
+        category = snapshot.category(stat.category_id)
+        if category is None:
+            continue
+        categories.append({
+            'order': (category.order, category.name),
+            'name': category.name,
+            'assessments': stat.assessment_count,
+            'average_score': round(stat.score_total / stat.assessment_count, 1) if stat.assessment_count else 0,
+            'risk_percent': _percent(stat.score_total, stat.max_score_total),
+        })
+    categories.sort(key=lambda row: row['order'])
+
+    weakest = list(
+        PortfolioQuestionStat.objects.filter(max_score_total__gt=0).annotate(
+            risk=Cast('score_total', FloatField()) / NullIf('max_score_total', 0),
+        ).order_by('-risk', '-answer_count')[:limit]
+    )
+    distribution = {}
+    for stat in PortfolioAnswerStat.objects.filter(question_id__in=[row.question_id for row in weakest]):
+        distribution.setdefault(stat.question_id, []).append(stat)
+
+    controls = []
+    for stat in weakest:
+        question = snapshot.get(stat.question_id)
+        if question is None:
+            continue
+        options = sorted(distribution.get(stat.question_id, []), key=lambda row: -row.answer_count)
+        controls.append({
+            'question': question.text,
+            'category': question.category,
+            'answers': stat.answer_count,
+            'risk_percent': _percent(stat.score_total, stat.max_score_total),
+            'preferred_percent': _percent(stat.preferred_count, stat.answer_count),
+            'distribution': [
+                {
+                    'option': question.option_text(row.selected_option_id) or ('Input' if row.selected_option_id is None else '?'),
+                    'count': row.answer_count,
+                    'percent': _percent(row.answer_count, stat.answer_count),
+                }
+                for row in options
+            ],
+        })
+
+    return {
+        'assessment_count': Assessment.objects.filter(in_portfolio=True).count(),
+        'categories': categories,
+        'controls': controls,
+    }
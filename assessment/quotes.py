@@ -0,0 +1,106 @@
+import re
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db.models import F, FilteredRelation, Q
+
+from .models import UserAnswer
+from .snapshot import get_question_bank_version
+
+# Quotes are stored per (assessment, answers version, bank version); any
+# answer change or question-bank/product change moves to a new key and
+# retired quotes age out.
+QUOTE_CACHE_TIMEOUT = 60 * 60 * 24
+
+_NUMBER = re.compile(r'\d[\d,]*')
+
+# One product on the quote. ``quantity`` is None when the product is sized
+# by a count that was not answered.
+QuoteLine = namedtuple('QuoteLine', [
+    'product_id', 'item_number', 'name', 'description', 'unit_type', 'count_type', 'quantity', 'question_ids',
+])
+
+Quote = namedtuple('Quote', ['assessment_id', 'counts', 'lines', 'units', 'missing_counts'])
+
+
+def parse_count(text):
+    """First whole number in a count answer ("1,200 laptops" -> 1200), or None."""
+    match = _NUMBER.search(text or '')
+    return int(match.group().replace(',', '')) if match else None
+
+
+def quote_answers(assessment_id):
+    """
+    Every answer that matters for the quote in one query: count answers and
+    answers to questions with a recommended product, with the product and
+    whether the chosen option is the preferred one.
+    """
+    return UserAnswer.objects.filter(
+        Q(question__is_count_question=True) | Q(question__recommended_product__isnull=False),
+        assessment_id=assessment_id,
+    ).annotate(
+        chosen_option=FilteredRelation(
+            'question__input_options',
+            condition=Q(question__input_options__standardized_input=F('selected_option')),
+        ),
+    ).values_list(
+        'question_id', 'question__is_count_question', 'question__count_type', 'answer_text',
+        'chosen_option__is_preferred', 'question__recommended_product_id',
+        'question__recommended_product__item_number', 'question__recommended_product__name',
+        'question__recommended_product__description', 'question__recommended_product__unit_type',
+        'question__recommended_product__quantity_source_count_type',
+    ).order_by('question_id')
+
+
+def build_quote(assessment_id):
+    """
+    Resolve the counts an assessment collected and turn every non-preferred
+    answer to a question with a recommended product into a quote line. A
+    product recommended by several questions is quoted once, sized by its
+    ``quantity_source_count_type`` count (or 1 when it has none).
+    """
+    counts = {}
+    products = {}
+    for (
+        question_id, is_count, count_type, answer_text, is_preferred, product_id,
+        item_number, name, description, unit_type, quantity_source,
+    ) in quote_answers(assessment_id):
+        if is_count and count_type:
+            value = parse_count(answer_text)
+            if value is not None:
+                # Several count questions of one type add up (e.g. desktops and laptops).
+                counts[count_type] = counts.get(count_type, 0) + value
+        if product_id is not None and is_preferred is False:
+            line = products.setdefault(product_id, {
+                'product_id': product_id, 'item_number': item_number, 'name': name,
+                'description': description or '', 'unit_type': unit_type,
+                'count_type': quantity_source, 'question_ids': [],
+            })
+            line['question_ids'].append(question_id)
+
+    lines = []
+    units = {}
+    missing_counts = set()
+    for line in sorted(products.values(), key=lambda line: (line['name'], line['item_number'])):
+        quantity = counts.get(line['count_type']) if line['count_type'] else 1
+        if quantity is None:
+            missing_counts.add(line['count_type'])
+        else:
+            units[line['unit_type']] = units.get(line['unit_type'], 0) + quantity
+        lines.append(QuoteLine(quantity=quantity, **dict(line, question_ids=tuple(line['question_ids']))))
+
+    return Quote(assessment_id, counts, tuple(lines), units, tuple(sorted(missing_counts)))
+
+
+def _quote_key(assessment):
+    return f'assessment:quote:{assessment.id}:{assessment.answers_version}:{get_question_bank_version()}'
+
+
+def get_quote(assessment):
+    """Cached quote for the assessment's current answers."""
+    key = _quote_key(assessment)
+    quote = cache.get(key)
+    if quote is None:
+        quote = build_quote(assessment.id)
+        cache.set(key, quote, QUOTE_CACHE_TIMEOUT)
+    return quote
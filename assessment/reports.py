@@ -0,0 +1,278 @@
+import math
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .models import UserAnswer
+from .pdf import PAGE_HEIGHT, PAGE_WIDTH, PdfCanvas, text_width, wrap_text
+from .quotes import get_quote
+from .scoring import RADAR_SCALE, category_rollups, group_answers, radar_values
+from .scorecards import bank_marker, frozen_scorecard, scorecard_quote
+from .snapshot import get_question_bank_snapshot
+
+# Bump whenever the report layout changes so cached PDFs are re-rendered.
+REPORT_VERSION = 1
+
+# Rendered reports, under MEDIA_ROOT.
+REPORT_DIR = 'reports'
+
+MARGIN = 54
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+
+TEXT = (51, 55, 59)
+MUTED = (108, 117, 125)
+TEAL = (45, 212, 191)
+TEAL_FILL = (178, 240, 232)
+GRID = (210, 214, 218)
+NOTE_FILL = (240, 244, 248)
+GAUGE_STOPS = ((0, (34, 197, 94)), (0.33, (234, 179, 8)), (0.66, (249, 115, 22)), (1, (239, 68, 68)))
+
+
+# ---------- CACHE ---------- #
+
+def report_name(assessment):
+    """Storage name of the report for the assessment's current answers, bank and layout."""
+    return (
+        f'{REPORT_DIR}/Assessment_Report_{assessment.id}_v{assessment.answers_version}_'
+        f'{bank_marker(assessment)[:12]}_r{REPORT_VERSION}.pdf'
+    )
+
+
+def cached_report(assessment):
+    name = report_name(assessment)
+    return name if default_storage.exists(name) else None
+
+
+def render_report(assessment):
+    """
+    Return the storage name of the assessment's report, rendering it first
+    if it is not cached yet. Older renders of the same assessment are removed.
+    Only the storage API is used, so reports work on any storage backend.
+    """
+    name = report_name(assessment)
+    if default_storage.exists(name):
+        return name
+
+    saved = default_storage.save(name, ContentFile(build_report(assessment)))
+    if saved != name:
+        # Another worker stored the same render first; the storage renamed ours.
+        default_storage.delete(saved)
+
+    prefix = f'Assessment_Report_{assessment.id}_'
+    _, filenames = default_storage.listdir(REPORT_DIR)
+    for filename in filenames:
+        if filename.startswith(prefix) and filename.endswith('.pdf') and filename != posixpath.basename(name):
+            default_storage.delete(f'{REPORT_DIR}/{filename}')
+    return name
+
+
+# ---------- LAYOUT ---------- #
+
+class ReportLayout:
+    """Top-to-bottom flow over a PdfCanvas, starting a new page when one fills up."""
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def ensure(self, height):
+        if self.y - height < MARGIN:
+            self.canvas.new_page()
+            self.y = PAGE_HEIGHT - MARGIN
+
+    def space(self, height):
+        self.y -= height
+
+    def lines(self, text, size=10, bold=False, color=TEXT, indent=0, leading=1.35):
+        for line in wrap_text(text, CONTENT_WIDTH - indent, size, bold):
+            self.ensure(size * leading)
+            self.y -= size * leading
+            self.canvas.text(MARGIN + indent, self.y, line, size, bold, color)
+
+    def heading(self, text, size=14):
+        self.ensure(size * 4)
+        self.y -= size * 1.8
+        self.canvas.text(MARGIN, self.y, text, size, bold=True, color=TEXT)
+        self.y -= 6
+        self.canvas.line(MARGIN, self.y, PAGE_WIDTH - MARGIN, self.y, color=GRID, width=1.5)
+        self.y -= 4
+
+    def note(self, text, size=9):
+        lines = wrap_text(text, CONTENT_WIDTH - 16, size)
+        height = len(lines) * size * 1.35 + 10
+        # Notes too long for one page flow across pages without the background.
+        if height <= PAGE_HEIGHT - 2 * MARGIN:
+            self.ensure(height)
+            self.canvas.rect(MARGIN, self.y - height, CONTENT_WIDTH, height, fill=NOTE_FILL)
+        self.y -= 5
+        for line in lines:
+            self.ensure(size * 1.35)
+            self.y -= size * 1.35
+            self.canvas.text(MARGIN + 8, self.y, line, size, color=TEXT)
+        self.y -= 5
+
+    def table(self, columns, rows, size=9):
+        """columns: [(title, width, align)]; rows: lists of cell text."""
+        def row(cells, bold):
+            self.ensure(size * 1.8)
+            self.y -= size * 1.6
+            x = MARGIN
+            for (_, width, align), cell in zip(columns, cells):
+                cell = _fit(str(cell), width - 6, size, bold)
+                if align == 'right':
+                    self.canvas.text(x + width - 3, self.y, cell, size, bold, TEXT, align='right')
+                else:
+                    self.canvas.text(x + 3, self.y, cell, size, bold, TEXT)
+                x += width
+            self.canvas.line(MARGIN, self.y - 4, MARGIN + sum(column[1] for column in columns), self.y - 4, color=GRID, width=0.5)
+
+        row([column[0] for column in columns], True)
+        for cells in rows:
+            row(cells, False)
+
+
+def _fit(text, width, size, bold=False):
+    if text_width(text, size, bold) <= width:
+        return text
+    while text and text_width(text + '...', size, bold) > width:
+        text = text[:-1]
+    return text + '...'
+
+
+def _gauge_color(position):
+    for (start, low), (end, high) in zip(GAUGE_STOPS, GAUGE_STOPS[1:]):
+        if position <= end:
+            ratio = (position - start) / (end - start)
+            return tuple(round(a + (b - a) * ratio) for a, b in zip(low, high))
+    return GAUGE_STOPS[-1][1]
+
+
+def draw_radar(canvas, cx, cy, radius, labels, values, scale=RADAR_SCALE):
+    """Radar chart of ``values`` on 0..scale, first axis at the top, going clockwise."""
+    count = len(labels)
+    if not count:
+        canvas.text(cx, cy, 'No scores yet', 9, color=MUTED, align='center')
+        return
+
+    def point(index, value):
+        angle = math.pi / 2 - 2 * math.pi * index / count
+        distance = radius * value / scale
+        return cx + distance * math.cos(angle), cy + distance * math.sin(angle)
+
+    for ring in range(1, 6):
+        canvas.polygon([point(index, scale * ring / 5) for index in range(count)], stroke=GRID, line_width=0.5)
+    for index in range(count):
+        canvas.line(cx, cy, *point(index, scale), color=GRID, width=0.5)
+
+    canvas.polygon([point(index, value) for index, value in enumerate(values)], fill=TEAL_FILL, stroke=TEAL, line_width=1.5)
+    for index, value in enumerate(values):
+        x, y = point(index, value)
+        canvas.rect(x - 2, y - 2, 4, 4, fill=TEAL)
+
+    for index, label in enumerate(labels):
+        x, y = point(index, scale * 1.12)
+        align = 'center' if abs(x - cx) < 5 else 'left' if x > cx else 'right'
+        canvas.text(x, y - 3, _fit(label, 90, 7), 7, color=TEXT, align=align)
+
+
+def draw_gauge(canvas, x, y, width, percentage):
+    """Green-to-red risk bar with a pointer at ``percentage``."""
+    slices = 60
+    for index in range(slices):
+        canvas.rect(x + width * index / slices, y, width / slices + 0.5, 14, fill=_gauge_color(index / (slices - 1)))
+
+    pointer = x + min(max(width * percentage / 100, 8), width - 8)
+    canvas.polygon([(pointer, y + 17), (pointer - 7, y + 29), (pointer + 7, y + 29)], fill=(0, 0, 0))
+    canvas.text(pointer, y + 33, f'{percentage:.0f}%', 11, bold=True, align='center')
+    canvas.text(x, y - 14, 'Low Risk', 9, color=TEXT)
+    canvas.text(x + width, y - 14, 'Critical Risk', 9, color=TEXT, align='right')
+
+
+# ---------- REPORT ---------- #
+
+def build_report(assessment, snapshot=None):
+    """The assessment summary as PDF bytes: scores, radar chart, risk gauge, quote and answers."""
+    scorecard = frozen_scorecard(assessment)
+    if scorecard is not None:
+        categorized_answers = dict(scorecard.answers)
+        category_rows = scorecard.categories
+        answer_count = scorecard.answer_count
+        quote = scorecard_quote(scorecard)
+    else:
+        snapshot = snapshot or get_question_bank_snapshot()
+        answers = list(UserAnswer.objects.filter(assessment=assessment).order_by('id'))
+        categorized_answers = group_answers(answers, snapshot)
+        category_rows = category_rollups(assessment.id, snapshot)
+        answer_count = len(answers)
+        quote = get_quote(assessment)
+    category_scores = {name: score for name, score, _, _ in category_rows}
+    actual_score = sum(score for _, score, _, _ in category_rows)
+    max_score = sum(category_max for _, _, category_max, _ in category_rows)
+    percentage = min(actual_score / max_score * 100, 100) if max_score else 0
+
+    title = f'{assessment.customer.name} - Assessment Summary'
+    canvas = PdfCanvas(title=title)
+    layout = ReportLayout(canvas)
+
+    layout.lines(title, size=18, bold=True)
+    dates = f'Started {assessment.date_started:%Y-%m-%d}'
+    if assessment.date_completed:
+        dates += f', completed {assessment.date_completed:%Y-%m-%d}'
+    layout.lines(f'Assessment #{assessment.id} - {assessment.get_status_display()} - {dates}', size=9, color=MUTED)
+
+    layout.space(10)
+    chart_height = 250
+    layout.ensure(chart_height)
+    top = layout.y
+    draw_radar(
+        canvas, MARGIN + 130, top - chart_height / 2, 85,
+        list(category_scores.keys()), radar_values(category_scores),
+    )
+    draw_gauge(canvas, MARGIN + 290, top - chart_height / 2, CONTENT_WIDTH - 290, percentage)
+    for offset, line in enumerate((
+        'This percentage represents your risk: lower values suggest reduced',
+        'risk, while higher values indicate increased risk. A score near 0',
+        'reflects a smaller attack surface, lowering the chance of a cyber attack.',
+    )):
+        canvas.text(MARGIN + 290, top - chart_height / 2 - 40 - offset * 10, line, 6.5, color=MUTED)
+    layout.space(chart_height)
+
+    layout.heading('Category Scores')
+    layout.table(
+        [('Category', 300, 'left'), ('Score', 68, 'right'), ('Risk', 68, 'right'), ('Answers', 68, 'right')],
+        [
+            [name, score, f'{round(100 * score / category_max)}%' if category_max else '-', count]
+            for name, score, category_max, count in category_rows
+        ] + [['Total', actual_score, f'{percentage:.0f}%', answer_count]],
+    )
+
+    if quote.lines:
+        layout.heading('Recommended Products')
+        layout.table(
+            [('Item #', 90, 'left'), ('Product', 234, 'left'), ('Quantity', 70, 'right'), ('Unit', 110, 'left')],
+            [
+                [line.item_number, line.name, '-' if line.quantity is None else line.quantity, line.unit_type]
+                for line in quote.lines
+            ],
+        )
+
+    for category, items in categorized_answers.items():
+        layout.heading(category)
+        for item in items:
+            layout.ensure(40)
+            layout.space(4)
+            layout.lines(f'Q: {item["question"]}', size=10, bold=True)
+            layout.lines(f'Answer: {item["answer"] or "No answer provided."}', size=10)
+            if item['note']:
+                layout.space(3)
+                layout.note(f'Notes: {item["note"]}')
+            layout.space(6)
+
+    pages = len(canvas.pages)
+    for number, ops in enumerate(canvas.pages, start=1):
+        canvas.ops = ops
+        canvas.text(MARGIN, MARGIN / 2, f'{assessment.customer.name} - Assessment #{assessment.id}', 8, color=MUTED)
+        canvas.text(PAGE_WIDTH - MARGIN, MARGIN / 2, f'Page {number} of {pages}', 8, color=MUTED, align='right')
+    return canvas.render()
+
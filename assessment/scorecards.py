@@ -0,0 +1,110 @@
+"""
+Frozen results of completed assessments.
+
+Answers store their score when they are saved, but the rollups, the answer
+listing and the quote are otherwise rebuilt from the live question bank, so
+editing a weight or an option score would change every old summary.
+Completing an assessment writes an AssessmentScorecard, pinned to the
+QuestionBankVersion it was scored against, that the summary and the PDF
+report render from. Answer writes to a completed assessment freeze it again
+(portfolio.answers_changing), so it never falls back to the live bank.
+"""
+import hashlib
+import json
+
+from django.db import transaction
+
+from .models import AssessmentScorecard, QuestionBankVersion, UserAnswer
+from .quotes import Quote, QuoteLine, build_quote
+from .scoring import category_rollups, group_answers
+from .snapshot import get_question_bank_snapshot, get_question_bank_version
+
+
+# ---------- BANK VERSIONS ---------- #
+
+def bank_content(snapshot):
+    """The scoring side of a snapshot as plain JSON data, in display order."""
+    return {
+        'categories': [
+            [category.id, category.name, category.order]
+            for category in sorted(snapshot.categories.values(), key=lambda category: category.id)
+        ],
+        'questions': [
+            [
+                question.id, question.category_id, question.weight, question.neutral, question.max_score,
+                [[option.input_id, option.score_value, option.is_preferred] for option in question.options],
+            ]
+            for question in (snapshot.get(question_id) for question_id in snapshot.ordered)
+        ],
+    }
+
+
+def pin_question_bank(snapshot=None):
+    """The QuestionBankVersion matching the current bank, created on first use."""
+    content = bank_content(snapshot or get_question_bank_snapshot())
+    digest = hashlib.sha1(json.dumps(content, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+    version, _ = QuestionBankVersion.objects.get_or_create(digest=digest, defaults={'content': content})
+    return version
+
+
+# ---------- SCORECARDS ---------- #
+
+def freeze_scorecard(assessment, snapshot=None):
+    """
+    Write (or rewrite) the scorecard of an assessment from its current
+    answers and rollups, pinned to the bank they were scored against.
+    """
+    snapshot = snapshot or get_question_bank_snapshot()
+    categories = [list(row) for row in category_rollups(assessment.id, snapshot)]
+    answers = list(UserAnswer.objects.filter(assessment_id=assessment.id).order_by('id'))
+    quote = build_quote(assessment.id)
+    with transaction.atomic():
+        scorecard, _ = AssessmentScorecard.objects.update_or_create(assessment=assessment, defaults={
+            'question_bank': pin_question_bank(snapshot),
+            'answers_version': assessment.answers_version,
+            'actual_score': sum(row[1] for row in categories),
+            'max_score': sum(row[2] for row in categories),
+            'answer_count': len(answers),
+            'categories': categories,
+            'answers': list(group_answers(answers, snapshot).items()),
+            'quote': dict(quote._asdict(), lines=[dict(line._asdict()) for line in quote.lines]),
+        })
+    assessment.scorecard = scorecard
+    return scorecard
+
+
+def frozen_scorecard(assessment):
+    """
+    The scorecard to render a completed assessment from, or None while the
+    assessment is in progress or its answers were changed by a write that
+    did not freeze it again (it is then scored live). Free when the
+    scorecard was select_related.
+    """
+    if assessment.status != 'completed':
+        return None
+    try:
+        scorecard = assessment.scorecard
+    except AssessmentScorecard.DoesNotExist:
+        return None
+    return scorecard if scorecard.answers_version == assessment.answers_version else None
+
+
+def scorecard_quote(scorecard):
+    """The frozen quote as the Quote get_quote returns."""
+    quote = scorecard.quote
+    return Quote(
+        scorecard.assessment_id,
+        quote.get('counts', {}),
+        tuple(QuoteLine(**dict(line, question_ids=tuple(line['question_ids']))) for line in quote.get('lines', ())),
+        quote.get('units', {}),
+        tuple(quote.get('missing_counts', ())),
+    )
+
+
+def bank_marker(assessment):
+    """
+    Question-bank part of the cache keys of an assessment's pages: fixed by
+    the scorecard once it is frozen, the live bank version otherwise.
+    """
+    scorecard = frozen_scorecard(assessment)
+    return f'sc{scorecard.pk}' if scorecard is not None else get_question_bank_version()
@@ -0,0 +1,306 @@
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Assessment, CategoryScore, UserAnswer
+from .portfolio import answers_changing
+from .search import index_answers
+from .snapshot import get_question_bank_snapshot
+
+# Maximum of the summary radar chart scale.
+RADAR_SCALE = 20
+
+# One validated answer, ready to be saved.
+AnswerInput = namedtuple('AnswerInput', ['question_id', 'selected_option_id', 'answer_text', 'note'])
+
+
+def display_answer(answer, question=None):
+    if answer.answer_text:
+        return answer.answer_text
+    if answer.selected_option_id:
+        text = question.option_text(answer.selected_option_id) if question else None
+        return text or answer.selected_option.text
+    return "No answer provided"
+
+
+def group_answers(answers, snapshot=None):
+    """
+    Group UserAnswer rows by category name in a single pass, in the shape the
+    summary template renders. Question and option text come from the bank
+    snapshot, so ``answers`` needs no related rows.
+    """
+    snapshot = snapshot or get_question_bank_snapshot()
+    categorized_answers = {}
+    for answer in answers:
+        question = snapshot.get(answer.question_id)
+        categorized_answers.setdefault(snapshot.category_name(answer.question_id), []).append({
+            "question": question.text if question else answer.question.text,
+            "answer": display_answer(answer, question),
+            "note": answer.note if answer.note else "",
+        })
+    return categorized_answers
+
+
+def category_rollups(assessment_id, snapshot):
+    """(name, score, max_score, answer_count) per category, in category order."""
+    rows = []
+    for category_id, score, max_score, answer_count in CategoryScore.objects.filter(
+        assessment_id=assessment_id
+    ).values_list('category_id', 'score', 'max_score', 'answer_count'):
+        category = snapshot.category(category_id)
+        if category is not None:
+            rows.append((category.order, category.name, score, max_score, answer_count))
+    return [row[1:] for row in sorted(rows)]
+
+
+def radar_values(category_scores, scale=RADAR_SCALE):
+    """Category scores rescaled so the highest one reaches ``scale``, as the radar chart plots them."""
+    highest = max(category_scores.values(), default=0)
+    if not highest:
+        return [0 for _ in category_scores]
+    return [round((score / highest) * scale) for score in category_scores.values()]
+
+
+def refresh_category_scores(assessment_id, category_ids=None):
+    """
+    Recompute the CategoryScore rollups of an assessment from the stored
+    per-answer scores. Limiting ``category_ids`` keeps the work proportional
+    to the categories that actually changed.
+    """
+    answers = UserAnswer.objects.filter(assessment_id=assessment_id)
+    rollups = CategoryScore.objects.filter(assessment_id=assessment_id)
+    if category_ids is not None:
+        category_ids = [category_id for category_id in category_ids if category_id is not None]
+        answers = answers.filter(question__category_id__in=category_ids)
+        rollups = rollups.filter(category_id__in=category_ids)
+
+    rows = [
+        CategoryScore(
+            assessment_id=assessment_id,
+            category_id=row['question__category_id'],
+            score=row['score'] or 0,
+            max_score=row['max_score'] or 0,
+            answer_count=row['answer_count'],
+        )
+        for row in answers.values('question__category_id').annotate(
+            score=Sum('score'), max_score=Sum('max_score'), answer_count=Count('id'),
+        ).order_by()
+    ]
+    rollups.exclude(category_id__in=[row.category_id for row in rows]).delete()
+    if rows:
+        CategoryScore.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['assessment', 'category'],
+            update_fields=['score', 'max_score', 'answer_count'],
+        )
+    return rows
+
+
+# Columns rewritten when an answer is saved again; the version is bumped separately.
+_UPSERT_COLUMNS = ('answer_text', 'selected_option_id', 'note', 'score', 'max_score', 'date_updated')
+
+
+def upsert_answer(assessment_id, question_id, values):
+    """
+    Insert or update one answer with a single INSERT ... ON CONFLICT DO UPDATE
+    on (assessment, question), bumping the stored version on conflict.
+    Concurrent submits of the same question resolve inside the database
+    instead of racing a SELECT against an INSERT. Returns (id, version).
+    """
+    now = timezone.now()
+    row = dict(
+        values,
+        assessment_id=assessment_id,
+        question_id=question_id,
+        flag_required=False,
+        date_answered=now,
+        date_updated=now,
+        version=1,
+    )
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        answer, _ = UserAnswer.objects.update_or_create(
+            assessment_id=assessment_id,
+            question_id=question_id,
+            defaults=dict(values, version=F('version') + 1),
+            create_defaults={key: value for key, value in row.items() if key not in ('assessment_id', 'question_id')},
+        )
+        answer.refresh_from_db(fields=['version'])
+        return answer.id, answer.version
+
+    quote = connection.ops.quote_name
+    table = quote(UserAnswer._meta.db_table)
+    columns = list(row)
+    params = [
+        connection.ops.adapt_datetimefield_value(row[column]) if column.startswith('date_') else row[column]
+        for column in columns
+    ]
+    sql = (
+        f"INSERT INTO {table} ({', '.join(map(quote, columns))}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({quote('assessment_id')}, {quote('question_id')}) DO UPDATE SET "
+        + ", ".join(f"{quote(column)} = EXCLUDED.{quote(column)}" for column in _UPSERT_COLUMNS)
+        + f", {quote('version')} = {table}.{quote('version')} + 1 "
+        f"RETURNING {quote('id')}, {quote('version')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+
+def touch_answers(assessment):
+    """Mark the answers of an assessment as changed, retiring anything cached for the old set."""
+    now = timezone.now()
+    Assessment.objects.filter(id=assessment.id).update(answers_version=F('answers_version') + 1, updated_at=now)
+    assessment.answers_version += 1
+    assessment.updated_at = now
+
+
+def record_answer(assessment, question_id, selected_option_id=None, answer_text='', note=''):
+    """
+    Save an answer together with its resolved score and update the matching
+    category rollup and search document in the same transaction.
+    """
+    snapshot = get_question_bank_snapshot()
+    entry = snapshot.get(question_id)
+    values = {
+        'answer_text': answer_text,
+        'selected_option_id': selected_option_id,
+        'note': note,
+        'score': snapshot.score_answer(question_id, selected_option_id),
+        'max_score': snapshot.max_score(question_id),
+    }
+    with transaction.atomic(), answers_changing(assessment):
+        answer_id, version = upsert_answer(assessment.id, question_id, values)
+        refresh_category_scores(assessment.id, [entry.category_id] if entry else None)
+        index_answers(UserAnswer.objects.filter(id=answer_id))
+        touch_answers(assessment)
+    return UserAnswer(id=answer_id, assessment=assessment, question_id=question_id, version=version, **values)
+
+
+def clean_answers(items, snapshot=None):
+    """
+    Validate a batch of raw answers ({"question", "option", "text", "note"}).
+
+    Returns (answers, errors): answers maps question id to the cleaned
+    AnswerInput (the last one wins when a question is repeated) and errors
+    lists {"question", "error"} dicts for items that could not be used.
+    """
+    snapshot = snapshot or get_question_bank_snapshot()
+    answers = {}
+    errors = []
+    for item in items:
+        raw_id = item.get('question') if isinstance(item, dict) else None
+        try:
+            question_id = int(raw_id)
+        except (TypeError, ValueError):
+            errors.append({'question': raw_id, 'error': "An integer 'question' id is required."})
+            continue
+        question = snapshot.get(question_id)
+        if question is None:
+            errors.append({'question': question_id, 'error': "Unknown question."})
+            continue
+
+        note = str(item.get('note') or '')
+        if question.question_type == "input":
+            answers[question_id] = AnswerInput(question_id, None, str(item.get('text') or ''), note)
+            continue
+        try:
+            selected_option_id = int(item.get('option'))
+        except (TypeError, ValueError):
+            selected_option_id = None
+        if selected_option_id not in question.option_scores:
+            errors.append({'question': question_id, 'error': "Not an option of this question."})
+            continue
+        answers[question_id] = AnswerInput(question_id, selected_option_id, '', note)
+    return answers, errors
+
+
+def record_answers(assessment, answers, snapshot=None, versions=None):
+    """
+    Save a batch of cleaned answers with one INSERT ... ON CONFLICT DO UPDATE
+    on (assessment, question) and refresh the rollups of the categories they
+    touch and the answers' search documents, all in one transaction.
+
+    Each saved answer gets the next version number. ``versions`` maps
+    question id to the currently stored version when the caller has already
+    read (and locked) the rows; otherwise they are read here.
+    """
+    snapshot = snapshot or get_question_bank_snapshot()
+    rows = [
+        UserAnswer(
+            assessment_id=assessment.id,
+            question_id=answer.question_id,
+            selected_option_id=answer.selected_option_id,
+            answer_text=answer.answer_text,
+            note=answer.note,
+            score=snapshot.score_answer(answer.question_id, answer.selected_option_id),
+            max_score=snapshot.max_score(answer.question_id),
+        )
+        for answer in answers
+    ]
+    if not rows:
+        return rows
+    with transaction.atomic(), answers_changing(assessment):
+        if versions is None:
+            versions = dict(
+                UserAnswer.objects.select_for_update().filter(
+                    assessment_id=assessment.id, question_id__in=[row.question_id for row in rows]
+                ).values_list('question_id', 'version')
+            )
+        for row in rows:
+            row.version = versions.get(row.question_id, 0) + 1
+        UserAnswer.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['assessment', 'question'],
+            update_fields=['selected_option', 'answer_text', 'note', 'score', 'max_score', 'version', 'date_updated'],
+        )
+        refresh_category_scores(assessment.id, {snapshot.get(row.question_id).category_id for row in rows})
+        index_answers(UserAnswer.objects.filter(
+            assessment_id=assessment.id, question_id__in=[row.question_id for row in rows]
+        ))
+        touch_answers(assessment)
+    return rows
+
+
+def rescore_assessment(assessment_id, index=None, commit=True):
+    """
+    Re-resolve every stored answer score of an assessment against the current
+    question bank. Rewritten answers get the next version like any other
+    answer write, so offline clients pick up the new scores. Returns the list
+    of answers whose stored score was stale.
+    """
+    index = index or get_question_bank_snapshot()
+    stale = []
+    for answer in UserAnswer.objects.filter(assessment_id=assessment_id).only(
+        'id', 'question_id', 'selected_option_id', 'score', 'max_score'
+    ):
+        score = index.score_answer(answer.question_id, answer.selected_option_id)
+        max_score = index.max_score(answer.question_id)
+        if answer.score != score or answer.max_score != max_score:
+            answer.score = score
+            answer.max_score = max_score
+            stale.append(answer)
+
+    if commit:
+        now = timezone.now()
+        for answer in stale:
+            answer.version = F('version') + 1
+            answer.date_updated = now
+        with transaction.atomic():
+            if stale:
+                # The portfolio tables and a frozen scorecard hold answer scores too.
+                assessment = Assessment.objects.get(id=assessment_id)
+                with answers_changing(assessment):
+                    UserAnswer.objects.bulk_update(
+                        stale, ['score', 'max_score', 'version', 'date_updated'], batch_size=500,
+                    )
+                    refresh_category_scores(assessment_id)
+                    touch_answers(assessment)
+            else:
+                refresh_category_scores(assessment_id)
+    return stale
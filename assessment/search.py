@@ -0,0 +1,296 @@
+"""
+Full-text search over questions and answers.
+
+Every question and every answer has one SearchDocument: the question text as
+its title and, as its body, the explanation of a question or the chosen
+option, answer text and note of an answer. Answers are reindexed in the
+transaction that saves them and questions when they are saved or imported.
+The documents are matched by SQLite FTS5 or a PostgreSQL tsvector with a
+GIN index (see migration 0021), ranked, and read one page at a time.
+Pages are never counted and at most RANK_WINDOW matches are ranked, so a
+query stays fast however many answers there are.
+"""
+import re
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Max, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Concat, Trim
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Question, SearchDocument, UserAnswer
+
+SEARCH_PAGE_SIZE = 25
+
+KINDS = ('question', 'answer')
+
+# FTS5 table over assessment_searchdocument on SQLite.
+FTS_TABLE = 'assessment_search'
+
+# Relative weight of the question text against the body when ranking.
+TITLE_WEIGHT = 2.0
+
+# Ranking costs time per matching document, so a query matching more than
+# this many documents (a very common word) ranks only the newest of them.
+RANK_WINDOW = 50_000
+
+# Control characters, which typed text does not contain, mark the matches
+# in a snippet until highlight() escapes it and turns them into <mark>.
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+_WORD = re.compile(r'\w+')
+
+SearchHit = namedtuple('SearchHit', ['document', 'rank', 'snippet'])
+
+SearchPage = namedtuple('SearchPage', ['query', 'hits', 'page', 'has_next'])
+
+
+# ---------- INDEXING ---------- #
+
+def answer_documents(answers):
+    """(question, answer, assessment, title, body) rows for the answers of a UserAnswer queryset."""
+    return answers.order_by().values_list(
+        'question_id', 'id', 'assessment_id', 'question__text',
+        Trim(Concat(
+            Coalesce('selected_option__text', Value('')), Value(' '),
+            Coalesce('answer_text', Value('')), Value(' '),
+            Coalesce('note', Value('')),
+            output_field=TextField(),
+        )),
+    )
+
+
+def index_answers(answers):
+    """
+    Create or refresh the documents of the answers in a UserAnswer queryset
+    with a single INSERT ... SELECT ... ON CONFLICT DO UPDATE, so the rows
+    never leave the database. Returns the number of answers indexed.
+    """
+    documents = answer_documents(answers)
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        rows = [
+            SearchDocument(question_id=question_id, answer_id=answer_id, assessment_id=assessment_id, title=title, body=body)
+            for question_id, answer_id, assessment_id, title, body in documents
+        ]
+        SearchDocument.objects.bulk_create(rows, update_conflicts=True, unique_fields=['answer'], update_fields=['title', 'body'])
+        return len(rows)
+
+    quote = connection.ops.quote_name
+    sql, params = documents.query.sql_with_params()
+    with connection.cursor() as cursor:
+        # "WHERE true" keeps SQLite from reading ON CONFLICT as part of the SELECT.
+        cursor.execute(
+            f"INSERT INTO {quote(SearchDocument._meta.db_table)} "
+            f"({', '.join(map(quote, ['question_id', 'answer_id', 'assessment_id', 'title', 'body']))}) "
+            f"SELECT * FROM ({sql}) documents WHERE true "
+            f"ON CONFLICT ({quote('answer_id')}) DO UPDATE SET "
+            f"{quote('title')} = EXCLUDED.{quote('title')}, {quote('body')} = EXCLUDED.{quote('body')}",
+            params,
+        )
+        return cursor.rowcount
+
+
+def add_question_documents(questions):
+    """Documents of just-created Question instances, which have neither documents nor answers yet."""
+    SearchDocument.objects.bulk_create([
+        SearchDocument(question_id=question.id, title=question.text, body=question.explanation_text or '')
+        for question in questions
+    ])
+
+
+def index_questions(question_ids):
+    """
+    Rewrite the documents of these questions and carry a changed question
+    text over to the documents of their answers, in one UPDATE.
+    """
+    question_ids = list(question_ids)
+    if not question_ids:
+        return
+    with transaction.atomic():
+        SearchDocument.objects.filter(question_id__in=question_ids, answer__isnull=True).delete()
+        SearchDocument.objects.bulk_create([
+            SearchDocument(question_id=question_id, title=text, body=explanation or '')
+            for question_id, text, explanation in Question.objects.filter(
+                id__in=question_ids
+            ).values_list('id', 'text', 'explanation_text')
+        ])
+        question_text = Subquery(Question.objects.filter(id=OuterRef('question_id')).values('text')[:1])
+        SearchDocument.objects.filter(question_id__in=question_ids, answer__isnull=False).exclude(
+            title=question_text
+        ).update(title=question_text)
+
+
+def rebuild_search_index(batch_size=10000, on_progress=None):
+    """Recreate every document from scratch. Returns the number of documents written."""
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        question_ids = list(Question.objects.values_list('id', flat=True))
+        index_questions(question_ids)
+        count = len(question_ids)
+        highest = UserAnswer.objects.aggregate(highest=Max('id'))['highest'] or 0
+        for start in range(0, highest, batch_size):
+            count += index_answers(UserAnswer.objects.filter(id__gt=start, id__lte=start + batch_size))
+            if on_progress is not None:
+                on_progress(count)
+    if connection.vendor == 'sqlite':
+        # Merge the index segments written by the rebuild.
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return count
+
+
+# ---------- QUERIES ---------- #
+
+def parse_terms(query):
+    """
+    Search terms as (words, prefix) pairs: every "quoted phrase" or bare word
+    becomes one term, and a bare word ending in * matches as a prefix.
+    Punctuation is dropped the way the index tokenizer drops it.
+    """
+    terms = []
+    for phrase, word in _TERM.findall(query or ''):
+        words = _WORD.findall(phrase or word)
+        if words:
+            terms.append((words, bool(word) and word.endswith('*')))
+    return terms
+
+
+def fts_expression(terms):
+    """FTS5 MATCH expression requiring every term."""
+    return ' '.join(f'"{" ".join(words)}"' + ('*' if prefix else '') for words, prefix in terms)
+
+
+def tsquery_expression(terms):
+    """to_tsquery expression requiring every term, phrases word after word."""
+    return ' & '.join(
+        '(' + ' <-> '.join(f"'{word.lower()}'" for word in words) + (':*' if prefix else '') + ')'
+        for words, prefix in terms
+    )
+
+
+def _filters(kind, customer_id):
+    sql, params = [], []
+    if kind == 'question':
+        sql.append('d.answer_id IS NULL')
+    elif kind == 'answer':
+        sql.append('d.answer_id IS NOT NULL')
+    if customer_id:
+        sql.append('d.assessment_id IN (SELECT id FROM assessment_assessment WHERE customer_id = %s)')
+        params.append(customer_id)
+    return ''.join(f' AND {clause}' for clause in sql), params
+
+
+def _sqlite_hits(terms, kind, customer_id, limit, offset):
+    filters, params = _filters(kind, customer_id)
+    expression = fts_expression(terms)
+    sql = (
+        f"SELECT d.id, bm25({FTS_TABLE}, {TITLE_WEIGHT}, 1.0) AS rank, "
+        f"snippet({FTS_TABLE}, 1, '{_MARK_START}', '{_MARK_END}', '…', 24) "
+        f"FROM {FTS_TABLE} JOIN assessment_searchdocument d ON d.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s{filters} AND {FTS_TABLE}.rowid >= COALESCE(("
+        f"SELECT w.rowid FROM {FTS_TABLE} w JOIN assessment_searchdocument d ON d.id = w.rowid "
+        f"WHERE w.{FTS_TABLE} MATCH %s{filters} ORDER BY w.rowid DESC LIMIT 1 OFFSET %s"
+        f"), 0) ORDER BY rank LIMIT %s OFFSET %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [expression, *params, expression, *params, RANK_WINDOW - 1, limit, offset])
+        # bm25 is lower for better matches; report higher-is-better like ts_rank.
+        return [(document_id, -rank, snippet) for document_id, rank, snippet in cursor.fetchall()]
+
+
+def _postgresql_hits(terms, kind, customer_id, limit, offset):
+    filters, params = _filters(kind, customer_id)
+    expression = tsquery_expression(terms)
+    # The headline is only built for the rows of the page.
+    sql = (
+        "SELECT id, rank, ts_headline('simple', body, query, %s) FROM ("
+        "SELECT d.id, d.body, query, ts_rank_cd(d.vector, query) AS rank "
+        "FROM assessment_searchdocument d, to_tsquery('simple', %s) query "
+        f"WHERE d.vector @@ query{filters} AND d.id >= COALESCE(("
+        "SELECT d.id FROM assessment_searchdocument d "
+        f"WHERE d.vector @@ to_tsquery('simple', %s){filters} ORDER BY d.id DESC OFFSET %s LIMIT 1"
+        "), 0) ORDER BY rank DESC, d.id LIMIT %s OFFSET %s"
+        ") hits ORDER BY rank DESC, id"
+    )
+    options = f'StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords=40, MinWords=15, MaxFragments=2'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [options, expression, *params, expression, *params, RANK_WINDOW - 1, limit, offset])
+        return cursor.fetchall()
+
+
+def _fallback_documents(terms):
+    """Substring matching for databases without a full-text index."""
+    documents = SearchDocument.objects.order_by('id')
+    for words, _ in terms:
+        phrase = ' '.join(words)
+        documents = documents.filter(Q(title__icontains=phrase) | Q(body__icontains=phrase))
+    return documents
+
+
+def _fallback_hits(terms, kind, customer_id, limit, offset):
+    documents = _fallback_documents(terms)
+    if kind:
+        documents = documents.filter(answer__isnull=kind == 'question')
+    if customer_id:
+        documents = documents.filter(assessment__customer_id=customer_id)
+    return [(document_id, 0.0, body[:200]) for document_id, body in documents.values_list('id', 'body')[offset:offset + limit]]
+
+
+def highlight(snippet):
+    """Escape a snippet and wrap its matches in <mark>."""
+    return mark_safe(escape(snippet).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def search(query, kind=None, customer_id=None, page=1, per_page=SEARCH_PAGE_SIZE):
+    """
+    One page of documents matching every term of ``query``, best match
+    first. ``kind`` limits the results to 'question' or 'answer' documents
+    and ``customer_id`` to the answers of that customer's assessments.
+    """
+    page = max(page, 1)
+    terms = parse_terms(query)
+    if not terms:
+        return SearchPage(query, [], page, False)
+
+    hits_for = {'sqlite': _sqlite_hits, 'postgresql': _postgresql_hits}.get(connection.vendor, _fallback_hits)
+    # One row past the page tells whether there is a next page without counting.
+    rows = hits_for(terms, kind, customer_id, per_page + 1, (page - 1) * per_page)
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    documents = SearchDocument.objects.select_related('assessment__customer').in_bulk([row[0] for row in rows])
+    hits = [
+        SearchHit(documents[document_id], rank, highlight(snippet))
+        for document_id, rank, snippet in rows
+        if document_id in documents
+    ]
+    return SearchPage(query, hits, page, has_next)
+
+
+def filter_answers(answers, query):
+    """
+    Narrow a UserAnswer queryset to the answers matching every term of
+    ``query``, unranked. The match runs as a subquery in the database, so
+    it combines with any other filter and ordering.
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return answers.none()
+    if connection.vendor == 'sqlite':
+        matching = RawSQL(
+            f"SELECT d.answer_id FROM {FTS_TABLE} JOIN assessment_searchdocument d ON d.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND d.answer_id IS NOT NULL",
+            [fts_expression(terms)],
+        )
+    elif connection.vendor == 'postgresql':
+        matching = RawSQL(
+            "SELECT answer_id FROM assessment_searchdocument "
+            "WHERE vector @@ to_tsquery('simple', %s) AND answer_id IS NOT NULL",
+            [tsquery_expression(terms)],
+        )
+    else:
+        matching = _fallback_documents(terms).filter(answer__isnull=False).values('answer_id')
+    return answers.filter(id__in=matching)
@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Category, Product, Question, QuestionInputOption, StandardizedInput, UserAnswer
+from .search import index_answers, index_questions
+from .snapshot import bump_question_bank_version
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=QuestionInputOption)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=StandardizedInput)
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_question_bank(sender, **kwargs):
+    # Bump after commit so no other process can rebuild the snapshot for
+    # the new version from rows that are not visible to it yet. Products are
+    # not part of the snapshot, but cached quotes are keyed on the version.
+    transaction.on_commit(bump_question_bank_version)
+
+
+# Bulk writes (answer saves, imports) index their rows themselves; these
+# cover single saves such as admin edits.
+@receiver(post_save, sender=Question)
+def index_question(sender, instance, **kwargs):
+    index_questions([instance.id])
+
+
+@receiver(post_save, sender=UserAnswer)
+def index_answer(sender, instance, **kwargs):
+    index_answers(UserAnswer.objects.filter(id=instance.id))
+
+
+@receiver(post_save, sender=StandardizedInput)
+def reindex_option_answers(sender, instance, created, **kwargs):
+    # Every answer that chose a renamed option carries its text; there can
+    # be a great many, so they are reindexed by the job worker.
+    if not created:
+        from .jobs import enqueue
+        transaction.on_commit(lambda: enqueue('reindex_search', params={'selected_option_id': instance.id}))
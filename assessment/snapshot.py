@@ -0,0 +1,156 @@
+import uuid
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .models import Category, Question, QuestionInputOption
+
+UNCATEGORIZED = "Uncategorized"
+
+# Cache key holding the current question-bank version token. Any change to a
+# question, its options, a category or a standardized input replaces the
+# token, which retires every snapshot built against the previous one.
+BANK_VERSION_KEY = 'assessment:question_bank_version'
+
+# Snapshots are stored per version; retired versions simply age out.
+SNAPSHOT_CACHE_TIMEOUT = 60 * 60 * 24
+
+CategoryRecord = namedtuple('CategoryRecord', ['id', 'name', 'order'])
+
+OptionRecord = namedtuple('OptionRecord', ['input_id', 'text', 'score_value', 'is_preferred'])
+
+
+class QuestionRecord(namedtuple('QuestionRecord', [
+    'id', 'category_id', 'category', 'text', 'explanation_text', 'external_link',
+    'question_type', 'weight', 'neutral', 'order', 'max_score', 'options', 'option_scores',
+])):
+    __slots__ = ()
+
+    def option_text(self, input_id):
+        for option in self.options:
+            if option.input_id == input_id:
+                return option.text
+        return None
+
+
+_snapshot_memo = {'version': None, 'snapshot': None}
+
+
+def get_question_bank_version():
+    return cache.get_or_set(BANK_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def bump_question_bank_version():
+    cache.set(BANK_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def _snapshot_key(version):
+    return f'assessment:question_bank_snapshot:{version}'
+
+
+class QuestionBankSnapshot:
+    """
+    Read-only copy of the question bank for one version: categories,
+    questions in display order and their answer options with scores.
+    Everything the assessment pages need to render and score is answered
+    from here without touching the bank tables.
+    """
+
+    __slots__ = ('version', 'categories', 'questions', 'ordered', 'by_category')
+
+    def __init__(self, version, categories, questions, ordered, by_category):
+        self.version = version
+        self.categories = categories
+        self.questions = questions
+        self.ordered = ordered
+        self.by_category = by_category
+
+    @classmethod
+    def build(cls, version):
+        categories = {
+            category_id: CategoryRecord(category_id, name, order)
+            for category_id, name, order in Category.objects.values_list('id', 'name', 'order')
+        }
+
+        options = {}
+        for question_id, input_id, text, score_value, is_preferred in QuestionInputOption.objects.order_by(
+            'id'
+        ).values_list('question_id', 'standardized_input_id', 'standardized_input__text', 'score_value', 'is_preferred'):
+            options.setdefault(question_id, []).append(OptionRecord(input_id, text, score_value, is_preferred))
+
+        questions = {}
+        ordered = []
+        by_category = {}
+        for row in Question.objects.order_by('order', 'id').values(
+            'id', 'category_id', 'text', 'explanation_text', 'external_link',
+            'question_type', 'weight', 'neutral', 'order',
+        ):
+            weight = row['weight'] or 0
+            question_options = tuple(options.get(row['id'], ()))
+            option_scores = {option.input_id: option.score_value for option in question_options}
+            category = categories.get(row['category_id'])
+            questions[row['id']] = QuestionRecord(
+                category=category.name if category else UNCATEGORIZED,
+                max_score=max(option_scores.values()) if option_scores else weight,
+                options=question_options,
+                option_scores=option_scores,
+                **dict(row, weight=weight),
+            )
+            ordered.append(row['id'])
+            by_category.setdefault(row['category_id'], []).append(row['id'])
+
+        return cls(
+            version,
+            categories,
+            questions,
+            tuple(ordered),
+            {category_id: tuple(question_ids) for category_id, question_ids in by_category.items()},
+        )
+
+    def __contains__(self, question_id):
+        return question_id in self.questions
+
+    def get(self, question_id):
+        return self.questions.get(question_id)
+
+    def category(self, category_id):
+        return self.categories.get(category_id)
+
+    def score_answer(self, question_id, selected_option_id):
+        """
+        Score for a single answer. Falls back to the question weight for
+        input-type answers and for options not configured on the question.
+        """
+        entry = self.questions.get(question_id)
+        if entry is None:
+            return 0
+        if selected_option_id is not None:
+            return entry.option_scores.get(selected_option_id, entry.weight)
+        return entry.weight
+
+    def max_score(self, question_id):
+        entry = self.questions.get(question_id)
+        return entry.max_score if entry is not None else 0
+
+    def category_name(self, question_id):
+        entry = self.questions.get(question_id)
+        return entry.category if entry is not None else UNCATEGORIZED
+
+
+def get_question_bank_snapshot():
+    """
+    Current snapshot, looked up in this process first, then in the shared
+    cache, and only built from the database when neither has the current
+    version.
+    """
+    version = get_question_bank_version()
+    if _snapshot_memo['version'] == version:
+        return _snapshot_memo['snapshot']
+
+    snapshot = cache.get(_snapshot_key(version))
+    if snapshot is None:
+        snapshot = QuestionBankSnapshot.build(version)
+        cache.set(_snapshot_key(version), snapshot, SNAPSHOT_CACHE_TIMEOUT)
+    _snapshot_memo['snapshot'] = snapshot
+    _snapshot_memo['version'] = version
+    return snapshot
@@ -0,0 +1,65 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are skipped when the package is not installed.
+    brotli = None
+
+# Files worth pre-compressing; images and fonts are already compressed.
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.map', '.svg', '.txt', '.html')
+
+# Below this size the encoded variant saves less than its headers cost.
+MIN_COMPRESS_SIZE = 256
+
+
+class AssessmentStaticStorage(ManifestStaticFilesStorage):
+    """
+    Content-hashed static files with gzip (and, when available, brotli)
+    variants written next to each compressible file at collectstatic time,
+    so they can be served without compressing on every request.
+    """
+
+    # Templates still render when a file has not been collected yet (tests,
+    # a fresh checkout); the unhashed URL is used instead of raising.
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in list(paths) + list(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                compressed = self.compress(name)
+                if compressed:
+                    yield name, compressed, True
+
+    def compress(self, name):
+        """Write ``name.gz`` (and ``name.br``); returns the names written."""
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            content = source.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return None
+
+        written = []
+        # mtime=0 keeps the output identical across runs for identical input.
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for suffix, encoded in variants:
+            if len(encoded) < len(content):
+                with open(path + suffix, 'wb') as target:
+                    target.write(encoded)
+                written.append(name + suffix)
+            elif os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return ', '.join(written)
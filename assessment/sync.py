@@ -0,0 +1,135 @@
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import UserAnswer
+from .navigation import get_question_order
+from .scoring import clean_answers, record_answers
+from .snapshot import get_question_bank_snapshot
+
+
+def answer_payload(answer):
+    return {
+        'question': answer.question_id,
+        'option': answer.selected_option_id,
+        'text': answer.answer_text or '',
+        'note': answer.note or '',
+        'version': answer.version,
+        'updated': answer.date_updated.isoformat() if answer.date_updated else None,
+    }
+
+
+def bank_payload(snapshot):
+    """The question bank in the order the assessment walks through it."""
+    order = get_question_order()
+    return {
+        'version': snapshot.version,
+        'categories': [{'id': category.id, 'name': category.name} for category in order.categories],
+        'questions': [
+            {
+                'id': question.id,
+                'category': question.category_id,
+                'text': question.text,
+                'type': question.question_type,
+                'options': [{'id': option.input_id, 'text': option.text} for option in question.options],
+            }
+            for question in map(snapshot.get, snapshot.ordered)
+        ],
+    }
+
+
+def build_bundle(assessment, snapshot=None):
+    """Everything the offline client needs to run an assessment without the server."""
+    snapshot = snapshot or get_question_bank_snapshot()
+    server_time = timezone.now()
+    return {
+        'assessment': {
+            'id': assessment.id,
+            'customer': assessment.customer.name,
+            'status': assessment.status,
+        },
+        'bank': bank_payload(snapshot),
+        'answers': [answer_payload(answer) for answer in UserAnswer.objects.filter(assessment=assessment)],
+        'server_time': server_time.isoformat(),
+    }
+
+
+def _client_time(value):
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+    return parsed
+
+
+def apply_sync(assessment, changes, since=None, bank_version=None, snapshot=None):
+    """
+    Apply a batch of offline answers and return what the client must merge.
+
+    Every change carries the ``base_version`` of the answer it was made from.
+    A change whose base version still matches the stored answer is applied.
+    When someone else changed the answer in between, the stored answer wins
+    and is returned as a conflict for the client to adopt. Only versions the
+    server assigned are compared; client clocks are never trusted to order
+    edits. Accepted changes are written with one bulk upsert in a single
+    transaction.
+
+    The response also carries every answer changed on the server since
+    ``since`` (a ``server_time`` from an earlier response) so the client can
+    pick up edits made elsewhere.
+    """
+    snapshot = snapshot or get_question_bank_snapshot()
+    server_time = timezone.now()
+    answers, errors = clean_answers(changes, snapshot)
+    client_meta = {}
+    for change in changes:
+        if isinstance(change, dict) and change.get('question') is not None:
+            client_meta[str(change['question'])] = change
+
+    conflicts = []
+    with transaction.atomic():
+        stored = {
+            answer.question_id: answer
+            for answer in UserAnswer.objects.select_for_update().filter(
+                assessment=assessment, question_id__in=list(answers)
+            )
+        }
+        accepted = []
+        for question_id, answer in answers.items():
+            meta = client_meta.get(str(question_id), {})
+            current = stored.get(question_id)
+            try:
+                base_version = int(meta.get('base_version') or 0)
+            except (TypeError, ValueError):
+                base_version = 0
+            if current is None or current.version == base_version:
+                accepted.append(answer)
+            else:
+                conflicts.append(answer_payload(current))
+
+        rows = record_answers(
+            assessment, accepted, snapshot,
+            versions={question_id: answer.version for question_id, answer in stored.items()},
+        )
+        applied = [answer_payload(row) for row in rows]
+
+    since = _client_time(since)
+    changed = []
+    if since is not None:
+        changed = [
+            answer_payload(answer)
+            for answer in UserAnswer.objects.filter(assessment=assessment, date_updated__gt=since).exclude(
+                question_id__in=[row.question_id for row in rows]
+            )
+        ]
+
+    return {
+        'status': 'success',
+        'applied': applied,
+        'conflicts': conflicts,
+        'errors': errors,
+        'changed': changed,
+        'bank_changed': bank_version is not None and bank_version != snapshot.version,
+        'server_time': server_time.isoformat(),
+    }
@@ -0,0 +1,55 @@
+// Keeps the offline assessment pages and their assets available without a
+// connection. Pages are network-first so a fresh copy is used when online;
+// static assets are cache-first.
+{% load static %}
+const CACHE_NAME = 'assessment-offline-v2';
+
+self.addEventListener('install', function (event) {
+    event.waitUntil(
+        caches.open(CACHE_NAME).then(function (cache) {
+            return cache.addAll([
+                "{% static 'vendor/bootstrap-4.5.3/css/bootstrap.min.css' %}",
+                "{% static 'css/assessment.css' %}",
+                "{% static 'js/offline_assessment.js' %}"
+            ]).catch(function () {});
+        }).then(function () { return self.skipWaiting(); })
+    );
+});
+
+self.addEventListener('activate', function (event) {
+    event.waitUntil(
+        caches.keys().then(function (names) {
+            return Promise.all(names.filter(function (name) {
+                return name.startsWith('assessment-offline-') && name !== CACHE_NAME;
+            }).map(function (name) { return caches.delete(name); }));
+        }).then(function () { return self.clients.claim(); })
+    );
+});
+
+self.addEventListener('fetch', function (event) {
+    const request = event.request;
+    if (request.method !== 'GET' || request.url.indexOf('/api/') !== -1) {
+        return;
+    }
+    if (request.mode === 'navigate') {
+        event.respondWith(
+            fetch(request).then(function (response) {
+                const copy = response.clone();
+                caches.open(CACHE_NAME).then(function (cache) { cache.put(request, copy); });
+                return response;
+            }).catch(function () {
+                return caches.match(request);
+            })
+        );
+        return;
+    }
+    event.respondWith(
+        caches.match(request).then(function (cached) {
+            return cached || fetch(request).then(function (response) {
+                const copy = response.clone();
+                caches.open(CACHE_NAME).then(function (cache) { cache.put(request, copy); });
+                return response;
+            });
+        })
+    );
+});
@@ -1,3 +1,1073 @@
-from django.test import TestCase
+import datetime
+import io
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .admin import EstimatedCountPaginator, QuestionAdmin, estimated_count
+from .benchmarks import SCENARIOS, check_budgets, load_budgets, run_benchmarks
+from .comparison import compare_assessments
+from .importers import QuestionImporter, QuestionSync, count_records
+from .jobs import Heartbeat, ProgressReporter, claim_next, enqueue, requeue_stale, run_job
+from .models import (
+    Assessment, Category, CategoryScore, Customer, Job, Product, Question, QuestionInputOption, SearchDocument,
+    StandardizedInput, UserAnswer,
+)
+from .navigation import AssessmentNavigator, forget_navigation
+from .ordering import ORDER_GAP, StaleOrderError, move_question
+from .portfolio import STAT_TABLES, add_assessment, rebuild_portfolio
+from .quotes import get_quote
+from .reports import REPORT_DIR, render_report
+from .scorecards import freeze_scorecard, frozen_scorecard
+from .scoring import AnswerInput, record_answer, record_answers, rescore_assessment, upsert_answer
+from .search import filter_answers, parse_terms, rebuild_search_index, search
+from .snapshot import bump_question_bank_version, get_question_bank_snapshot
+from .sync import apply_sync
+
+
+# The test database reuses the ids and counters cache keys are built from, so
+# the tests never touch the configured cache. Applied for the whole module
+# so it holds under any runner (manage.py test, pytest).
+_test_cache = override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 20000}},
+})
+
+
+def setUpModule():
+    _test_cache.enable()
+
+
+def tearDownModule():
+    _test_cache.disable()
+
+
+class BankTestCase(TestCase):
+    """
+    Two categories of three yes/no questions each. Answering "Yes" scores 0
+    and is preferred, "No" scores the question weight (2).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('engineer', password='engineer')
+        cls.customer = Customer.objects.create(name='Acme')
+        cls.yes = StandardizedInput.objects.create(text='Yes')
+        cls.no = StandardizedInput.objects.create(text='No')
+        cls.categories = [
+            Category.objects.create(name='Access', order=1),
+            Category.objects.create(name='Backups', order=2),
+        ]
+        cls.questions = []
+        for category in cls.categories:
+            for index in range(3):
+                question = Question.objects.create(
+                    category=category, text=f'{category.name} control {index + 1}?', question_type='yes_no',
+                    weight=2, order=(len(cls.questions) + 1) * ORDER_GAP,
+                )
+                QuestionInputOption.objects.create(question=question, standardized_input=cls.yes, score_value=0, is_preferred=True)
+                QuestionInputOption.objects.create(question=question, standardized_input=cls.no, score_value=2)
+                cls.questions.append(question)
+
+    def setUp(self):
+        # Start every test from a fresh bank version and empty navigation state.
+        cache.clear()
+
+    def new_assessment(self, **fields):
+        return Assessment.objects.create(customer=self.customer, employee=self.user, **fields)
+
+    def answer(self, assessment, questions, option=None):
+        option = option or self.no
+        return record_answers(assessment, [AnswerInput(question.id, option.id, '', '') for question in questions])
+
+    def bank_rows(self):
+        """The fixture bank as CSV rows, matched by content."""
+        return [
+            f'{question.text},{question.category.name},yes_no,2,false,false,"Yes,No","0,2",Yes,'
+            for question in self.questions
+        ]
+
+
+class QueryBudgetTests(TestCase):
+    """
+    The small benchmark scale must stay within the query counts stored in
+    benchmark_budgets.json. When a change legitimately needs more queries,
+    update the budget in the same commit.
+    """
+
+    def test_small_scale_within_budget(self):
+        report = run_benchmarks(['small'], repeat=1)
+        self.assertEqual(set(report['results']['small']), set(SCENARIOS))
+        self.assertEqual(check_budgets(report, load_budgets()), [])
+
+
+class NavigationTests(BankTestCase):
+    def test_next_unanswered_skips_answered_questions(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:2])
+        navigator = AssessmentNavigator(assessment)
+        self.assertEqual(navigator.next_unanswered(), self.questions[2].id)
+        self.assertEqual(navigator.progress(), (3, 6))
+        self.assertEqual(navigator.next_unanswered(self.categories[1].id), self.questions[3].id)
+
+    def test_bank_change_reloads_answered_set(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:1])
+        AssessmentNavigator(assessment).save()
+        UserAnswer.objects.filter(assessment=assessment).delete()
+
+        bump_question_bank_version()
+        navigator = AssessmentNavigator(assessment)
+        self.assertFalse(navigator.is_answered(self.questions[0].id))
+        self.assertEqual(navigator.next_unanswered(), self.questions[0].id)
+
+    def test_forget_navigation_after_answers_are_removed(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:1])
+        AssessmentNavigator(assessment).save()
+        UserAnswer.objects.filter(assessment=assessment).delete()
+
+        forget_navigation(assessment.id)
+        self.assertEqual(AssessmentNavigator(assessment).next_unanswered(), self.questions[0].id)
+
+    def test_concurrent_saves_never_lose_a_mark(self):
+        q = self.questions
+        assessment = self.new_assessment()
+        AssessmentNavigator(assessment).save()
+        # Two requests load the assessment and its navigation before either saves.
+        first, second = Assessment.objects.get(id=assessment.id), Assessment.objects.get(id=assessment.id)
+        first_navigator, second_navigator = AssessmentNavigator(first), AssessmentNavigator(second)
+        record_answer(first, q[0].id, self.no.id)
+        first_navigator.mark_answered(q[0].id)
+        record_answer(second, q[1].id, self.no.id)
+        second_navigator.mark_answered(q[1].id)
+        second_navigator.save()
+        first_navigator.save()
+
+        assessment.refresh_from_db()
+        navigator = AssessmentNavigator(assessment)
+        self.assertEqual(navigator.next_unanswered(), q[2].id)
+        self.assertEqual(navigator.progress(), (3, 6))
+
+    def test_answers_saved_elsewhere_reload_the_state(self):
+        assessment = self.new_assessment()
+        AssessmentNavigator(assessment).save()
+        apply_sync(assessment, [{'question': self.questions[0].id, 'option': self.no.id, 'base_version': 0}])
+        with self.assertNumQueries(1):
+            navigator = AssessmentNavigator(assessment)
+        self.assertTrue(navigator.is_answered(self.questions[0].id))
+        navigator.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(AssessmentNavigator(assessment).next_unanswered(), self.questions[1].id)
+
+
+class ExportTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_bulk_export_rejects_non_numeric_customer(self):
+        response = self.client.get(reverse('export_assessments'), {'customer': 'acme'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_export_unknown_customer(self):
+        response = self.client.get(reverse('export_assessments'), {'customer': '999999'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_export_lists_completed_answers(self):
+        assessment = self.new_assessment(status='completed')
+        self.answer(assessment, self.questions[:2])
+        response = self.client.get(reverse('export_assessments'), {'customer': str(self.customer.id)})
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('Access control 1?', body)
+        self.assertIn('Access control 2?', body)
+
+
+class QuestionUploadTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+
+    def upload(self, content, **fields):
+        upload = SimpleUploadedFile('questions.csv', content, content_type='text/csv')
+        return self.client.post(reverse('admin:question_csv_upload'), dict({'csv_file': upload, 'mode': 'append'}, **fields), follow=True)
+
+    def test_non_utf8_file_is_reported(self):
+        content = (
+            'text,category,question_type,weight,neutral,is_count_question\n'
+            'Caf\xe9 Wi-Fi isolated?,Network,yes_no,2,false,false\n'
+        ).encode('latin-1')
+        for mode in ('append', 'sync'):
+            response = self.upload(content, mode=mode, dry_run='')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('not UTF-8', ' '.join(str(message) for message in response.context['messages']))
+        self.assertFalse(Question.objects.filter(category__name='Network').exists())
+
+
+def question_csv(*rows):
+    header = 'text,category,question_type,weight,neutral,is_count_question,standardized_inputs,score_values,preferred_input,external_id\n'
+    return io.BytesIO((header + ''.join(f'{row}\n' for row in rows)).encode('utf-8'))
+
+
+class QuestionImportTests(BankTestCase):
+    def test_append_imports_every_row_without_external_id(self):
+        # Regression: rows without an external_id were rejected as "already exists"
+        # after the first one.
+        importer = QuestionImporter().run(question_csv(
+            'Guest Wi-Fi isolated?,Network,yes_no,2,false,false,"Yes,No","0,2",Yes,',
+            'Firewall reviewed?,Network,yes_no,3,false,false,"Yes,No","0,3",Yes,',
+            'Switches patched?,Network,yes_no,1,false,false,"Yes,No","0,1",Yes,',
+        ))
+        self.assertEqual(importer.errors, [])
+        self.assertEqual(importer.imported, 3)
+        self.assertEqual(Question.objects.filter(category__name='Network').count(), 3)
+        self.assertEqual(importer.categories_created, 1)
+
+    def test_append_rejects_taken_external_id(self):
+        Question.objects.filter(id=self.questions[0].id).update(external_id='AC-1')
+        importer = QuestionImporter().run(question_csv(
+            'Access reviewed?,Access,yes_no,2,false,false,"Yes,No","0,2",Yes,AC-1',
+            'MFA enforced?,Access,yes_no,2,false,false,"Yes,No","0,2",Yes,AC-9',
+            'MFA enforced again?,Access,yes_no,2,false,false,"Yes,No","0,2",Yes,AC-9',
+        ))
+        self.assertEqual(importer.imported, 1)
+        self.assertEqual(len(importer.errors), 2)
+        self.assertTrue(Question.objects.filter(external_id='AC-9', text='MFA enforced?').exists())
+
+
+class QuestionSyncTests(BankTestCase):
+    def test_resyncing_the_bank_changes_nothing(self):
+        sync = QuestionSync().run(question_csv(*self.bank_rows()))
+        self.assertEqual((len(sync.new), len(sync.changed), len(sync.unchanged), len(sync.removed)), (0, 0, 6, 0))
+
+    def test_sync_inserts_updates_and_keeps_missing(self):
+        rows = self.bank_rows()
+        rows[0] = rows[0].replace(',2,false', ',5,false').replace('"0,2"', '"0,5"')
+        rows[1] = rows[1].replace('"Yes,No","0,2"', '"Yes,No,Unsure","0,2,1"')
+        del rows[5]
+        rows.append('Restores tested?,Backups,yes_no,4,false,false,"Yes,No","0,4",Yes,BK-9')
+
+        sync = QuestionSync().run(question_csv(*rows))
+        self.assertEqual(sync.errors, [])
+        self.assertEqual([parsed.question.text for parsed in sync.new], ['Restores tested?'])
+        self.assertEqual(
+            {change.existing.id: change.changed_fields for change in sync.changed},
+            {self.questions[0].id: ['weight', 'options'], self.questions[1].id: ['options']},
+        )
+        self.assertEqual([existing.id for existing in sync.removed], [self.questions[5].id])
+
+        self.assertEqual(Question.objects.get(id=self.questions[0].id).weight, 5)
+        self.assertEqual(
+            QuestionInputOption.objects.get(question=self.questions[0], standardized_input=self.no).score_value, 5
+        )
+        self.assertEqual(QuestionInputOption.objects.filter(question=self.questions[1]).count(), 3)
+        self.assertTrue(Question.objects.filter(external_id='BK-9').exists())
+        # Without delete_missing the question left out of the file stays.
+        self.assertTrue(Question.objects.filter(id=self.questions[5].id).exists())
+
+    def test_sync_delete_missing(self):
+        sync = QuestionSync(delete_missing=True).run(question_csv(*self.bank_rows()[:5]))
+        self.assertEqual([existing.id for existing in sync.removed], [self.questions[5].id])
+        self.assertFalse(Question.objects.filter(id=self.questions[5].id).exists())
+
+    def test_dry_run_writes_nothing(self):
+        rows = self.bank_rows()[:5]
+        rows[0] = rows[0].replace(',2,false', ',5,false')
+        rows.append('Restores tested?,Backups,yes_no,4,false,false,"Yes,No","0,4",Yes,')
+
+        with self.assertNumQueries(2):
+            sync = QuestionSync(delete_missing=True).run(question_csv(*rows), dry_run=True)
+        self.assertEqual((len(sync.new), len(sync.changed), len(sync.removed)), (1, 1, 1))
+        self.assertEqual(Question.objects.count(), 6)
+        self.assertEqual(Question.objects.get(id=self.questions[0].id).weight, 2)
+
+    def test_external_id_match_survives_a_text_change(self):
+        Question.objects.filter(id=self.questions[0].id).update(external_id='AC-1')
+        sync = QuestionSync().run(question_csv(
+            'Access control 1 (reworded)?,Access,yes_no,2,false,false,"Yes,No","0,2",Yes,AC-1'
+        ))
+        self.assertEqual([change.existing.id for change in sync.changed], [self.questions[0].id])
+        self.assertEqual(Question.objects.get(external_id='AC-1').text, 'Access control 1 (reworded)?')
+
+
+class AnswerWriteTests(BankTestCase):
+    def test_record_answer_upserts_and_bumps_the_version(self):
+        assessment = self.new_assessment()
+        question = self.questions[0]
+        first = record_answer(assessment, question.id, self.no.id)
+        second = record_answer(assessment, question.id, self.yes.id, note='fixed')
+        self.assertEqual((first.id, first.version, second.version), (second.id, 1, 2))
+        stored = UserAnswer.objects.get(assessment=assessment, question=question)
+        self.assertEqual((stored.selected_option_id, stored.score, stored.note, stored.version), (self.yes.id, 0, 'fixed', 2))
+
+    def test_record_answers_upserts_and_bumps_versions(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:2])
+        self.answer(assessment, self.questions[1:3], option=self.yes)
+        self.assertEqual(
+            dict(UserAnswer.objects.filter(assessment=assessment).values_list('question_id', 'version')),
+            {self.questions[0].id: 1, self.questions[1].id: 2, self.questions[2].id: 1},
+        )
+
+    def test_rescore_bumps_the_version_of_rewritten_answers(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:2])
+        UserAnswer.objects.filter(assessment=assessment, question=self.questions[0]).update(score=99)
+
+        stale = rescore_assessment(assessment.id)
+        self.assertEqual([answer.question_id for answer in stale], [self.questions[0].id])
+        self.assertEqual(
+            dict(UserAnswer.objects.filter(assessment=assessment).values_list('question_id', 'version')),
+            {self.questions[0].id: 2, self.questions[1].id: 1},
+        )
+
+    def upsert(self, assessment, option, **values):
+        return upsert_answer(assessment.id, self.questions[0].id, dict({
+            'answer_text': '', 'selected_option_id': option.id, 'note': '', 'score': 2, 'max_score': 2,
+        }, **values))
+
+    def test_upsert_answer_inserts_then_updates(self):
+        assessment = self.new_assessment()
+        answer_id, version = self.upsert(assessment, self.no)
+        stored = UserAnswer.objects.get(assessment=assessment, question=self.questions[0])
+        self.assertEqual((answer_id, version), (stored.id, 1))
+
+        self.assertEqual(self.upsert(assessment, self.yes, score=0, note='fixed'), (answer_id, 2))
+        stored.refresh_from_db()
+        self.assertEqual(
+            (stored.selected_option_id, stored.score, stored.note, stored.version), (self.yes.id, 0, 'fixed', 2),
+        )
+        self.assertEqual(UserAnswer.objects.filter(assessment=assessment).count(), 1)
+
+    def test_upsert_answer_without_on_conflict_support(self):
+        assessment = self.new_assessment()
+        with mock.patch('assessment.scoring.connection', mock.Mock(vendor='other')):
+            answer_id, version = self.upsert(assessment, self.no)
+            self.assertEqual(version, 1)
+            self.assertEqual(self.upsert(assessment, self.yes, score=0), (answer_id, 2))
+        stored = UserAnswer.objects.get(id=answer_id)
+        self.assertEqual((stored.selected_option_id, stored.score, stored.version), (self.yes.id, 0, 2))
+
+    def test_admin_edit_rescores_the_answer(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:2])
+        answer = UserAnswer.objects.get(assessment=assessment, question=self.questions[0])
+        answer.selected_option = self.yes
+        answer.score = 99
+        admin.site._registry[UserAnswer].save_model(None, answer, None, True)
+
+        answer.refresh_from_db()
+        self.assertEqual((answer.score, answer.max_score), (0, 2))
+        self.assertEqual(
+            list(CategoryScore.objects.filter(assessment=assessment).values_list('score', 'max_score')), [(2, 4)],
+        )
+        self.assertTrue({'score', 'max_score'} <= set(admin.site._registry[UserAnswer].readonly_fields))
+
+
+class AnswerSyncTests(BankTestCase):
+    def change(self, question, option, base_version, **fields):
+        return dict(question=question.id, option=option.id, base_version=base_version, **fields)
+
+    def test_change_from_the_stored_version_is_applied(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:1])
+        result = apply_sync(assessment, [self.change(self.questions[0], self.yes, 1), self.change(self.questions[1], self.no, 0)])
+        self.assertEqual(result['conflicts'], [])
+        self.assertEqual({(row['question'], row['version']) for row in result['applied']}, {
+            (self.questions[0].id, 2), (self.questions[1].id, 1),
+        })
+
+    def test_stale_change_is_a_conflict_whatever_the_client_clock_says(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:1])
+        self.answer(assessment, self.questions[:1], option=self.yes)
+        future = (timezone.now() + datetime.timedelta(days=1)).isoformat()
+        result = apply_sync(assessment, [self.change(self.questions[0], self.no, 1, answered_at=future)])
+        self.assertEqual(result['applied'], [])
+        self.assertEqual([(row['question'], row['option'], row['version']) for row in result['conflicts']], [
+            (self.questions[0].id, self.yes.id, 2),
+        ])
+        self.assertEqual(UserAnswer.objects.get(assessment=assessment).selected_option_id, self.yes.id)
+
+    def test_admin_edit_makes_older_offline_changes_conflict(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:1])
+        answer = UserAnswer.objects.get(assessment=assessment)
+        answer.selected_option = self.yes
+        admin.site._registry[UserAnswer].save_model(None, answer, None, True)
+        self.assertEqual(answer.version, 2)
+        self.assertIn('version', admin.site._registry[UserAnswer].readonly_fields)
+
+        result = apply_sync(assessment, [self.change(self.questions[0], self.no, 1)])
+        self.assertEqual(result['applied'], [])
+        self.assertEqual([(row['option'], row['version']) for row in result['conflicts']], [(self.yes.id, 2)])
+        self.assertEqual(UserAnswer.objects.get(assessment=assessment).selected_option_id, self.yes.id)
+
+    def test_answers_changed_elsewhere_are_returned(self):
+        assessment = self.new_assessment()
+        since = apply_sync(assessment, [])['server_time']
+        self.answer(assessment, self.questions[2:3])
+        result = apply_sync(assessment, [self.change(self.questions[0], self.no, 0)], since=since)
+        self.assertEqual([row['question'] for row in result['changed']], [self.questions[2].id])
+
+
+class PortfolioTests(BankTestCase):
+    """Every write path must leave the portfolio tables as a full rebuild would."""
+
+    def stat_rows(self):
+        rows = {}
+        for model, key_fields, _, fields in STAT_TABLES:
+            rows[model.__name__] = sorted(
+                row for row in model.objects.values_list(*key_fields, *fields) if any(row[len(key_fields):])
+            )
+        return rows
+
+    def assert_portfolio_consistent(self):
+        maintained = self.stat_rows()
+        rebuild_portfolio()
+        self.assertEqual(maintained, self.stat_rows())
+
+    def completed_assessment(self, questions=None):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions if questions is None else questions)
+        Assessment.objects.filter(id=assessment.id).update(status='completed')
+        add_assessment(assessment.id)
+        assessment.refresh_from_db()
+        return assessment
+
+    def test_answer_changes_after_completion(self):
+        assessment = self.completed_assessment(self.questions[:4])
+        self.completed_assessment()
+        self.answer(assessment, self.questions[2:], option=self.yes)
+        self.assert_portfolio_consistent()
+
+    def test_admin_deletes_assessments(self):
+        assessment_admin = admin.site._registry[Assessment]
+        kept = self.completed_assessment()
+        assessment_admin.delete_model(None, self.completed_assessment())
+        assessment_admin.delete_queryset(None, Assessment.objects.filter(id=self.completed_assessment().id))
+        self.assertEqual(list(Assessment.objects.filter(in_portfolio=True)), [kept])
+        self.assert_portfolio_consistent()
+
+    def test_admin_edits_and_deletes_answers(self):
+        answer_admin = admin.site._registry[UserAnswer]
+        assessment = self.completed_assessment()
+        self.completed_assessment()
+        answers = UserAnswer.objects.filter(assessment=assessment).order_by('question__order')
+
+        edited = answers[0]
+        edited.selected_option = self.yes
+        answer_admin.save_model(None, edited, None, True)
+        answer_admin.delete_model(None, answers[1])
+        answer_admin.delete_queryset(None, answers.filter(question__in=self.questions[4:]))
+        self.assertEqual(answers.count(), 3)
+        self.assert_portfolio_consistent()
+
+    def test_rescore_after_a_weight_change(self):
+        self.completed_assessment()
+        assessment = self.completed_assessment()
+        QuestionInputOption.objects.filter(question=self.questions[0], standardized_input=self.no).update(score_value=5)
+        bump_question_bank_version()
+        self.assertEqual(len(rescore_assessment(assessment.id)), 1)
+        self.assert_portfolio_consistent()
+
+    def test_question_sync_deleting_answered_questions(self):
+        assessment = self.completed_assessment()
+        freeze_scorecard(assessment)
+        version = assessment.answers_version
+        QuestionSync(delete_missing=True).run(question_csv(*self.bank_rows()[:5]))
+
+        assessment = Assessment.objects.select_related('scorecard').get(id=assessment.id)
+        self.assertGreater(assessment.answers_version, version)
+        self.assertEqual(
+            list(CategoryScore.objects.filter(assessment=assessment, category=self.categories[1]).values_list(
+                'score', 'max_score', 'answer_count',
+            )),
+            [(4, 4, 2)],
+        )
+        self.assertEqual(frozen_scorecard(assessment).answer_count, 5)
+        self.assert_portfolio_consistent()
+
+    def test_question_sync_weight_change_rescores_answers(self):
+        q = self.questions
+        in_progress = self.new_assessment()
+        self.answer(in_progress, q[:1])
+        unfrozen = self.completed_assessment(q[:1])
+        frozen = self.completed_assessment(q[:2])
+        freeze_scorecard(frozen)
+        rows = self.bank_rows()
+        rows[0] = rows[0].replace(',2,false', ',5,false').replace('"0,2"', '"0,5"')
+
+        sync = QuestionSync().run(question_csv(*rows))
+        self.assertEqual(sync.rescored, [in_progress.id, unfrozen.id])
+        scores = dict(UserAnswer.objects.filter(question=q[0]).values_list('assessment_id', 'score'))
+        self.assertEqual(scores, {in_progress.id: 5, unfrozen.id: 5, frozen.id: 2})
+        self.assertEqual(
+            CategoryScore.objects.get(assessment=in_progress, category=self.categories[0]).score, 5,
+        )
+        self.assertIsNotNone(frozen_scorecard(Assessment.objects.select_related('scorecard').get(id=frozen.id)))
+        self.assert_portfolio_consistent()
+
+
+class ScorecardTests(BankTestCase):
+    def complete(self, assessment):
+        assessment.status = 'completed'
+        admin.site._registry[Assessment].save_model(None, assessment, None, True)
+        return Assessment.objects.select_related('scorecard').get(id=assessment.id)
+
+    def test_admin_completion_freezes_the_scorecard(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:2])
+        scorecard = frozen_scorecard(self.complete(assessment))
+        self.assertIsNotNone(scorecard)
+        self.assertEqual((scorecard.actual_score, scorecard.answer_count), (4, 2))
+
+    def test_answer_edits_after_completion_freeze_again(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:2])
+        assessment = self.complete(assessment)
+        self.answer(assessment, self.questions[:1], option=self.yes)
+        record_answer(assessment, self.questions[2].id, self.no.id)
+        apply_sync(assessment, [{'question': self.questions[3].id, 'option': self.no.id, 'base_version': 0}])
+
+        assessment = Assessment.objects.select_related('scorecard').get(id=assessment.id)
+        scorecard = frozen_scorecard(assessment)
+        self.assertIsNotNone(scorecard)
+        self.assertEqual((scorecard.actual_score, scorecard.answer_count), (6, 4))
+
+    def test_rescoring_a_completed_assessment_freezes_again(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:2])
+        self.complete(assessment)
+        QuestionInputOption.objects.filter(question=self.questions[0], standardized_input=self.no).update(score_value=5)
+        bump_question_bank_version()
+        rescore_assessment(assessment.id)
+
+        scorecard = frozen_scorecard(Assessment.objects.select_related('scorecard').get(id=assessment.id))
+        self.assertEqual(scorecard.actual_score, 7)
+
+    def test_bank_edits_leave_the_scorecard_alone(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:2])
+        self.complete(assessment)
+        QuestionInputOption.objects.filter(standardized_input=self.no).update(score_value=5)
+        bump_question_bank_version()
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('assessment_summary', args=[assessment.id]))
+        self.assertEqual((response.context['actual_score'], response.context['max_score']), (4, 4))
+
+
+class QuoteTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(
+            name='Endpoint protection', item_number='EP-1', unit_type='per device', quantity_source_count_type='pc',
+        )
+        Question.objects.filter(id=self.questions[0].id).update(recommended_product=self.product)
+        self.count_question = Question.objects.create(
+            category=self.categories[0], text='How many workstations?', question_type='input',
+            is_count_question=True, count_type='pc', order=100 * ORDER_GAP,
+        )
+        bump_question_bank_version()
+        self.assessment = self.new_assessment()
+        record_answers(self.assessment, [
+            AnswerInput(self.questions[0].id, self.no.id, '', ''),
+            AnswerInput(self.count_question.id, None, '1,200 laptops', ''),
+        ])
+
+    def test_quote_is_cached_per_answers_and_bank_version(self):
+        quote = get_quote(self.assessment)
+        self.assertEqual([(line.item_number, line.quantity) for line in quote.lines], [('EP-1', 1200)])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_quote(self.assessment), quote)
+
+        # Products are not in the snapshot; a product change retires quotes through the bank version.
+        Product.objects.filter(id=self.product.id).update(name='Managed endpoint protection')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_quote(self.assessment).lines[0].name, 'Endpoint protection')
+        bump_question_bank_version()
+        self.assertEqual(get_quote(self.assessment).lines[0].name, 'Managed endpoint protection')
+
+        record_answers(self.assessment, [AnswerInput(self.questions[0].id, self.yes.id, '', '')])
+        self.assertEqual(get_quote(self.assessment).lines, ())
+
+
+class ComparisonTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        q = self.questions
+        self.first = self.new_assessment()
+        self.second = self.new_assessment()
+        Assessment.objects.filter(id=self.first.id).update(date_started=timezone.now() - datetime.timedelta(days=30))
+        self.answer(self.first, [q[0], q[1]])
+        self.answer(self.first, [q[3]], self.yes)
+        self.answer(self.second, [q[0]], self.yes)
+        self.answer(self.second, [q[1], q[3]])
+
+    def test_deltas_from_oldest_to_newest(self):
+        snapshot = get_question_bank_snapshot()
+        with self.assertNumQueries(2):
+            # Passed newest first; columns still run oldest first.
+            comparison = compare_assessments([self.second.id, self.first.id], snapshot)
+        self.assertEqual([assessment.id for assessment in comparison['assessments']], [self.first.id, self.second.id])
+        access, backups = comparison['categories']['Access'], comparison['categories']['Backups']
+        self.assertEqual(
+            [(row['id'], row['delta'], row['changed']) for row in access['questions']],
+            [(self.questions[0].id, -2, True), (self.questions[1].id, 0, False)],
+        )
+        self.assertEqual([(row['delta'], row['changed']) for row in backups['questions']], [(2, True)])
+        self.assertEqual(access['columns'], [{'score': 4, 'percent': 100.0}, {'score': 2, 'percent': 50.0}])
+        self.assertEqual((access['delta'], backups['delta'], comparison['total_delta']), (-2, 2, 0))
+
+    def test_unanswered_cells_are_empty(self):
+        self.answer(self.second, [self.questions[5]])
+        backups = compare_assessments([self.first.id, self.second.id])['categories']['Backups']
+        row = backups['questions'][-1]
+        self.assertEqual((row['cells'][0], row['cells'][1]['score'], row['delta']), (None, 2, 0))
+
+    def test_trend_api(self):
+        self.client.force_login(self.user)
+        trend = self.client.get(reverse('customer_trend_api', args=[self.customer.id])).json()
+        self.assertEqual(
+            [(point['id'], point['risk_percent']) for point in trend['assessments']],
+            [(self.first.id, 66.7), (self.second.id, 66.7)],
+        )
+        self.assertEqual(trend['categories'], [
+            {'name': 'Access', 'risk_percents': [100.0, 50.0]},
+            {'name': 'Backups', 'risk_percents': [0.0, 100.0]},
+        ])
+
+
+class ConditionalGetTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.assessment = self.new_assessment()
+        self.answer(self.assessment, self.questions[:2])
+        self.client.force_login(self.user)
+        self.url = reverse('assessment_summary', args=[self.assessment.id])
+        # The ETag covers the CSRF cookie, which the first page view sets.
+        self.client.get(self.url)
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        # Only the assessment row is read before answering 304.
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_answer_write_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.answer(self.assessment, self.questions[2:3])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_background_export_is_never_not_modified(self):
+        url = reverse('export_assessment_summary', args=[self.assessment.id])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, {'background': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 302)
+
+
+class EstimatedCountTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        self.answer(self.new_assessment(), self.questions)
+        self.highest = UserAnswer.objects.order_by('-id').values_list('id', flat=True)[0]
+        UserAnswer.objects.filter(question__in=self.questions[:2]).delete()
+
+    def test_sqlite_estimates_whole_tables_from_the_highest_id(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(estimated_count(UserAnswer.objects.all()), self.highest)
+        with self.assertNumQueries(0):
+            self.assertIsNone(estimated_count(UserAnswer.objects.filter(flag_required=True)))
+
+    def test_paginator_estimates_only_above_the_threshold(self):
+        self.assertEqual(EstimatedCountPaginator(UserAnswer.objects.order_by('id'), 2).count, 4)
+        with mock.patch('assessment.admin.ESTIMATED_COUNT_THRESHOLD', 1):
+            paginator = EstimatedCountPaginator(UserAnswer.objects.order_by('id'), 2)
+            self.assertEqual(paginator.count, self.highest)
+            self.assertEqual(len(paginator.page(1).object_list), 2)
+            # Filtered lists cannot be estimated on SQLite and keep the exact count.
+            filtered = UserAnswer.objects.filter(question__in=self.questions[2:4]).order_by('id')
+            self.assertEqual(EstimatedCountPaginator(filtered, 2).count, 2)
+
+    def test_changelist_renders(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        with mock.patch('assessment.admin.ESTIMATED_COUNT_THRESHOLD', 1):
+            response = self.client.get(reverse('admin:assessment_useranswer_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), 4)
+
+
+class SearchTests(BankTestCase):
+    def note(self, assessment, questions, note):
+        return record_answers(assessment, [AnswerInput(question.id, self.no.id, '', note) for question in questions])
+
+    def test_parse_terms(self):
+        self.assertEqual(parse_terms('Firewall, "guest  network" back* - !!'), [
+            (['Firewall'], False), (['guest', 'network'], False), (['back'], True),
+        ])
+        self.assertEqual(parse_terms('"multi-factor auth"'), [(['multi', 'factor', 'auth'], False)])
+        self.assertEqual(parse_terms('  '), [])
+        self.assertEqual(search('?!').hits, [])
+
+    def test_title_matches_rank_first(self):
+        in_body = Question.objects.create(
+            category=self.categories[0], text='Is logging enabled?', question_type='yes_no', order=100 * ORDER_GAP,
+            explanation_text='The central log collects firewall events along with system and application logs.',
+        )
+        in_title = Question.objects.create(
+            category=self.categories[0], text='Is the firewall reviewed?', question_type='yes_no', order=101 * ORDER_GAP,
+        )
+        hits = search('firewall').hits
+        self.assertEqual([hit.document.question_id for hit in hits], [in_title.id, in_body.id])
+        self.assertGreater(hits[0].rank, hits[1].rank)
+        self.assertEqual([hit.document.question_id for hit in search('fire*').hits], [in_title.id, in_body.id])
+        self.assertEqual(search('"firewall reviewed"').hits[0].document.question_id, in_title.id)
+        self.assertEqual(len(search('"reviewed firewall"').hits), 0)
+
+    def test_kind_and_customer_filters(self):
+        other = Customer.objects.create(name='Globex')
+        ours = self.new_assessment()
+        theirs = Assessment.objects.create(customer=other, employee=self.user)
+        self.note(ours, self.questions[3:4], 'Tape rotation is weekly.')
+        self.note(theirs, self.questions[4:5], 'Tape rotation is monthly.')
+
+        questions = search('backups', kind='question').hits
+        self.assertEqual({hit.document.question_id for hit in questions}, {q.id for q in self.questions[3:]})
+        self.assertTrue(all(hit.document.answer_id is None for hit in questions))
+        answers = search('backups', kind='answer').hits
+        self.assertEqual({hit.document.assessment_id for hit in answers}, {ours.id, theirs.id})
+        self.assertEqual([hit.document.assessment_id for hit in search('tape', customer_id=other.id).hits], [theirs.id])
+        self.assertEqual(search('tape', customer_id=other.id).hits[0].document.assessment.customer.name, 'Globex')
+
+    def test_snippet_is_escaped(self):
+        self.note(self.new_assessment(), self.questions[:1], '<script>alert(1)</script> tape & disk')
+        snippet = search('tape').hits[0].snippet
+        self.assertIn('&lt;script&gt;', snippet)
+        self.assertIn('<mark>tape</mark>', snippet)
+        self.assertIn('&amp;', snippet)
+        self.assertNotIn('<script>', snippet)
+
+    def test_pages_report_whether_more_follow(self):
+        self.note(self.new_assessment(), self.questions, 'Checked on site.')
+        first = search('checked', page=1, per_page=4)
+        second = search('checked', page=2, per_page=4)
+        self.assertEqual((len(first.hits), first.has_next), (4, True))
+        self.assertEqual((len(second.hits), second.has_next), (2, False))
+        self.assertFalse({hit.document.id for hit in first.hits} & {hit.document.id for hit in second.hits})
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('search_api'), {'q': 'checked', 'page': 2, 'kind': 'answer'})
+        self.assertEqual(response.json()['has_next'], False)
+        self.assertEqual(response.json()['page'], 2)
+
+    def test_filter_answers(self):
+        assessment = self.new_assessment()
+        self.note(assessment, self.questions[:2], 'Tape rotation is weekly.')
+        self.note(assessment, self.questions[2:4], 'Disk snapshots only.')
+        answers = UserAnswer.objects.filter(assessment=assessment)
+        self.assertEqual(
+            set(filter_answers(answers, 'tape weekly').values_list('question_id', flat=True)),
+            {q.id for q in self.questions[:2]},
+        )
+        self.assertFalse(filter_answers(answers, '').exists())
+        self.assertEqual(filter_answers(answers, 'access control').count(), 3)
+        self.assertFalse(filter_answers(answers, 'offsite').exists())
+
+    def test_rebuild_search_index(self):
+        self.note(self.new_assessment(), self.questions[:2], 'Tape rotation is weekly.')
+        SearchDocument.objects.all().delete()
+        self.assertEqual(search('tape').hits, [])
+        progress = []
+        self.assertEqual(rebuild_search_index(batch_size=1, on_progress=progress.append), len(self.questions) + 2)
+        self.assertEqual(progress[-1], len(self.questions) + 2)
+        self.assertEqual(len(search('tape').hits), 2)
+        self.assertEqual(len(search('control', kind='question').hits), len(self.questions))
+
+
+class ReportTests(BankTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def assert_valid_pdf(self, content):
+        """Every xref entry points at its object and startxref at the xref table."""
+        self.assertTrue(content.startswith(b'%PDF-1.4\n'))
+        self.assertTrue(content.endswith(b'%%EOF\n'))
+        xref = int(re.search(rb'startxref\n(\d+)\n%%EOF\n$', content).group(1))
+        self.assertEqual(content[xref:xref + 5], b'xref\n')
+        count = int(re.match(rb'xref\n0 (\d+)\n', content[xref:]).group(1))
+        entries = re.findall(rb'(\d{10}) 00000 n \n', content[xref:])
+        self.assertEqual(len(entries), count - 1)
+        for number, offset in enumerate(entries, start=1):
+            self.assertTrue(content[int(offset):].startswith(f'{number} 0 obj\n'.encode()), number)
+        self.assertIn(f'/Size {count} '.encode(), content)
+
+    def page_text(self, content):
+        return b''.join(zlib.decompress(stream) for stream in re.findall(rb'stream\n(.*?)\nendstream', content, re.S))
+
+    def test_report_with_a_non_ascii_customer(self):
+        customer = Customer.objects.create(name='Müller & Søn (Łódź) 東京')
+        assessment = Assessment.objects.create(customer=customer, employee=self.user)
+        self.answer(assessment, self.questions)
+
+        name = render_report(assessment)
+        with default_storage.open(name, 'rb') as report:
+            content = report.read()
+        self.assert_valid_pdf(content)
+        # Page text is WinAnsi: ü and ø as their code points, Ł without its stroke.
+        self.assertIn(rb'(M\374ller & S\370n \(L\363dz\) ?? - Assessment Summary)', self.page_text(content))
+        # The title metadata keeps every character.
+        self.assertIn(customer.name.encode('utf-16-be').hex().upper().encode(), content)
+
+    def test_rerender_replaces_the_older_report(self):
+        assessment = self.new_assessment()
+        self.answer(assessment, self.questions[:2])
+        first = render_report(assessment)
+        self.assertEqual(render_report(assessment), first)
+        self.answer(assessment, self.questions[2:4])
+        assessment.refresh_from_db()
+        second = render_report(assessment)
+        self.assertNotEqual(second, first)
+        self.assertEqual(default_storage.listdir(REPORT_DIR)[1], [second.rsplit('/', 1)[1]])
+
+
+class PerformanceMiddlewareTests(BankTestCase):
+    def timing_header(self, user):
+        self.client.force_login(user)
+        return self.client.get(reverse('portfolio_dashboard')).headers.get('Server-Timing')
+
+    @override_settings(ASSESSMENT_PERF_ENABLED=False)
+    def test_disabled_middleware_sends_nothing(self):
+        staff = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.assertIsNone(self.timing_header(staff))
+
+    @override_settings(ASSESSMENT_PERF_ENABLED=True, ASSESSMENT_PERF_LOG='')
+    def test_timings_are_sent_to_staff_only(self):
+        self.assertIsNone(self.timing_header(self.user))
+        staff = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.assertIn('queries', self.timing_header(staff))
+
+
+class JobTests(TransactionTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_count_records_counts_multiline_fields_once(self):
+        content = io.BytesIO(
+            b'text,category\n"First line\nsecond line",Access\nPlain,Access\n"A\n\nB",Backups\n'
+        )
+        self.assertEqual(count_records(content), 3)
+        self.assertEqual(content.tell(), 0)
+
+    def test_progress_is_visible_while_the_job_runs(self):
+        job = Job.objects.create(kind='export_assessments')
+        reporter = ProgressReporter(job)
+        self.addCleanup(reporter.close)
+        reporter.set_total(10)
+        reporter(4, force=True)
+        job.refresh_from_db()
+        self.assertEqual((job.progress, job.total, job.percent), (4, 10, 40))
+
+    def test_import_job_reports_records_not_lines(self):
+        job = enqueue('import_questions', params={'mode': 'append'}, input_file=SimpleUploadedFile('questions.csv', (
+            b'text,category,question_type,weight,neutral,is_count_question\n'
+            b'"Is the guest network\nisolated?",Network,yes_no,2,false,false\n'
+            b'Firewall reviewed?,Network,yes_no,3,false,false\n'
+        )))
+        job = run_job(claim_next('test-worker'))
+        self.assertEqual(job.status, 'succeeded', job.message)
+        self.assertEqual((job.progress, job.total), (2, 2))
+        self.assertEqual(Question.objects.filter(category__name='Network').count(), 2)
+
+    def make_stale(self, job):
+        Job.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - datetime.timedelta(minutes=10))
+
+    def test_heartbeat_keeps_a_quiet_job_claimed(self):
+        enqueue('rebalance_question_order')
+        job = claim_next('worker-a')
+        self.make_stale(job)
+        heartbeat = Heartbeat(job, interval=0.05)
+        heartbeat.start()
+        time.sleep(0.3)
+        heartbeat.stop()
+        self.assertEqual(requeue_stale(60), 0)
+
+    def test_stale_run_finishing_late_leaves_the_new_claim_alone(self):
+        enqueue('rebalance_question_order')
+        first = claim_next('worker-a')
+        self.make_stale(first)
+        self.assertEqual(requeue_stale(60), 1)
+        second = claim_next('worker-b')
+        self.assertEqual(second.id, first.id)
+
+        first = run_job(first)
+        self.assertEqual((first.status, first.worker), ('running', 'worker-b'))
+        self.assertEqual(run_job(second).status, 'succeeded')
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.worker), ('succeeded', 'worker-b'))
+
+
+class QuestionOrderTests(BankTestCase):
+    def orders(self):
+        return dict(Question.objects.values_list('id', 'order'))
+
+    def category_sequence(self, category):
+        return list(Question.objects.filter(category=category).order_by('order').values_list('id', flat=True))
+
+    def assert_unique_orders(self):
+        orders = list(self.orders().values())
+        self.assertEqual(len(orders), len(set(orders)))
+
+    def test_move_writes_only_the_moved_row(self):
+        q = self.questions
+        before = self.orders()
+        new_order, needs_rebalance = move_question(q[2].id, before_id=q[0].id, after_id=q[1].id)
+        self.assertFalse(needs_rebalance)
+        after = self.orders()
+        self.assertEqual({pk for pk in after if after[pk] != before[pk]}, {q[2].id})
+        self.assertEqual(self.category_sequence(self.categories[0]), [q[0].id, q[2].id, q[1].id])
+        self.assert_unique_orders()
+
+    def test_move_to_the_top_stays_after_the_previous_category(self):
+        q = self.questions
+        move_question(q[5].id, after_id=q[3].id)
+        self.assertEqual(self.category_sequence(self.categories[1]), [q[5].id, q[3].id, q[4].id])
+        self.assertGreater(self.orders()[q[5].id], self.orders()[q[2].id])
+        self.assert_unique_orders()
+
+    def test_no_room_renumbers_the_bank(self):
+        q = self.questions
+        Question.objects.filter(id=q[1].id).update(order=q[0].order + 1)
+        new_order, _ = move_question(q[2].id, before_id=q[0].id, after_id=q[1].id)
+        self.assertEqual(self.category_sequence(self.categories[0]), [q[0].id, q[2].id, q[1].id])
+        self.assertEqual(sorted(self.orders().values())[-1] % ORDER_GAP, 0)
+        self.assert_unique_orders()
+
+    def test_move_with_stale_neighbours(self):
+        q = self.questions
+        with self.assertRaises(StaleOrderError):
+            move_question(q[2].id, before_id=q[1].id, after_id=q[0].id)
+        with self.assertRaises(StaleOrderError):
+            # q[1] sits between q[0] and the end of the category.
+            move_question(q[2].id, before_id=q[0].id)
+
+    def test_admin_drag_reuses_the_moved_rows_values(self):
+        q = self.questions
+        # The script numbers the moved rows densely from the row above.
+        QuestionAdmin(Question, admin.site)._update_order(
+            [[str(q[4].id), q[0].order + 1], [str(q[1].id), q[0].order + 2], [str(q[2].id), q[0].order + 3],
+             [str(q[3].id), q[0].order + 4]], {},
+        )
+        self.assertEqual(
+            list(Question.objects.order_by('order').values_list('id', flat=True)),
+            [q[0].id, q[4].id, q[1].id, q[2].id, q[3].id, q[5].id],
+        )
+        self.assert_unique_orders()
+
+    def test_import_appends_after_the_whole_bank(self):
+        QuestionImporter().run(question_csv('MFA enforced?,Access,yes_no,2,false,false,"Yes,No","0,2",Yes,'))
+        self.assertEqual(self.category_sequence(self.categories[0])[-1], Question.objects.get(text='MFA enforced?').id)
+        self.assertEqual(max(self.orders().values()), Question.objects.get(text='MFA enforced?').order)
+        self.assert_unique_orders()
+
+
+class ConcurrentAnswerTests(TransactionTestCase):
+    def test_concurrent_submits_resolve_in_the_database(self):
+        user = User.objects.create_user('engineer')
+        assessment = Assessment.objects.create(customer=Customer.objects.create(name='Acme'), employee=user)
+        question = Question.objects.create(
+            category=Category.objects.create(name='Access'), text='MFA?', question_type='input', order=ORDER_GAP,
+        )
+        submits = 8
+        start = threading.Barrier(submits)
+        results, errors = [], []
+
+        def submit(index):
+            try:
+                start.wait()
+                results.append(upsert_answer(assessment.id, question.id, {
+                    'answer_text': f'submit {index}', 'selected_option_id': None, 'note': '', 'score': 0, 'max_score': 0,
+                }))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit, args=(index,)) for index in range(submits)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        stored = UserAnswer.objects.get(assessment=assessment, question=question)
+        self.assertEqual({answer_id for answer_id, _ in results}, {stored.id})
+        self.assertEqual(sorted(version for _, version in results), list(range(1, submits + 1)))
+        self.assertEqual(stored.version, submits)
+
+
+class AnswerDeduplicationMigrationTests(TransactionTestCase):
+    """0013 keeps the latest of duplicate answers before adding the unique constraint."""
+
+    before = [('assessment', '0012_respace_question_order')]
+    after = [('assessment', '0013_useranswer_unique_question')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_keeps_the_latest_answer(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        old_apps = executor.loader.project_state(self.before).apps
+        user = old_apps.get_model('auth', 'User').objects.create(username='engineer')
+        customer = old_apps.get_model('assessment', 'Customer').objects.create(name='Acme')
+        category = old_apps.get_model('assessment', 'Category').objects.create(name='Access')
+        question = old_apps.get_model('assessment', 'Question').objects.create(
+            category=category, text='MFA enforced?', question_type='input',
+        )
+        other = old_apps.get_model('assessment', 'Question').objects.create(
+            category=category, text='Firewall reviewed?', question_type='input',
+        )
+        assessment = old_apps.get_model('assessment', 'Assessment').objects.create(customer=customer, employee=user)
+        UserAnswer = old_apps.get_model('assessment', 'UserAnswer')
+        for text in ('first', 'second', 'latest'):
+            UserAnswer.objects.create(assessment=assessment, question=question, answer_text=text)
+        UserAnswer.objects.create(assessment=assessment, question=other, answer_text='only')
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        UserAnswer = executor.loader.project_state(self.after).apps.get_model('assessment', 'UserAnswer')
+        self.assertEqual(
+            sorted(UserAnswer.objects.values_list('question_id', 'answer_text')),
+            sorted([(question.id, 'latest'), (other.id, 'only')]),
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UserAnswer.objects.create(assessment_id=assessment.id, question_id=question.id, answer_text='again')
@@ -6,9 +6,26 @@ urlpatterns = [
     path('admin/', admin.site.urls),  
     path('start/', views.start_assessment, name='start_assessment'),
     path('questions/<int:assessment_id>/<int:category_id>/', views.assessment_questions, name='assessment_questions'),
+    path('questions/<int:assessment_id>/<int:category_id>/all/', views.assessment_category, name='assessment_category'),
+    path('api/assessments/<int:assessment_id>/answers/', views.assessment_answers_api, name='assessment_answers_api'),
+    path('api/assessments/<int:assessment_id>/bundle/', views.assessment_bundle_api, name='assessment_bundle_api'),
+    path('api/assessments/<int:assessment_id>/sync/', views.assessment_sync_api, name='assessment_sync_api'),
+    path('api/customers/<int:customer_id>/trend/', views.customer_trend_api, name='customer_trend_api'),
+    path('offline/sw.js', views.offline_service_worker, name='offline_service_worker'),
+    path('offline/<int:assessment_id>/', views.assessment_offline, name='assessment_offline'),
 
     path('manage-question-order/', views.manage_question_order, name='manage_question_order'),
-    path('save-question-order/', views.save_question_order, name='save_question_order'),
+    path('move-question/', views.move_question, name='move_question'),
     path('summary/<int:assessment_id>/', views.assessment_summary, name='assessment_summary'),
+    path('summary/<int:assessment_id>/report.pdf', views.assessment_report, name='assessment_report'),
+    path('summary/<int:assessment_id>/complete/', views.complete_assessment, name='complete_assessment'),
+    path('customers/<int:customer_id>/compare/', views.assessment_comparison, name='assessment_comparison'),
+    path('portfolio/', views.portfolio_dashboard, name='portfolio_dashboard'),
+    path('search/', views.search_page, name='search'),
+    path('api/search/', views.search_api, name='search_api'),
+    path('export/assessments/', views.export_assessments, name='export_assessments'),
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
+    path('jobs/<int:job_id>/progress/', views.job_progress, name='job_progress'),
+    path('jobs/<int:job_id>/result/', views.job_result, name='job_result'),
     path('', views.home, name='home'),
 ]
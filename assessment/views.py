@@ -1,16 +1,44 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
-from django.http import JsonResponse, HttpResponse
+from django.http import (
+    FileResponse, Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse,
+)
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.db import transaction
 from django.db.models import Prefetch
-import csv
 import json
+import os
 from django.utils.safestring import mark_safe
 
 from .models import (
-    Question, Category, Customer, Assessment,
-    StandardizedInput, UserAnswer, QuestionInputOption
+    COUNT_TYPE_CHOICES, Question, Category, Customer, Assessment,
+    UserAnswer, Job
+)
+from .comparison import DEFAULT_COMPARE, compare_assessments, score_trend
+from .conditional import (
+    FRAGMENT_TIMEOUT, assessment_condition, export_condition, fragment_key, get_assessment,
+)
+from .exporters import BULK_HEADER, SUMMARY_HEADER, bulk_answers, bulk_rows, stream_rows, summary_rows
+from .jobs import enqueue
+from .navigation import AssessmentNavigator
+from .ordering import StaleOrderError, move_question as place_question
+from .scoring import (
+    category_rollups, clean_answers, group_answers, radar_values,
+    record_answer, record_answers, rescore_assessment,
 )
+from .portfolio import add_assessment, load_dashboard
+from .quotes import get_quote
+from .reports import cached_report, report_name
+from .scorecards import freeze_scorecard, frozen_scorecard, scorecard_quote
+from .search import KINDS as SEARCH_KINDS, search
+from .snapshot import get_question_bank_snapshot
+from .sync import apply_sync, build_bundle
 
 def home(request):
     return render(request, 'assessment/home.html')
@@ -19,25 +47,37 @@ def home(request):
 @login_required
 def manage_question_order(request):
     categories = Category.objects.prefetch_related(
-        Prefetch('question_set', queryset=Question.objects.order_by('order'))
+        Prefetch('questions', queryset=Question.objects.order_by('order', 'id'))
     ).order_by('name')
     return render(request, 'assessment/manage_question_order.html', {'categories': categories})
 
-# Save Question Order
+# Move a Single Question
 @require_POST
 @login_required
-def save_question_order(request):
+def move_question(request):
+    """
+    Expects {"id": ..., "before": ..., "after": ...} where before/after are the
+    ids of the moved question's new neighbours (null at either end). Only the
+    moved row is written; a background renumber is queued once the gaps
+    around it run out.
+    """
     try:
         data = json.loads(request.body)
-        for category_id, questions in data.items():
-            for item in questions:
-                question_id = item['id']
-                new_order = item['order']
-                Question.objects.filter(id=question_id, category_id=category_id).update(order=new_order)
-        return JsonResponse({'status': 'success'})
+        question_id = int(data['id'])
+        before_id = int(data['before']) if data.get('before') else None
+        after_id = int(data['after']) if data.get('after') else None
+        new_order, needs_rebalance = place_question(question_id, before_id, after_id)
+    except StaleOrderError as e:
+        return JsonResponse({'status': 'stale', 'message': str(e)}, status=409)
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
+    if needs_rebalance:
+        already_queued = Job.objects.filter(kind='rebalance_question_order', status='queued').exists()
+        if not already_queued:
+            enqueue('rebalance_question_order', user=request.user)
+    return JsonResponse({'status': 'success', 'order': new_order, 'rebalance': needs_rebalance})
+
 # Start or Continue an Assessment
 @login_required
 def start_assessment(request):
@@ -54,77 +94,83 @@ def start_assessment(request):
     return render(request, 'assessment/start_assessment.html', {'customers': customers})
 
 @login_required
+@assessment_condition
 def assessment_questions(request, assessment_id, category_id=None):
-    assessment = get_object_or_404(Assessment, id=assessment_id)
+    assessment = get_assessment(request, assessment_id)
     previous_question_id = request.GET.get('previous')
+    snapshot = get_question_bank_snapshot()
+    navigator = AssessmentNavigator(assessment)
 
-    answered_questions = UserAnswer.objects.filter(assessment=assessment).values_list('question_id', flat=True)
-    question_queryset = Question.objects.exclude(id__in=answered_questions).order_by('order')
-    if category_id:
-        question_queryset = question_queryset.filter(category_id=category_id)
-
-    question = get_object_or_404(Question, id=previous_question_id) if previous_question_id else question_queryset.first()
+    question_id = int(previous_question_id) if previous_question_id else navigator.next_unanswered(category_id)
 
-    if not question:
+    if not question_id:
         # Check if there are any remaining questions in ANY category
-        remaining_questions = Question.objects.exclude(id__in=answered_questions)
-        if not remaining_questions.exists():
+        first_remaining = navigator.next_unanswered()
+        navigator.save()
+        if first_remaining is None:
             return redirect('assessment_summary', assessment_id=assessment.id)
         else:
             # Redirect to first unanswered question in another category
-            first_remaining = remaining_questions.first()
-            return redirect('assessment_questions', assessment_id=assessment.id, category_id=first_remaining.category_id)
-
-    existing_answer = UserAnswer.objects.filter(assessment=assessment, question=question).first()
+            return redirect(
+                'assessment_questions',
+                assessment_id=assessment.id,
+                category_id=navigator.order.category_of[first_remaining],
+            )
 
+    question = snapshot.get(question_id)
+    if question is None:
+        raise Http404("No Question matches the given query.")
     if request.method == 'POST':
         if question.question_type == "input":
             # For input-type questions, ignore user's numeric input and use question.weight.
             answer_text = request.POST.get('answer_text', '')
-            selected_option = None
+            selected_option_id = None
         else:
-            # For multiple-choice questions, retrieve the selected option.
+            # For multiple-choice questions, only accept options configured on the question.
             answer_text = ""
             selected_option_id = request.POST.get('answer_option', None)
-            selected_option = StandardizedInput.objects.filter(id=selected_option_id).first() if selected_option_id else None
+            selected_option_id = int(selected_option_id) if selected_option_id and selected_option_id.isdigit() else None
+            if selected_option_id not in question.option_scores:
+                selected_option_id = None
 
         note = request.POST.get('note', '')
 
-        UserAnswer.objects.update_or_create(
-            assessment=assessment,
-            question=question,
-            defaults={
-                'answer_text': answer_text,
-                'selected_option': selected_option,
-                'note': note
-            }
+        record_answer(
+            assessment,
+            question.id,
+            selected_option_id=selected_option_id,
+            answer_text=answer_text,
+            note=note,
         )
+        navigator.mark_answered(question.id)
+        navigator.save()
         if category_id is not None:
             return redirect('assessment_questions', assessment_id=assessment.id, category_id=category_id)
         else:
             return redirect('assessment_questions', assessment_id=assessment.id)
 
-    selected_answer = existing_answer.selected_option.id if existing_answer and existing_answer.selected_option else None
+    existing_answer = (
+        UserAnswer.objects.filter(assessment=assessment, question_id=question.id).first()
+        if navigator.is_answered(question.id) else None
+    )
+    selected_answer = existing_answer.selected_option_id if existing_answer else None
     answer_text = existing_answer.answer_text if existing_answer else ""
     note = existing_answer.note if existing_answer and existing_answer.note else ""
 
-    # For non-input questions, pull the related input options.
-    if question.question_type != "input":
-        input_options = question.input_options.all()
-    else:
-        input_options = []
+    # For non-input questions, offer the options configured on the question.
+    input_options = question.options if question.question_type != "input" else ()
 
-    total_questions = Question.objects.filter(category_id=category_id).count() if category_id else Question.objects.count()
-    current_question_number = (UserAnswer.objects.filter(assessment=assessment, question__category_id=category_id).count() + 1) if category_id else (UserAnswer.objects.filter(assessment=assessment).count() + 1)
+    current_question_number, total_questions = navigator.progress(category_id)
+    navigator.save()
 
     context = {
         'assessment': assessment,
         'question': question,
-        'categories': Category.objects.filter(questions__isnull=False).distinct().order_by('order'),
+        'categories': navigator.order.categories,
         'existing_answer': existing_answer,
         'selected_answer': selected_answer,
-        'previous_question_id': previous_question_id if previous_question_id else None,
-        'current_category': Category.objects.get(id=category_id) if category_id else None,
+        'previous_question_id': navigator.previous(question.id, category_id),
+        'current_category': navigator.order.category(category_id) if category_id else None,
         'current_question_number': current_question_number,
         'total_questions': total_questions,
         'input_options': input_options,
@@ -133,107 +179,419 @@ def assessment_questions(request, assessment_id, category_id=None):
     }
     return render(request, 'assessment/assessment_questions.html', context)
 
+def _next_category_url(assessment, navigator):
+    """Category page of the first unanswered question, or the summary when all are answered."""
+    next_question_id = navigator.next_unanswered()
+    if next_question_id is None:
+        return reverse('assessment_summary', args=[assessment.id])
+    return reverse('assessment_category', args=[assessment.id, navigator.order.category_of[next_question_id]])
+
+def _save_answer_batch(assessment, answers, snapshot):
+    record_answers(assessment, answers.values(), snapshot)
+    navigator = AssessmentNavigator(assessment)
+    for question_id in answers:
+        navigator.mark_answered(question_id)
+    next_url = _next_category_url(assessment, navigator)
+    navigator.save()
+    return navigator, next_url
+
+# Answer a Whole Category at Once
 @login_required
-def assessment_summary(request, assessment_id):
+@assessment_condition
+def assessment_category(request, assessment_id, category_id):
+    assessment = get_assessment(request, assessment_id)
+    snapshot = get_question_bank_snapshot()
+    category = snapshot.category(category_id)
+    if category is None:
+        raise Http404("No Category matches the given query.")
+    question_ids = snapshot.by_category.get(category_id, ())
+
+    if request.method == 'POST':
+        items = []
+        for question_id in question_ids:
+            item = {
+                'question': question_id,
+                'option': request.POST.get(f'answer_option_{question_id}', ''),
+                'text': request.POST.get(f'answer_text_{question_id}', ''),
+                'note': request.POST.get(f'note_{question_id}', ''),
+            }
+            if item['option'] or item['text'] or item['note']:
+                items.append(item)
+        # Like the single-question form, options that are not offered are ignored.
+        answers, _ = clean_answers(items, snapshot)
+        _, next_url = _save_answer_batch(assessment, answers, snapshot)
+        return redirect(next_url)
+
+    existing_answers = {
+        answer.question_id: answer
+        for answer in UserAnswer.objects.filter(assessment=assessment, question_id__in=question_ids)
+    }
+    navigator = AssessmentNavigator(assessment)
+    navigator.save()
+    context = {
+        'assessment': assessment,
+        'categories': navigator.order.categories,
+        'current_category': category,
+        'items': [
+            {'question': snapshot.get(question_id), 'answer': existing_answers.get(question_id)}
+            for question_id in question_ids
+        ],
+        'answered_count': len(existing_answers),
+    }
+    return render(request, 'assessment/assessment_category.html', context)
+
+# Save a Batch of Answers (JSON)
+@require_POST
+@login_required
+def assessment_answers_api(request, assessment_id):
+    """
+    Expects {"answers": [{"question": id, "option": id, "text": "...", "note": "..."}, ...]}.
+    The batch is validated as a whole and, when valid, saved with a single
+    upsert. Returns the number saved, the overall progress and the page to
+    continue on.
+    """
     assessment = get_object_or_404(Assessment, id=assessment_id)
-    categorized_answers = {}
-    category_scores = {}
-    user_answers = UserAnswer.objects.filter(assessment=assessment).select_related('question', 'selected_option')
-
-    actual_score = 0
-    max_score = 0
-
-    for answer in user_answers:
-        question = answer.question
-        category = question.category.name if question.category else "Uncategorized"
-
-        if category not in categorized_answers:
-            categorized_answers[category] = []
-        if category not in category_scores:
-            category_scores[category] = 0
-
-        # For non-input questions, use the score_value of the chosen option.
-        if answer.selected_option:
-            try:
-                qio = QuestionInputOption.objects.get(
-                    question=question,
-                    standardized_input=answer.selected_option
-                )
-                # If score_value is not defined, fallback to question.weight.
-                score = qio.score_value if qio.score_value is not None else (question.weight or 0)
-            except QuestionInputOption.DoesNotExist:
-                score = question.weight or 0
-        else:
-            # For input-type questions, ignore user's input and use question.weight.
-            score = question.weight or 0
+    try:
+        items = json.loads(request.body)['answers']
+        if not isinstance(items, list):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'status': 'error', 'message': "Expected a JSON object with an 'answers' list."}, status=400)
 
-        actual_score += score
-        category_scores[category] += score
+    snapshot = get_question_bank_snapshot()
+    answers, errors = clean_answers(items, snapshot)
+    if errors:
+        return JsonResponse({'status': 'error', 'errors': errors}, status=400)
 
-        # Determine the maximum possible score for this question from its input options.
-        if question.input_options.exists():
-            max_qio = question.input_options.order_by('-score_value').first()
-            max_question = max_qio.score_value if (max_qio and max_qio.score_value is not None) else (question.weight or 0)
-        else:
-            max_question = question.weight or 0
-        max_score += max_question
+    navigator, next_url = _save_answer_batch(assessment, answers, snapshot)
+    answered = sum(navigator.state['counts'].values())
+    return JsonResponse({
+        'status': 'success',
+        'saved': len(answers),
+        'answered': answered,
+        'total': len(snapshot.ordered),
+        'next_url': next_url,
+    })
 
-        if answer.answer_text:
-            display_answer = answer.answer_text
-        elif answer.selected_option:
-            display_answer = answer.selected_option.text
-        else:
-            display_answer = "No answer provided"
+# Offline Assessment Client
+@login_required
+def assessment_offline(request, assessment_id):
+    assessment = get_object_or_404(Assessment.objects.select_related('customer'), id=assessment_id)
+    return render(request, 'assessment/assessment_offline.html', {'assessment': assessment})
 
-        categorized_answers[category].append({
-            "question": question.text,
-            "answer": display_answer,
-            "note": answer.note if answer.note else "",
-        })
+def offline_service_worker(request):
+    """Served from /offline/ so it may control every offline assessment page."""
+    response = render(request, 'assessment/offline_sw.js', content_type='application/javascript')
+    response['Cache-Control'] = 'no-cache'
+    return response
 
-    # Normalize category scores for the radar chart.
-    desired_radar_max = 20  # Desired maximum for the chart scale.
-    if category_scores:
-        max_cat_score = max(category_scores.values())
-        if max_cat_score == 0:
-            normalized_category_scores = {cat: 0 for cat in category_scores}
-        else:
-            normalized_category_scores = {
-                cat: round((score / max_cat_score) * desired_radar_max) for cat, score in category_scores.items()
-            }
+@login_required
+def assessment_bundle_api(request, assessment_id):
+    assessment = get_object_or_404(Assessment.objects.select_related('customer'), id=assessment_id)
+    return JsonResponse(build_bundle(assessment))
+
+@require_POST
+@login_required
+def assessment_sync_api(request, assessment_id):
+    """
+    Expects {"bank_version": ..., "since": ..., "changes": [{"question", "option",
+    "text", "note", "base_version"}, ...]}. Any other keys a change carries are
+    the client's own bookkeeping and are ignored. See sync.apply_sync.
+    """
+    assessment = get_object_or_404(Assessment, id=assessment_id)
+    try:
+        data = json.loads(request.body)
+        changes = data.get('changes', [])
+        if not isinstance(changes, list):
+            raise ValueError
+    except (ValueError, AttributeError):
+        return JsonResponse({'status': 'error', 'message': "Expected a JSON object with a 'changes' list."}, status=400)
+    return JsonResponse(apply_sync(
+        assessment, changes, since=data.get('since'), bank_version=data.get('bank_version'),
+    ))
+
+@login_required
+@assessment_condition
+def assessment_summary(request, assessment_id):
+    assessment = get_assessment(request, assessment_id)
+    # The answer listing only changes with the answers, so it is rendered
+    # once per answers version and reused until the next save.
+    answers_key = fragment_key('summary_answers', assessment)
+    answers_html = cache.get(answers_key)
+
+    scorecard = frozen_scorecard(assessment)
+    if scorecard is not None:
+        # Completed: everything shown was frozen on completion.
+        category_scores = {name: score for name, score, _, _ in scorecard.categories}
+        actual_score, max_score = scorecard.actual_score, scorecard.max_score
+        quote = scorecard_quote(scorecard)
+        if answers_html is None:
+            answers_html = render_to_string(
+                'assessment/summary_answers.html', {'categorized_answers': dict(scorecard.answers)}
+            )
+            cache.set(answers_key, answers_html, FRAGMENT_TIMEOUT)
     else:
-        normalized_category_scores = {}
-    normalized_radar_data = list(normalized_category_scores.values())
+        snapshot = get_question_bank_snapshot()
+        rollups = category_rollups(assessment.id, snapshot)
+        if answers_html is None:
+            user_answers = list(UserAnswer.objects.filter(assessment=assessment))
+            answer_count = sum(row[3] for row in rollups)
+            if answer_count != len(user_answers) or any(answer.score is None for answer in user_answers):
+                # Answers saved before scores were persisted; backfill them once.
+                rescore_assessment(assessment.id, snapshot)
+                rollups = category_rollups(assessment.id, snapshot)
+            answers_html = render_to_string(
+                'assessment/summary_answers.html', {'categorized_answers': group_answers(user_answers, snapshot)}
+            )
+            cache.set(answers_key, answers_html, FRAGMENT_TIMEOUT)
+        category_scores = {name: score for name, score, _, _ in rollups}
+        actual_score = sum(row[1] for row in rollups)
+        max_score = sum(row[2] for row in rollups)
+        quote = get_quote(assessment)
 
+    # Normalize category scores for the radar chart.
     radar_labels = list(category_scores.keys())
-    radar_data_json = json.dumps(normalized_radar_data)
+    radar_data_json = json.dumps(radar_values(category_scores))
     radar_labels_json = json.dumps(radar_labels)
 
+    count_labels = dict(COUNT_TYPE_CHOICES)
+
     context = {
         "assessment": assessment,
-        "categorized_answers": categorized_answers,
+        "answers_html": mark_safe(answers_html),
         "actual_score": actual_score,
         "max_score": max_score,
         "category_scores": category_scores,
         "radar_data_json": radar_data_json,
         "radar_labels_json": radar_labels_json,
+        "quote": quote,
+        "quote_counts": [(count_labels.get(count_type, count_type), value) for count_type, value in quote.counts.items()],
+        "missing_counts": [count_labels.get(count_type, count_type) for count_type in quote.missing_counts],
     }
     return render(request, "assessment/assessment_summary.html", context)
 
+# Compare Assessments
 @login_required
-def export_assessment_summary(request, assessment_id):
-    assessment = get_object_or_404(Assessment, id=assessment_id)
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="Assessment_Summary_{assessment.customer.name}.csv"'
-    writer = csv.writer(response)
-    writer.writerow(["Category", "Question", "Answer", "Notes"])
-
-    user_answers = UserAnswer.objects.filter(assessment=assessment).select_related('question', 'selected_option')
-    for answer in user_answers:
-        category = answer.question.category.name if answer.question.category else "Uncategorized"
-        display_answer = (
-            answer.answer_text if answer.answer_text else
-            (answer.selected_option.text if answer.selected_option else "No answer provided")
+def assessment_comparison(request, customer_id):
+    """Side-by-side diff of a customer's assessments, oldest first."""
+    customer = get_object_or_404(Customer, id=customer_id)
+    history = list(
+        Assessment.objects.filter(customer_id=customer.id).order_by('-date_started', '-id').only('id', 'date_started', 'status')
+    )
+    available = {assessment.id for assessment in history}
+    selected = [int(value) for value in request.GET.getlist('assessment') if value.isdigit() and int(value) in available]
+    if len(selected) < 2:
+        selected = [assessment.id for assessment in history[:DEFAULT_COMPARE]]
+
+    context = compare_assessments(selected)
+    context.update({
+        'customer': customer,
+        'history': history,
+        'selected': selected,
+        'changed_only': request.GET.get('changed') == '1',
+    })
+    return render(request, 'assessment/assessment_comparison.html', context)
+
+# Customer Risk Trend
+@login_required
+def customer_trend_api(request, customer_id):
+    customer = get_object_or_404(Customer, id=customer_id)
+    return JsonResponse(score_trend(customer.id))
+
+# Complete an Assessment
+@require_POST
+@login_required
+def complete_assessment(request, assessment_id):
+    assessment = get_object_or_404(Assessment.objects.select_related('customer', 'scorecard'), id=assessment_id)
+    with transaction.atomic():
+        if assessment.status != 'completed':
+            assessment.status = 'completed'
+            assessment.date_completed = timezone.now()
+            assessment.save(update_fields=['status', 'date_completed', 'updated_at'])
+        add_assessment(assessment.id)
+        if frozen_scorecard(assessment) is None:
+            freeze_scorecard(assessment)
+    return render(request, 'assessment/assessment_complete.html', {'assessment': assessment})
+
+# Portfolio Dashboard
+@login_required
+def portfolio_dashboard(request):
+    return render(request, 'assessment/portfolio_dashboard.html', load_dashboard())
+
+# Search Questions and Answers
+def _search_request(request):
+    """(query, kind, customer_id, page) from the query string, ignoring unusable values."""
+    kind = request.GET.get('kind')
+    customer = request.GET.get('customer', '')
+    page = request.GET.get('page', '')
+    return (
+        request.GET.get('q', '').strip(),
+        kind if kind in SEARCH_KINDS else None,
+        int(customer) if customer.isdigit() else None,
+        int(page) if page.isdigit() else 1,
+    )
+
+def _hit_url(request, document):
+    if document.answer_id:
+        return reverse('assessment_summary', args=[document.assessment_id])
+    if request.user.is_staff:
+        return reverse('admin:assessment_question_change', args=[document.question_id])
+    return None
+
+@login_required
+def search_page(request):
+    query, kind, customer_id, page = _search_request(request)
+    results = search(query, kind=kind, customer_id=customer_id, page=page)
+    return render(request, 'assessment/search.html', {
+        'results': results,
+        'hits': [(hit, _hit_url(request, hit.document)) for hit in results.hits],
+        'query': query,
+        'kind': kind,
+        'customer_id': customer_id,
+        'customers': Customer.objects.order_by('name').only('id', 'name'),
+    })
+
+@login_required
+def search_api(request):
+    query, kind, customer_id, page = _search_request(request)
+    results = search(query, kind=kind, customer_id=customer_id, page=page)
+    return JsonResponse({
+        'query': query,
+        'page': results.page,
+        'has_next': results.has_next,
+        'results': [
+            {
+                'kind': 'answer' if hit.document.answer_id else 'question',
+                'question_id': hit.document.question_id,
+                'answer_id': hit.document.answer_id,
+                'assessment_id': hit.document.assessment_id,
+                'customer': hit.document.assessment.customer.name if hit.document.assessment_id else None,
+                'title': hit.document.title,
+                'snippet': str(hit.snippet),
+                'rank': hit.rank,
+                'url': _hit_url(request, hit.document),
+            }
+            for hit in results.hits
+        ],
+    })
+
+# Assessment PDF Report
+@login_required
+def assessment_report(request, assessment_id):
+    """
+    Serve the cached PDF of the summary; when the current answers have not
+    been rendered yet, queue the render and show its progress instead.
+    """
+    assessment = get_object_or_404(Assessment.objects.select_related('customer', 'scorecard'), id=assessment_id)
+    name = cached_report(assessment)
+    if name is not None:
+        return FileResponse(
+            default_storage.open(name, 'rb'), as_attachment=True,
+            filename=f"Assessment_Summary_{assessment.customer.name}.pdf",
         )
-        writer.writerow([category, answer.question.text, display_answer, answer.note if answer.note else ""])
+
+    job = Job.objects.filter(
+        kind='render_assessment_report', status__in=('queued', 'running'),
+        params__report=report_name(assessment), created_by=request.user,
+    ).first()
+    if job is None:
+        job = enqueue('render_assessment_report', params={
+            'assessment_id': assessment.id,
+            'report': report_name(assessment),
+        }, user=request.user)
+    return redirect('job_status', job_id=job.id)
+
+@login_required
+@export_condition
+def export_assessment_summary(request, assessment_id):
+    assessment = get_assessment(request, assessment_id)
+    if request.GET.get('background'):
+        job = enqueue('export_assessment', params={
+            'assessment_id': assessment.id,
+            'format': request.GET.get('format', 'csv'),
+        }, user=request.user)
+        return redirect('job_status', job_id=job.id)
+
+    user_answers = UserAnswer.objects.filter(assessment=assessment).order_by('id')
+
+    content_type, extension, content = stream_rows(
+        SUMMARY_HEADER, summary_rows(user_answers), request.GET.get('format', 'csv')
+    )
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="Assessment_Summary_{assessment.customer.name}.{extension}"'
     return response
+
+@login_required
+def export_assessments(request):
+    """
+    Stream every completed assessment matching the customer / completion date
+    filters into a single CSV or XLSX file.
+    """
+    customer_id = request.GET.get('customer') or None
+    if customer_id is not None and not customer_id.isdigit():
+        return HttpResponseBadRequest("customer must be a customer id.")
+    try:
+        date_from = parse_date(request.GET.get('date_from', ''))
+        date_to = parse_date(request.GET.get('date_to', ''))
+    except ValueError:
+        date_from = date_to = None
+    if (request.GET.get('date_from') and not date_from) or (request.GET.get('date_to') and not date_to):
+        return HttpResponseBadRequest("Dates must use the YYYY-MM-DD format.")
+
+    filename = "Assessments"
+    if customer_id:
+        customer = get_object_or_404(Customer, id=customer_id)
+        filename += f"_{customer.name}"
+    if date_from:
+        filename += f"_from_{date_from}"
+    if date_to:
+        filename += f"_to_{date_to}"
+
+    if request.GET.get('background'):
+        job = enqueue('export_assessments', params={
+            'customer_id': customer_id,
+            'date_from': date_from.isoformat() if date_from else None,
+            'date_to': date_to.isoformat() if date_to else None,
+            'format': request.GET.get('format', 'csv'),
+        }, user=request.user)
+        return redirect('job_status', job_id=job.id)
+
+    answers = bulk_answers(customer_id=customer_id, date_from=date_from, date_to=date_to)
+    content_type, extension, content = stream_rows(
+        BULK_HEADER, bulk_rows(answers), request.GET.get('format', 'csv'), sheet_name='Assessments'
+    )
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
+
+def _get_job_for_user(request, job_id):
+    job = get_object_or_404(Job, id=job_id)
+    if not request.user.is_staff and job.created_by_id != request.user.id:
+        raise Http404("No Job matches the given query.")
+    return job
+
+@login_required
+def job_status(request, job_id):
+    job = _get_job_for_user(request, job_id)
+    return render(request, 'assessment/job_status.html', {'job': job})
+
+@login_required
+def job_progress(request, job_id):
+    job = _get_job_for_user(request, job_id)
+    return JsonResponse({
+        'id': job.id,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'percent': job.percent,
+        'message': job.message,
+        'finished': job.is_finished,
+        'result_url': reverse('job_result', args=[job.id]) if job.result_file else None,
+    })
+
+@login_required
+def job_result(request, job_id):
+    job = _get_job_for_user(request, job_id)
+    if not job.result_file or not job.result_file.storage.exists(job.result_file.name):
+        raise Http404("This job has no result file.")
+    return FileResponse(job.result_file.open('rb'), as_attachment=True, filename=os.path.basename(job.result_file.name))
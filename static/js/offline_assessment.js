@@ -0,0 +1,303 @@
+// Offline assessment client.
+//
+// The question bank and existing answers are downloaded once and kept in
+// localStorage. Answers are recorded locally and queued as pending changes,
+// which are sent in batches to the sync endpoint whenever a connection is
+// available. The server answers with the applied versions, conflicts it
+// resolved in its own favour, and answers changed elsewhere since the last
+// sync.
+(function () {
+    const root = document.getElementById('main-content');
+    const assessmentId = root.dataset.assessmentId;
+    const storageKey = 'assessment-offline-' + assessmentId;
+    const SYNC_INTERVAL = 30000;
+
+    let state = loadState();
+    let syncing = false;
+    let current = null;
+    let history = [];
+
+    function loadState() {
+        try {
+            return JSON.parse(localStorage.getItem(storageKey)) || {};
+        } catch (e) {
+            return {};
+        }
+    }
+
+    function saveState() {
+        localStorage.setItem(storageKey, JSON.stringify(state));
+    }
+
+    function pendingCount() {
+        return Object.keys(state.pending || {}).length;
+    }
+
+    function postJSON(url, body) {
+        return fetch(url, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': root.dataset.csrfToken
+            },
+            body: JSON.stringify(body)
+        }).then(function (response) {
+            if (!response.ok) {
+                throw new Error('Sync failed with status ' + response.status);
+            }
+            return response.json();
+        });
+    }
+
+    // ---------- DOWNLOAD ---------- //
+
+    function downloadBundle() {
+        return fetch(root.dataset.bundleUrl, {credentials: 'same-origin'})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error('Download failed with status ' + response.status);
+                }
+                return response.json();
+            })
+            .then(function (bundle) {
+                const pending = state.pending || {};
+                const answers = {};
+                bundle.answers.forEach(function (answer) {
+                    answers[answer.question] = answer;
+                });
+                // Local edits that have not reached the server yet stay on top.
+                Object.keys(pending).forEach(function (questionId) {
+                    answers[questionId] = Object.assign({}, answers[questionId], pending[questionId]);
+                });
+                state = {
+                    assessment: bundle.assessment,
+                    bank: bundle.bank,
+                    answers: answers,
+                    pending: pending,
+                    since: bundle.server_time
+                };
+                saveState();
+            });
+    }
+
+    // ---------- SYNC ---------- //
+
+    function sync() {
+        if (syncing || !navigator.onLine || !state.bank) {
+            return Promise.resolve();
+        }
+        syncing = true;
+        const sent = Object.assign({}, state.pending);
+        const changes = Object.keys(sent).map(function (questionId) { return sent[questionId]; });
+
+        return postJSON(root.dataset.syncUrl, {
+            bank_version: state.bank.version,
+            since: state.since,
+            changes: changes
+        }).then(function (result) {
+            // Only clear a pending change if it was not edited again while the request was in flight.
+            function settle(questionId) {
+                const pending = state.pending[questionId];
+                if (pending && sent[questionId] && pending.answered_at === sent[questionId].answered_at) {
+                    delete state.pending[questionId];
+                } else if (pending) {
+                    return false;
+                }
+                return true;
+            }
+            result.applied.forEach(function (answer) {
+                if (settle(answer.question)) {
+                    state.answers[answer.question] = answer;
+                } else {
+                    state.pending[answer.question].base_version = answer.version;
+                }
+            });
+            result.conflicts.concat(result.changed).forEach(function (answer) {
+                if (settle(answer.question)) {
+                    state.answers[answer.question] = answer;
+                }
+            });
+            result.errors.forEach(function (error) {
+                delete state.pending[error.question];
+            });
+            state.since = result.server_time;
+            saveState();
+            if (result.bank_changed) {
+                return downloadBundle();
+            }
+        }).catch(function (error) {
+            console.error(error);
+        }).then(function () {
+            syncing = false;
+            render();
+        });
+    }
+
+    // ---------- QUESTIONS ---------- //
+
+    function questions(categoryId) {
+        return state.bank.questions.filter(function (question) {
+            return categoryId === undefined || question.category === categoryId;
+        });
+    }
+
+    function isAnswered(questionId) {
+        return Boolean(state.answers[questionId]);
+    }
+
+    function firstUnanswered(categoryId) {
+        const remaining = questions(categoryId).filter(function (question) { return !isAnswered(question.id); });
+        if (remaining.length) {
+            return remaining[0];
+        }
+        const others = questions().filter(function (question) { return !isAnswered(question.id); });
+        return others.length ? others[0] : null;
+    }
+
+    function record(question) {
+        const stored = state.answers[question.id] || {};
+        const previous = state.pending[question.id];
+        const change = {
+            question: question.id,
+            option: null,
+            text: '',
+            note: document.getElementById('note').value,
+            // Conflicts are detected against the version the first local edit started from.
+            base_version: previous ? previous.base_version : (stored.version || 0),
+            answered_at: new Date().toISOString()
+        };
+        if (question.type === 'input') {
+            change.text = document.getElementById('answer-text').value;
+        } else {
+            change.option = parseInt(document.getElementById('answer-option').value, 10) || null;
+        }
+        state.pending[question.id] = change;
+        state.answers[question.id] = Object.assign({}, stored, change);
+        saveState();
+    }
+
+    function show(question) {
+        current = question;
+        const answer = state.answers[question.id] || {};
+        const text = document.getElementById('answer-text');
+        const select = document.getElementById('answer-option');
+        document.getElementById('question-text').textContent = question.text;
+        document.getElementById('note').value = answer.note || '';
+
+        if (question.type === 'input') {
+            text.style.display = '';
+            select.style.display = 'none';
+            text.value = answer.text || '';
+        } else {
+            text.style.display = 'none';
+            select.style.display = '';
+            select.innerHTML = '';
+            question.options.forEach(function (option) {
+                const element = document.createElement('option');
+                element.value = option.id;
+                element.textContent = option.text;
+                element.selected = answer.option === option.id;
+                select.appendChild(element);
+            });
+        }
+        document.getElementById('previous-btn').style.visibility = history.length ? 'visible' : 'hidden';
+        render();
+    }
+
+    function render() {
+        if (!state.bank) {
+            return;
+        }
+        const nav = document.getElementById('category-nav');
+        nav.innerHTML = '';
+        state.bank.categories.forEach(function (category) {
+            const item = document.createElement('li');
+            item.className = 'nav-item' + (current && current.category === category.id ? ' active' : '');
+            const link = document.createElement('a');
+            link.className = 'nav-link';
+            link.href = '#';
+            link.textContent = category.name;
+            link.addEventListener('click', function (event) {
+                event.preventDefault();
+                const question = firstUnanswered(category.id);
+                if (question) {
+                    history = [];
+                    show(question);
+                }
+            });
+            item.appendChild(link);
+            nav.appendChild(item);
+        });
+
+        const all = questions();
+        const answered = all.filter(function (question) { return isAnswered(question.id); }).length;
+        document.getElementById('progress-text').textContent = answered + ' of ' + all.length + ' answered';
+
+        const status = document.getElementById('sync-status');
+        const pending = pendingCount();
+        status.className = pending ? 'pending' : '';
+        if (pending) {
+            status.textContent = (navigator.onLine ? 'Syncing ' : 'Offline – ') + pending + ' answer(s) waiting to sync';
+        } else {
+            status.textContent = 'All answers synced';
+        }
+    }
+
+    document.getElementById('question-form').addEventListener('submit', function (event) {
+        event.preventDefault();
+        if (!current) {
+            return;
+        }
+        record(current);
+        history.push(current);
+        const next = firstUnanswered(current.category);
+        if (next) {
+            show(next);
+            sync();
+        } else {
+            sync().then(function () {
+                if (!pendingCount()) {
+                    window.location.href = document.querySelector('a[href*="summary"]').href;
+                }
+            });
+        }
+    });
+
+    document.getElementById('previous-btn').addEventListener('click', function () {
+        if (history.length) {
+            show(history.pop());
+        }
+    });
+
+    // ---------- START ---------- //
+
+    window.addEventListener('online', sync);
+    window.addEventListener('offline', render);
+    setInterval(sync, SYNC_INTERVAL);
+
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register(root.dataset.workerUrl).catch(function (error) {
+            console.error(error);
+        });
+    }
+
+    const ready = (navigator.onLine && !pendingCount()) || !state.bank ? downloadBundle() : Promise.resolve();
+    ready.catch(function (error) {
+        console.error(error);
+    }).then(function () {
+        if (!state.bank) {
+            document.getElementById('question-text').textContent =
+                'This assessment has not been downloaded yet. Connect to the network and reload.';
+            return;
+        }
+        state.pending = state.pending || {};
+        const question = firstUnanswered();
+        if (question) {
+            show(question);
+        } else {
+            render();
+        }
+        sync();
+    });
+})();